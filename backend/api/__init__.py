@@ -8,9 +8,29 @@ from . import auth
 from . import payments
 from . import vehicles
 from . import bookings
+from . import sync
+from . import events
+from . import routes
+from . import batch
+from . import holds
+from . import profiles
+from . import event_log
+from . import images
+from . import maintenance
+from . import analytics
 
 # Register blueprints
 api.register_blueprint(auth.auth_bp, url_prefix='/auth')
 api.register_blueprint(payments.bp, url_prefix='/payments')
 api.register_blueprint(vehicles.bp, url_prefix='/vehicles')
 api.register_blueprint(bookings.bp, url_prefix='/bookings')
+api.register_blueprint(sync.bp, url_prefix='/sync')
+api.register_blueprint(events.bp, url_prefix='/events')
+api.register_blueprint(routes.bp, url_prefix='/routes')
+api.register_blueprint(batch.bp, url_prefix='/batch')
+api.register_blueprint(holds.bp, url_prefix='/holds')
+api.register_blueprint(profiles.bp, url_prefix='/profiles')
+api.register_blueprint(event_log.bp, url_prefix='/event-log')
+api.register_blueprint(images.bp, url_prefix='/images')
+api.register_blueprint(maintenance.bp, url_prefix='/maintenance')
+api.register_blueprint(analytics.bp, url_prefix='/analytics')
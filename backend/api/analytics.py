@@ -0,0 +1,43 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from services.analytics import analytics
+from .auth import admin_required
+
+bp = Blueprint('analytics', __name__, url_prefix='/analytics')
+
+@bp.route('/utilization', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_utilization():
+    """Utilization per vehicle and type, lead times and demand curves (admin only)."""
+    report = analytics.report()
+    vehicle_type = request.args.get('type')
+    vehicles, types = report['vehicles'], report['types']
+    if vehicle_type:
+        vehicles = [v for v in vehicles if v['type'] == vehicle_type]
+        types = {name: stats for name, stats in types.items() if name == vehicle_type}
+    return jsonify({
+        'success': True,
+        'generated_at': report['generated_at'],
+        'window': report['window'],
+        'bookings': report['bookings'],
+        'types': types,
+        'vehicles': vehicles
+    }), 200
+
+@bp.route('/forecast', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_forecast():
+    """Expected booked vehicle-days per type and location for the coming days (admin only)."""
+    report = analytics.report()
+    vehicle_type = request.args.get('type')
+    location = request.args.get('location')
+    forecast = [group for group in report['forecast']
+                if (not vehicle_type or group['type'] == vehicle_type)
+                and (not location or group['location'] == location)]
+    return jsonify({
+        'success': True,
+        'generated_at': report['generated_at'],
+        'forecast': forecast
+    }), 200
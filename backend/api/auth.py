@@ -1,15 +1,21 @@
 from functools import wraps
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
     jwt_required,
     get_jwt_identity,
+    get_jwt,
+    decode_token,
     verify_jwt_in_request
 )
 from werkzeug.security import check_password_hash, generate_password_hash
 from models import db
 from models.user import User
+from datetime import datetime
+from services.ratelimit import limiter, ip_key, account_key
+from services.revocation import revocations
+from services.querybudget import query_budget
 
 # Create blueprint
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -29,6 +35,8 @@ def admin_required(fn):
     return wrapper
 
 @auth_bp.route('/login', methods=['POST'])
+@limiter.limit('RATELIMIT_LOGIN_PER_IP', key=ip_key)
+@limiter.limit('RATELIMIT_LOGIN_PER_ACCOUNT', key=account_key)
 def login():
     """Login user and return JWT tokens."""
     print("\n=== New Login Attempt ===")
@@ -88,6 +96,7 @@ def login():
     })
 
 @auth_bp.route('/register', methods=['POST'])
+@limiter.limit('RATELIMIT_REGISTER_PER_IP', key=ip_key)
 def register():
     """Register a new user"""
     data = request.get_json()
@@ -151,6 +160,7 @@ def register():
 
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
+@query_budget(2)
 def get_me():
     """Get current user profile"""
     current_user_id = get_jwt_identity()
@@ -179,7 +189,61 @@ def refresh():
 @admin_required
 def get_all_users():
     """Get all users (admin only)."""
-    users = User.query.all()
+    try:
+        fields = User.FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    users = User.query.options(*User.FIELDS.load_only(User, fields)).all()
     return jsonify({
-        'users': [user.to_dict() for user in users]
+        'users': [user.to_dict(fields=fields) for user in users]
     }), 200
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """Revoke the current token, and the refresh token if one is supplied."""
+    current = get_jwt()
+    revocations.revoke_payload(current)
+    
+    data = request.get_json(silent=True) or {}
+    refresh_token = data.get('refresh_token')
+    if refresh_token:
+        try:
+            payload = decode_token(refresh_token)
+        except Exception:
+            return jsonify({"error": "Invalid refresh token"}), 400
+        if payload.get('sub') != current.get('sub'):
+            return jsonify({"error": "Refresh token belongs to another user"}), 403
+        revocations.revoke_payload(payload)
+    
+    return jsonify({"message": "Logged out successfully"}), 200
+
+@auth_bp.route('/revoke', methods=['POST'])
+@jwt_required()
+def revoke_token():
+    """Revoke a token: your own by value, or any token (or jti) as an admin."""
+    current_user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    
+    if data.get('token'):
+        try:
+            payload = decode_token(data['token'])
+        except Exception:
+            return jsonify({"error": "Invalid token"}), 400
+        if payload.get('sub') != current_user_id:
+            current_user = User.query.get(current_user_id)
+            if not current_user or not current_user.is_admin:
+                return jsonify({"error": "Admin access required"}), 403
+        revocations.revoke_payload(payload)
+        return jsonify({"message": "Token revoked", "jti": payload['jti']}), 200
+    
+    if data.get('jti'):
+        current_user = User.query.get(current_user_id)
+        if not current_user or not current_user.is_admin:
+            return jsonify({"error": "Admin access required"}), 403
+        # Without the token we don't know its expiry, so keep it for the longest lifetime
+        expires_at = datetime.utcnow() + current_app.config['JWT_REFRESH_TOKEN_EXPIRES']
+        revocations.revoke(data['jti'], data.get('token_type', 'refresh'), expires_at)
+        return jsonify({"message": "Token revoked", "jti": data['jti']}), 200
+    
+    return jsonify({"error": "Provide a token or jti to revoke"}), 400
@@ -0,0 +1,124 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify, current_app, g
+from flask_jwt_extended import jwt_required
+from werkzeug.test import EnvironBuilder
+from models import db
+
+bp = Blueprint('batch', __name__, url_prefix='/batch')
+
+READ_METHODS = ('GET', 'HEAD')
+EXCLUDED_PREFIXES = ('/api/batch', '/api/events')  # no recursion, no streams
+# Per-request routing state a concurrent read must inherit (read-your-writes)
+INHERITED_G = ('db_replica', 'db_use_primary')
+
+
+def build_environ(sub):
+    """WSGI environ for a sub-request, reusing the batch's auth and client address."""
+    headers = {'Authorization': request.headers.get('Authorization', '')}
+    # Sub-responses are embedded as JSON; the batch response itself is compressed
+    headers.update({name: value for name, value in (sub.get('headers') or {}).items()
+                    if name.lower() != 'accept-encoding'})
+    return EnvironBuilder(
+        path=sub['path'],
+        method=sub.get('method', 'GET').upper(),
+        json=sub.get('body'),
+        headers=headers,
+        environ_base={'REMOTE_ADDR': request.remote_addr}
+    ).get_environ()
+
+
+def run_sub_request(app, sub, environ):
+    """Dispatch one sub-request through the normal Flask pipeline."""
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            # Not app.handle_exception: it re-raises when PROPAGATE_EXCEPTIONS is on (debug, testing)
+            db.session.rollback()
+            app.log_exception(sys.exc_info())
+            response = jsonify({
+                'success': False,
+                'error': f'Internal server error: {str(e)}'
+            })
+            response.status_code = 500
+        body = response.get_json(silent=True)
+        return {
+            'id': sub.get('id'),
+            'status': response.status_code,
+            'headers': {k: v for k, v in response.headers.items()
+                        if k in ('Content-Type', 'Location', 'Retry-After')},
+            'body': body if body is not None else response.get_data(as_text=True)
+        }
+
+
+def run_concurrent_read(app, sub, environ, inherited):
+    """Run a read on its own app context (and so its own session) in a worker thread."""
+    with app.app_context():
+        for key, value in inherited.items():
+            setattr(g, key, value)
+        return run_sub_request(app, sub, environ)
+
+
+def validate(subs):
+    if not isinstance(subs, list) or not subs:
+        return 'requests must be a non-empty list'
+    if len(subs) > current_app.config.get('BATCH_MAX_REQUESTS', 20):
+        return f"At most {current_app.config.get('BATCH_MAX_REQUESTS', 20)} requests per batch"
+    for sub in subs:
+        if not isinstance(sub, dict) or not isinstance(sub.get('path'), str):
+            return 'Each request needs a path'
+        if not sub['path'].startswith('/api/') or sub['path'].startswith(EXCLUDED_PREFIXES):
+            return f"Path not allowed in a batch: {sub['path']}"
+    return None
+
+
+@bp.route('', methods=['POST'])
+@jwt_required()
+def run_batch():
+    """Run several API requests in one round trip.
+
+    Sub-requests run in order on this request's database session, so the
+    token is checked once and rows loaded by one (e.g. the current user)
+    are reused by the next. With "parallel": true, consecutive reads run
+    concurrently on their own sessions; writes still run one at a time.
+    """
+    data = request.get_json(silent=True) or {}
+    subs = data.get('requests')
+    error = validate(subs)
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
+
+    app = current_app._get_current_object()
+    environs = [build_environ(sub) for sub in subs]
+    results = [None] * len(subs)
+
+    if data.get('parallel'):
+        workers = current_app.config.get('BATCH_MAX_WORKERS', 4)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            i = 0
+            while i < len(subs):
+                j = i
+                while j < len(subs) and environs[j]['REQUEST_METHOD'] in READ_METHODS:
+                    j += 1
+                if j - i > 1:
+                    inherited = {key: g.get(key) for key in INHERITED_G if key in g}
+                    futures = [pool.submit(run_concurrent_read, app, subs[k], environs[k], inherited)
+                               for k in range(i, j)]
+                    for k, future in zip(range(i, j), futures):
+                        results[k] = future.result()
+                    i = j
+                else:
+                    results[i] = run_sub_request(app, subs[i], environs[i])
+                    i += 1
+    else:
+        for i, sub in enumerate(subs):
+            results[i] = run_sub_request(app, sub, environs[i])
+
+    return jsonify({
+        'success': True,
+        'responses': results
+    }), 200
@@ -2,8 +2,14 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db
 from models.booking import Booking
+from models.archive import BookingArchive
 from models.vehicle import Vehicle
 from models.user import User
+from services import events
+from services.archive import user_booking_history, find_booking
+from services.querybudget import query_budget
+from services.dashboard import build_dashboard
+from services.outbox import outbox, booking_context
 from datetime import datetime
 from sqlalchemy import or_, and_
 
@@ -67,7 +73,7 @@ def create_booking():
         }), 400
     
     # Check for booking conflicts
-    if not Booking.is_vehicle_available(vehicle.id, start_date, end_date):
+    if not Booking.is_vehicle_available(vehicle.id, start_date, end_date, current_user_id):
         return jsonify({
             'success': False,
             'error': 'Vehicle is already booked for the selected dates'
@@ -89,7 +95,10 @@ def create_booking():
         )
         
         db.session.add(booking)
+        db.session.flush()
+        outbox.notify('booking.created', booking.user, **booking_context(booking))
         db.session.commit()
+        events.booking_changed(booking)
         
         return jsonify({
             'success': True,
@@ -106,22 +115,45 @@ def create_booking():
 
 @bp.route('', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_user_bookings():
-    """Get all bookings for the current user."""
+    """Get all bookings for the current user, including archived history."""
     current_user_id = get_jwt_identity()
-    bookings = Booking.query.filter_by(user_id=current_user_id).all()
+    try:
+        fields = BookingArchive.FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    bookings = user_booking_history(current_user_id, fields)
     
     return jsonify({
         'success': True,
-        'bookings': [booking.to_dict() for booking in bookings]
+        'bookings': [booking.to_dict(fields=fields) for booking in bookings]
     }), 200
 
+@bp.route('/dashboard', methods=['GET'])
+@jwt_required()
+@query_budget(7)
+def get_dashboard():
+    """Upcoming and past bookings with vehicle summaries and payment status."""
+    current_user_id = get_jwt_identity()
+    past_limit = min(max(request.args.get('past_limit', 20, type=int), 0), 100)
+    return jsonify(dict(build_dashboard(current_user_id, past_limit), success=True)), 200
+
 @bp.route('/<int:booking_id>', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_booking(booking_id):
-    """Get a specific booking by ID."""
+    """Get a specific booking by ID (hot or archived)."""
     current_user_id = get_jwt_identity()
-    booking = Booking.query.get_or_404(booking_id)
+    booking = find_booking(booking_id)
+    if not booking:
+        return jsonify({
+            'success': False,
+            'error': 'Booking not found'
+        }), 404
     
     # Check if the current user is the owner of the booking or an admin
     if booking.user_id != current_user_id and not User.query.get(current_user_id).is_admin:
@@ -130,9 +162,17 @@ def get_booking(booking_id):
             'error': 'Unauthorized access to this booking'
         }), 403
     
+    try:
+        fields = BookingArchive.FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
     return jsonify({
         'success': True,
-        'booking': booking.to_dict()
+        'booking': booking.to_dict(fields=fields)
     }), 200
 
 @bp.route('/<int:booking_id>', methods=['PUT'])
@@ -177,7 +217,8 @@ def update_booking(booking_id):
         start_date, end_date = date_result
         
         # Check if the new dates are available
-        if not Booking.is_vehicle_available(booking.vehicle_id, start_date, end_date, exclude_booking_id=booking.id):
+        if not Booking.is_vehicle_available(booking.vehicle_id, start_date, end_date, booking.user_id,
+                                            exclude_booking_id=booking.id):
             return jsonify({
                 'success': False,
                 'error': 'Vehicle is not available for the selected dates'
@@ -191,6 +232,7 @@ def update_booking(booking_id):
     
     try:
         db.session.commit()
+        events.booking_changed(booking)
         return jsonify({
             'success': True,
             'message': 'Booking updated successfully',
@@ -221,6 +263,7 @@ def delete_booking(booking_id):
     try:
         db.session.delete(booking)
         db.session.commit()
+        events.booking_changed(booking, 'booking.deleted')
         
         return jsonify({
             'success': True,
@@ -0,0 +1,57 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from services.eventlog import event_log, replay, TRACKED_FIELDS
+from .auth import admin_required
+
+bp = Blueprint('event_log', __name__, url_prefix='/event-log')
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_feed():
+    """Events after a cursor, oldest first (admin only).
+
+    Consumers pass the returned next_after_id back as after_id to follow the log.
+    """
+    after_id = request.args.get('after_id', 0, type=int)
+    limit = min(max(request.args.get('limit', 500, type=int), 1), 5000)
+    entity_types = [t for t in request.args.get('entity_type', '').split(',') if t]
+    for entity_type in entity_types:
+        if entity_type not in TRACKED_FIELDS:
+            return jsonify({
+                'success': False,
+                'error': f'Unknown entity type: {entity_type}'
+            }), 400
+
+    events = [entry.to_dict() for entry in event_log.feed(after_id, entity_types, limit)]
+    return jsonify({
+        'success': True,
+        'events': events,
+        'next_after_id': events[-1]['id'] if events else after_id
+    }), 200
+
+@bp.route('/<entity_type>/<int:entity_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_entity_history(entity_type, entity_id):
+    """An entity's events and its state replayed from them (admin only)."""
+    if entity_type not in TRACKED_FIELDS:
+        return jsonify({
+            'success': False,
+            'error': f'Unknown entity type: {entity_type}'
+        }), 400
+
+    until_id = request.args.get('until_id', type=int)
+    events = [entry.to_dict() for entry in event_log.history(entity_type, entity_id, until_id)]
+    if not events:
+        return jsonify({
+            'success': False,
+            'error': 'No events recorded for this entity'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'events': events,
+        'state': replay(events),
+        'deleted': events[-1]['event'] == 'deleted'
+    }), 200
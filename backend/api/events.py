@@ -0,0 +1,42 @@
+from flask import Blueprint, Response
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models.user import User
+from services.events import hub, format_sse
+
+bp = Blueprint('events', __name__, url_prefix='/events')
+
+@bp.route('', methods=['GET'])
+@jwt_required(optional=True, locations=['headers', 'query_string'])
+def stream_events():
+    """Stream availability and booking status events (Server-Sent Events).
+    
+    Anonymous clients receive vehicle availability events. Signed-in clients
+    also receive status events for their own bookings (admins: all bookings).
+    EventSource can't set headers, so the token may be passed as ?jwt=.
+    """
+    current_user_id = get_jwt_identity()
+    is_admin = False
+    if current_user_id:
+        # The only query for the lifetime of the connection
+        user = User.query.get(current_user_id)
+        is_admin = bool(user and user.is_admin)
+    
+    subscriber = hub.subscribe(current_user_id, is_admin)
+    
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while not subscriber.closed:
+                events = subscriber.wait(hub.heartbeat)
+                if not events and not subscriber.closed:
+                    yield ": keepalive\n\n"
+                for event in events:
+                    yield format_sse(event)
+            yield f"event: evicted\ndata: {subscriber.reason or 'closed'}\n\n"
+        finally:
+            hub.unsubscribe(subscriber)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
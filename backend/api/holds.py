@@ -0,0 +1,96 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models.booking import Booking
+from models.vehicle import Vehicle
+from services.holds import holds
+from .bookings import validate_booking_dates
+
+bp = Blueprint('holds', __name__, url_prefix='/holds')
+
+@bp.route('', methods=['POST'])
+@jwt_required()
+def create_hold():
+    """Reserve a vehicle for a few minutes while the customer pays (nothing is stored)."""
+    current_user_id = get_jwt_identity()
+    data = request.get_json() or {}
+
+    required_fields = ['vehicle_id', 'start_date', 'end_date']
+    for field in required_fields:
+        if field not in data:
+            return jsonify({
+                'success': False,
+                'error': f'Missing required field: {field}'
+            }), 400
+
+    is_valid, date_result = validate_booking_dates(data['start_date'], data['end_date'])
+    if not is_valid:
+        return jsonify({
+            'success': False,
+            'error': date_result
+        }), 400
+    start_date, end_date = date_result
+
+    vehicle = Vehicle.query.get(data['vehicle_id'])
+    if not vehicle:
+        return jsonify({
+            'success': False,
+            'error': 'Vehicle not found'
+        }), 404
+    if not vehicle.is_available:
+        return jsonify({
+            'success': False,
+            'error': 'Vehicle is not available for booking'
+        }), 400
+
+    if len(holds.user_holds(current_user_id)) >= holds.max_per_user:
+        return jsonify({
+            'success': False,
+            'error': f'At most {holds.max_per_user} vehicles can be held at once'
+        }), 400
+
+    if not Booking.is_vehicle_available(vehicle.id, start_date, end_date, current_user_id):
+        return jsonify({
+            'success': False,
+            'error': 'Vehicle is already booked for the selected dates'
+        }), 400
+
+    days = (end_date - start_date).days
+    hold = holds.place(vehicle.id, current_user_id, start_date, end_date, days * vehicle.price_per_day)
+    if not hold:
+        return jsonify({
+            'success': False,
+            'error': 'Vehicle is already booked for the selected dates'
+        }), 400
+
+    return jsonify({
+        'success': True,
+        'message': 'Vehicle held; pay with hold_id before it expires',
+        'hold': hold.to_dict()
+    }), 201
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+def get_user_holds():
+    """Get the current user's active holds"""
+    current_user_id = get_jwt_identity()
+    return jsonify({
+        'success': True,
+        'holds': [hold.to_dict() for hold in holds.user_holds(current_user_id)]
+    }), 200
+
+@bp.route('/<hold_id>', methods=['DELETE'])
+@jwt_required()
+def release_hold(hold_id):
+    """Release a hold before it expires"""
+    current_user_id = get_jwt_identity()
+    hold = holds.claim(hold_id, current_user_id)
+    if not hold:
+        return jsonify({
+            'success': False,
+            'error': 'Hold not found or expired'
+        }), 404
+    holds.release(hold_id)
+    return jsonify({
+        'success': True,
+        'message': 'Hold released'
+    }), 200
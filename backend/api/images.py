@@ -0,0 +1,78 @@
+import os
+from flask import Blueprint, request, jsonify, send_file
+from flask_jwt_extended import jwt_required
+from services.images import images, sniff, HASH_PATTERN, IMMUTABLE
+from .auth import admin_required
+
+bp = Blueprint('images', __name__, url_prefix='/images')
+
+@bp.route('', methods=['POST'])
+@jwt_required()
+@admin_required
+def upload_image():
+    """Upload a vehicle image (admin only); use the returned hash as a vehicle's image_hash."""
+    if request.content_length and request.content_length > images.max_bytes + 1024:
+        return jsonify({
+            'success': False,
+            'error': f'Image larger than {images.max_bytes} bytes'
+        }), 413
+
+    upload = request.files.get('image')
+    data = upload.read() if upload else request.get_data()
+    if not data:
+        return jsonify({
+            'success': False,
+            'error': 'Send the image as multipart field "image" or as the request body'
+        }), 400
+    if len(data) > images.max_bytes:
+        return jsonify({
+            'success': False,
+            'error': f'Image larger than {images.max_bytes} bytes'
+        }), 413
+    if not sniff(data):
+        return jsonify({
+            'success': False,
+            'error': 'Unsupported image format (use JPEG, PNG, GIF or WebP)'
+        }), 400
+
+    try:
+        digest, created = images.store(data)
+    except OSError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Could not store image: {str(e)}'
+        }), 500
+
+    return jsonify({
+        'success': True,
+        'image_hash': digest,
+        'duplicate': not created,
+        'images': images.urls(digest)
+    }), 201 if created else 200
+
+@bp.route('/<digest>/<variant>', methods=['GET'])
+def get_image(digest, variant):
+    """Serve an original or a variant; ready variants are cacheable forever."""
+    if not HASH_PATTERN.match(digest) or (variant != 'original' and variant not in images.variants):
+        return jsonify({'error': 'Image not found'}), 404
+    if not images.exists(digest):
+        return jsonify({'error': 'Image not found'}), 404
+
+    ready = True
+    path = images.variant_path(digest, variant) if variant != 'original' else None
+    if path is not None and not os.path.exists(path):
+        # Full-size stand-in until the variant is rendered
+        images.schedule(digest)
+        path, ready = None, False
+
+    if path is None:
+        path = images.original_path(digest)
+        with open(path, 'rb') as f:
+            mimetype = sniff(f.read(16))
+        etag = digest
+    else:
+        mimetype, etag = f'image/{images.format.lower()}', f'{digest}-{variant}'
+
+    response = send_file(path, mimetype=mimetype, etag=etag, conditional=True)
+    response.headers['Cache-Control'] = IMMUTABLE if ready else 'public, max-age=60'
+    return response
@@ -0,0 +1,163 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select
+from models import db
+from models.vehicle import Vehicle
+from models.maintenance import MaintenanceWindow
+from services.maintenance import maintenance, RECURRENCES
+from .auth import admin_required
+
+bp = Blueprint('maintenance', __name__, url_prefix='/maintenance')
+
+def parse_date(value, field):
+    """Parse an ISO date argument, raising ValueError with the field name."""
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise ValueError(f'Invalid {field}. Use ISO format (e.g., 2025-06-01T10:00:00)')
+
+@bp.route('', methods=['POST'])
+@jwt_required()
+@admin_required
+def create_window():
+    """Schedule a maintenance window, optionally recurring (admin only).
+
+    Existing bookings are left alone; the ones it overlaps are returned as
+    conflicting_bookings so they can be moved or cancelled.
+    """
+    data = request.get_json() or {}
+
+    required_fields = ['vehicle_id', 'start_date', 'end_date']
+    for field in required_fields:
+        if field not in data:
+            return jsonify({
+                'success': False,
+                'error': f'Missing required field: {field}'
+            }), 400
+
+    try:
+        start_date = parse_date(data['start_date'], 'start_date')
+        end_date = parse_date(data['end_date'], 'end_date')
+        until = parse_date(data['until'], 'until') if data.get('until') else None
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    if start_date >= end_date:
+        return jsonify({
+            'success': False,
+            'error': 'End date must be after start date'
+        }), 400
+
+    recurrence = data.get('recurrence') or None
+    if recurrence is not None and recurrence not in RECURRENCES:
+        return jsonify({
+            'success': False,
+            'error': f"recurrence must be one of: {', '.join(RECURRENCES)}"
+        }), 400
+    try:
+        interval = int(data.get('interval', 1))
+    except (ValueError, TypeError):
+        interval = 0
+    if interval < 1:
+        return jsonify({
+            'success': False,
+            'error': 'interval must be a positive integer'
+        }), 400
+    if until is not None and until < start_date:
+        return jsonify({
+            'success': False,
+            'error': 'until must not be before start_date'
+        }), 400
+
+    if not db.session.get(Vehicle, data['vehicle_id']):
+        return jsonify({
+            'success': False,
+            'error': 'Vehicle not found'
+        }), 404
+
+    try:
+        window = maintenance.create(data['vehicle_id'], start_date, end_date, recurrence, interval, until,
+                                    data.get('reason'), get_jwt_identity())
+        conflicts = maintenance.conflicting_bookings(window)
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': f'Failed to create maintenance window: {str(e)}'
+        }), 500
+
+    return jsonify({
+        'success': True,
+        'window': window.to_dict(),
+        'conflicting_bookings': [booking.to_dict() for booking in conflicts]
+    }), 201
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+@admin_required
+def list_windows():
+    """Maintenance windows, or with start_date/end_date their occurrences in that range (admin only)."""
+    vehicle_id = request.args.get('vehicle_id', type=int)
+    if request.args.get('start_date') or request.args.get('end_date'):
+        if not vehicle_id:
+            return jsonify({
+                'success': False,
+                'error': 'vehicle_id is required with start_date and end_date'
+            }), 400
+        try:
+            start_date = parse_date(request.args.get('start_date'), 'start_date')
+            end_date = parse_date(request.args.get('end_date'), 'end_date')
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        return jsonify({
+            'success': True,
+            'occurrences': [b.to_dict() for b in maintenance.blackouts(vehicle_id, start_date, end_date)]
+        }), 200
+
+    query = select(MaintenanceWindow).order_by(MaintenanceWindow.start_date)
+    if vehicle_id:
+        query = query.where(MaintenanceWindow.vehicle_id == vehicle_id)
+    return jsonify({
+        'success': True,
+        'windows': [window.to_dict() for window in db.session.scalars(query).all()]
+    }), 200
+
+@bp.route('/<int:window_id>', methods=['DELETE'])
+@jwt_required()
+@admin_required
+def delete_window(window_id):
+    """Remove a maintenance window and all its occurrences (admin only)."""
+    window = db.session.get(MaintenanceWindow, window_id)
+    if not window:
+        return jsonify({
+            'success': False,
+            'error': 'Maintenance window not found'
+        }), 404
+
+    try:
+        maintenance.delete(window)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': f'Failed to delete maintenance window: {str(e)}'
+        }), 500
+
+    return jsonify({
+        'success': True,
+        'message': 'Maintenance window deleted'
+    }), 200
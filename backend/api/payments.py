@@ -1,15 +1,22 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db
 from models.payment import Payment
 from models.booking import Booking
 from models.user import User
+from models.vehicle import Vehicle
+from services import events
+from services.holds import holds
+from services.archive import find_booking, find_payment, booking_payment_history
+from services.querybudget import query_budget
+from services.outbox import outbox, booking_context
 from datetime import datetime
 
 bp = Blueprint('payments', __name__, url_prefix='/payments')
 
 @bp.route('', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_payments():
     """Get all payments (admin only)"""
     # Check if user is admin
@@ -17,6 +24,21 @@ def get_payments():
     if not User.query.get(current_user_id).is_admin:
         return jsonify({"error": "Admin access required"}), 403
         
+    # ?fields= returns Payment.to_dict keys, reading only their columns
+    if request.args.get('fields'):
+        try:
+            fields = Payment.FIELDS.parse(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        payments = Payment.query.options(*Payment.FIELDS.load_only(Payment, fields)).all()
+        return jsonify({
+            'success': True,
+            'payments': [p.to_dict(fields=fields) for p in payments]
+        }), 200
+    
     payments = Payment.query.all()
     return jsonify({
         'success': True,
@@ -32,6 +54,99 @@ def get_payments():
         } for p in payments]
     }), 200
 
+def pay_for_hold(data, current_user_id):
+    """Promote a checkout hold to a confirmed booking plus its payment, atomically."""
+    missing_fields = [field for field in ['amount', 'payment_method'] if field not in data]
+    if missing_fields:
+        return jsonify({
+            'success': False,
+            'error': f'Missing required fields: {", ".join(missing_fields)}'
+        }), 400
+    
+    try:
+        amount = float(data['amount'])
+    except (ValueError, TypeError):
+        return jsonify({
+            'success': False,
+            'error': 'amount must be a number'
+        }), 400
+    
+    hold = holds.claim(data['hold_id'], current_user_id)
+    if not hold:
+        return jsonify({
+            'success': False,
+            'error': 'Hold not found or expired'
+        }), 404
+    
+    # Until the payment commits, any failure must hand the hold back
+    try:
+        if amount < hold.total_price - 0.01:
+            holds.unclaim(hold)
+            return jsonify({
+                'success': False,
+                'error': f'Amount does not cover the booking total of {hold.total_price:.2f}'
+            }), 400
+        
+        # Final guard against the database (e.g. a booking made on a worker that hadn't seen the hold)
+        vehicle = Vehicle.query.get(hold.vehicle_id)
+        if not vehicle or not vehicle.is_available or not Booking.is_vehicle_available(
+                hold.vehicle_id, hold.start_date, hold.end_date, current_user_id):
+            holds.release(hold.id)
+            return jsonify({
+                'success': False,
+                'error': 'Vehicle is no longer available for the held dates'
+            }), 409
+    except Exception as e:
+        db.session.rollback()
+        holds.unclaim(hold)
+        return jsonify({
+            'success': False,
+            'error': f'Error creating payment: {str(e)}'
+        }), 500
+    
+    try:
+        booking = Booking(
+            vehicle_id=hold.vehicle_id,
+            user_id=current_user_id,
+            start_date=hold.start_date,
+            end_date=hold.end_date,
+            total_price=hold.total_price,
+            status='confirmed'
+        )
+        db.session.add(booking)
+        db.session.flush()
+        payment = Payment(
+            user_id=current_user_id,
+            booking_id=booking.id,
+            amount=amount,
+            payment_method=data['payment_method'],
+            status='completed'
+        )
+        payment.transaction_id = data.get('transaction_id') or f"TXN{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+        db.session.add(payment)
+        outbox.notify('payment.completed', booking.user, amount=payment.amount,
+                      transaction_id=payment.transaction_id, **booking_context(booking))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        holds.unclaim(hold)
+        return jsonify({
+            'success': False,
+            'error': f'Error creating payment: {str(e)}'
+        }), 500
+    
+    holds.release(hold.id)
+    events.booking_changed(booking)
+    return jsonify({
+        'success': True,
+        'payment_id': payment.id,
+        'booking_id': booking.id,
+        'message': 'Payment processed successfully',
+        'status': payment.status,
+        'transaction_id': payment.transaction_id,
+        'booking_status': booking.status
+    }), 201
+
 @bp.route('', methods=['POST'])
 @jwt_required()
 def create_payment():
@@ -50,6 +165,10 @@ def create_payment():
         print(f"Request data: {data}")
         print(f"Headers: {dict(request.headers)}")
         
+        # Paying for a checkout hold creates the booking in the same transaction
+        if 'hold_id' in data and 'booking_id' not in data:
+            return pay_for_hold(data, get_jwt_identity())
+        
         # Validate required fields
         required_fields = ['booking_id', 'amount', 'payment_method']
         missing_fields = [field for field in required_fields if field not in data]
@@ -105,7 +224,10 @@ def create_payment():
             print(f"Updated booking status to: {booking.status}")
             
             db.session.add(payment)
+            outbox.notify('payment.completed', booking.user, amount=payment.amount,
+                          transaction_id=payment.transaction_id, **booking_context(booking))
             db.session.commit()
+            events.booking_changed(booking)
             
             return jsonify({
                 'success': True,
@@ -142,12 +264,16 @@ def create_payment():
 @bp.route('/<int:payment_id>', methods=['GET'])
 @jwt_required()
 def get_payment(payment_id):
-    """Get payment details by ID"""
-    payment = Payment.query.get_or_404(payment_id)
+    """Get payment details by ID (hot or archived)"""
+    payment = find_payment(payment_id)
+    if not payment:
+        abort(404)
     
     # Check if the current user is the owner of the booking or an admin
     current_user_id = get_jwt_identity()
-    if payment.booking.user_id != current_user_id and not User.query.get(current_user_id).is_admin:
+    booking = find_booking(payment.booking_id)
+    owner_id = booking.user_id if booking else None
+    if owner_id != current_user_id and not User.query.get(current_user_id).is_admin:
         return jsonify({"error": "Unauthorized"}), 403
     
     return jsonify({
@@ -163,16 +289,19 @@ def get_payment(payment_id):
 
 @bp.route('/booking/<int:booking_id>', methods=['GET'])
 @jwt_required()
+@query_budget(5)
 def get_booking_payments(booking_id):
-    """Get all payments for a booking"""
-    booking = Booking.query.get_or_404(booking_id)
+    """Get all payments for a booking (hot or archived)"""
+    booking = find_booking(booking_id)
+    if not booking:
+        return jsonify({"error": "Booking not found"}), 404
     current_user_id = get_jwt_identity()
     
     # Check if the current user is the owner of the booking or an admin
     if booking.user_id != current_user_id and not User.query.get(current_user_id).is_admin:
         return jsonify({"error": "Unauthorized"}), 403
     
-    payments = Payment.query.filter_by(booking_id=booking_id).all()
+    payments = booking_payment_history(booking_id)
     
     return jsonify([{
         'id': p.id,
@@ -196,7 +325,7 @@ def refund_payment(payment_id):
     if payment.booking.user_id != current_user_id and not User.query.get(current_user_id).is_admin:
         return jsonify({"error": "Unauthorized"}), 403
     
-    if payment.status != 'completed':
+    if payment.status not in ('completed', 'refund_pending'):
         return jsonify({
             'success': False,
             'error': 'Only completed payments can be refunded'
@@ -211,8 +340,12 @@ def refund_payment(payment_id):
         booking = Booking.query.get(payment.booking_id)
         if booking:
             booking.status = 'refunded'
+        outbox.notify('payment.refunded', payment.user, booking_id=payment.booking_id,
+                      amount=payment.amount, transaction_id=payment.transaction_id)
         
         db.session.commit()
+        if booking:
+            events.booking_changed(booking)
         
         return jsonify({
             'success': True,
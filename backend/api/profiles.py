@@ -0,0 +1,32 @@
+import os
+from flask import Blueprint, request, jsonify, send_from_directory
+from flask_jwt_extended import jwt_required
+from services.profiler import profiler, NAME_PATTERN
+from .auth import admin_required
+
+bp = Blueprint('profiles', __name__, url_prefix='/profiles')
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+@admin_required
+def list_profiles():
+    """List recent request profiles (admin only)."""
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    captures = profiler.captures(limit)
+    return jsonify({
+        'success': True,
+        'profiles': captures,
+        'count': len(captures)
+    }), 200
+
+@bp.route('/<profile_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def download_profile(profile_id):
+    """Download one capture (admin only)."""
+    if not NAME_PATTERN.match(profile_id):
+        return jsonify({
+            'success': False,
+            'error': 'Profile not found'
+        }), 404
+    return send_from_directory(os.path.abspath(profiler.directory), profile_id, as_attachment=True)
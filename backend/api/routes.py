@@ -0,0 +1,129 @@
+from flask import Blueprint, request, jsonify, current_app
+from models.vehicle import Vehicle
+from services.gazetteer import gazetteer
+from services.routing import route_engine
+from datetime import datetime
+
+bp = Blueprint('routes', __name__, url_prefix='/routes')
+
+def route_unavailable():
+    return jsonify({
+        'success': False,
+        'error': 'Route estimation is not configured'
+    }), 503
+
+@bp.route('/estimate', methods=['GET'])
+def estimate_route():
+    """Estimate driving distance and time between two places or 'lat,lon' pairs"""
+    if not route_engine.path and not route_engine.loaded:
+        return route_unavailable()
+    
+    origin = request.args.get('from')
+    destination = request.args.get('to')
+    if not origin or not destination:
+        return jsonify({
+            'success': False,
+            'error': 'Both from and to are required'
+        }), 400
+    
+    origin_point = gazetteer.lookup(origin)
+    destination_point = gazetteer.lookup(destination)
+    if not origin_point or not destination_point:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown location. Use a known place name or lat,lon'
+        }), 400
+    
+    route = route_engine.estimate(origin_point, destination_point)
+    if not route:
+        return jsonify({
+            'success': False,
+            'error': 'No route found between these locations'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'route': route
+    }), 200
+
+@bp.route('/quote', methods=['GET'])
+def quote_route():
+    """Quote a rental: daily rate for the dates plus a per-km rate for the vehicle type"""
+    if not route_engine.path and not route_engine.loaded:
+        return route_unavailable()
+    
+    vehicle_id = request.args.get('vehicle_id', type=int)
+    destination = request.args.get('destination')
+    if not vehicle_id or not destination:
+        return jsonify({
+            'success': False,
+            'error': 'Both vehicle_id and destination are required'
+        }), 400
+    
+    vehicle = Vehicle.query.get(vehicle_id)
+    if not vehicle:
+        return jsonify({
+            'success': False,
+            'error': 'Vehicle not found'
+        }), 404
+    
+    pickup = gazetteer.lookup(vehicle.location)
+    if not pickup:
+        return jsonify({
+            'success': False,
+            'error': f'Pickup location is not geocoded: {vehicle.location}'
+        }), 400
+    
+    destination_point = gazetteer.lookup(destination)
+    if not destination_point:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown destination. Use a known place name or lat,lon'
+        }), 400
+    
+    # Rental days priced the same way as bookings.create_booking (default 1 day)
+    days = 1
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    if start_date and end_date:
+        try:
+            days = (datetime.fromisoformat(end_date) - datetime.fromisoformat(start_date)).days
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid date format. Use ISO format (e.g., 2025-06-01T10:00:00)'
+            }), 400
+        if days < 1:
+            return jsonify({
+                'success': False,
+                'error': 'End date must be at least one day after start date'
+            }), 400
+    
+    route = route_engine.estimate(pickup, destination_point)
+    if not route:
+        return jsonify({
+            'success': False,
+            'error': 'No route found to this destination'
+        }), 404
+    
+    rates = current_app.config['ROUTE_RATES_PER_KM']
+    rate_per_km = rates.get(vehicle.type, rates['default'])
+    rental_cost = days * vehicle.price_per_day
+    distance_cost = route['distance_km'] * rate_per_km
+    
+    return jsonify({
+        'success': True,
+        'quote': {
+            'vehicle_id': vehicle.id,
+            'pickup': vehicle.location,
+            'destination': destination,
+            'distance_km': route['distance_km'],
+            'duration_minutes': route['duration_minutes'],
+            'days': days,
+            'price_per_day': float(vehicle.price_per_day),
+            'rate_per_km': rate_per_km,
+            'rental_cost': round(rental_cost, 2),
+            'distance_cost': round(distance_cost, 2),
+            'total_price': round(rental_cost + distance_cost, 2)
+        }
+    }), 200
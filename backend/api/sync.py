@@ -0,0 +1,65 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models.vehicle import Vehicle
+from models.booking import Booking
+from models.tombstone import Tombstone
+from models.user import User
+from datetime import datetime, timedelta
+from services.querybudget import query_budget
+
+bp = Blueprint('sync', __name__, url_prefix='/sync')
+
+# Rows committed slightly after their updated_at timestamp must not fall
+# behind the watermark, so the returned watermark lags the server clock.
+WATERMARK_LAG = timedelta(seconds=2)
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+@query_budget(5)
+def get_changes():
+    """Get vehicles and bookings changed since a client watermark."""
+    current_user_id = get_jwt_identity()
+    current_user = User.query.get(current_user_id)
+    since = request.args.get('since')
+    
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid since format. Use ISO format (e.g., 2025-06-01T10:00:00)'
+            }), 400
+    
+    watermark = datetime.utcnow() - WATERMARK_LAG
+    
+    vehicles = Vehicle.query
+    bookings = Booking.query
+    tombstones = Tombstone.query
+    
+    # Customers only see their own bookings
+    if not current_user or not current_user.is_admin:
+        bookings = bookings.filter(Booking.user_id == current_user_id)
+        tombstones = tombstones.filter(
+            (Tombstone.entity_type == 'vehicle') | (Tombstone.user_id == current_user_id)
+        )
+    
+    # No watermark means a full sync, which never needs tombstones
+    if since:
+        vehicles = vehicles.filter(Vehicle.updated_at > since)
+        bookings = bookings.filter(Booking.updated_at > since)
+        tombstones = tombstones.filter(Tombstone.deleted_at > since).all()
+    else:
+        tombstones = []
+    
+    return jsonify({
+        'success': True,
+        'full': not since,
+        'vehicles': [vehicle.to_dict() for vehicle in vehicles.all()],
+        'bookings': [booking.to_dict() for booking in bookings.all()],
+        'deleted': {
+            'vehicles': [t.entity_id for t in tombstones if t.entity_type == 'vehicle'],
+            'bookings': [t.entity_id for t in tombstones if t.entity_type == 'booking']
+        },
+        'watermark': watermark.isoformat()
+    }), 200
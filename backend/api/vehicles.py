@@ -3,26 +3,52 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db
 from models.vehicle import Vehicle
 from models.user import User
+from models.booking import Booking
+from models.retirement import RetirementJob
+from models.maintenance import MaintenanceWindow
+from services import events
+from services.gazetteer import gazetteer
+from services.spatial import geocode_vehicle, nearest_available, MAX_SEARCH_KM
+from services.querybudget import query_budget
+from services.images import images
+from services.retirement import fleet_retirement
+from services.maintenance import maintenance
 from datetime import datetime
 
 bp = Blueprint('vehicles', __name__, url_prefix='/vehicles')
 
 @bp.route('', methods=['GET'])
+@query_budget(2)
 def get_vehicles():
-    """Get all vehicles"""
-    vehicles = Vehicle.query.all()
+    """Get all vehicles (only the columns ?fields= asks for, if given)"""
+    try:
+        fields = Vehicle.FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    vehicles = Vehicle.query.options(*Vehicle.FIELDS.load_only(Vehicle, fields)).all()
     return jsonify({
         'success': True,
-        'vehicles': [vehicle.to_dict() for vehicle in vehicles]
+        'vehicles': [vehicle.to_dict(fields=fields) for vehicle in vehicles]
     }), 200
 
 @bp.route('/<int:vehicle_id>', methods=['GET'])
+@query_budget(2)
 def get_vehicle(vehicle_id):
     """Get a specific vehicle by ID"""
-    vehicle = Vehicle.query.get_or_404(vehicle_id)
+    try:
+        fields = Vehicle.FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    vehicle = Vehicle.query.options(*Vehicle.FIELDS.load_only(Vehicle, fields)).get_or_404(vehicle_id)
     return jsonify({
         'success': True,
-        'vehicle': vehicle.to_dict()
+        'vehicle': vehicle.to_dict(fields=fields)
     }), 200
 
 @bp.route('', methods=['POST'])
@@ -51,6 +77,12 @@ def create_vehicle():
                 'error': f'Missing required field: {field}'
             }), 400
     
+    if data.get('image_hash') and not images.exists(data['image_hash']):
+        return jsonify({
+            'success': False,
+            'error': 'Unknown image_hash; upload the image to /api/images first'
+        }), 400
+    
     try:
         # Handle image_url and image_urls (support both for backward compatibility)
         image_url = data.get('image_url') or data.get('image_urls')
@@ -66,6 +98,7 @@ def create_vehicle():
             'location': data.get('location'),
             'description': data.get('description'),
             'image_url': image_url,
+            'image_hash': data.get('image_hash'),
             'owner_id': current_user_id,
             'is_available': data.get('is_available', True)
         }
@@ -74,6 +107,7 @@ def create_vehicle():
         
         # Create vehicle with explicit parameters
         vehicle = Vehicle(**vehicle_data)
+        geocode_vehicle(vehicle, data.get('latitude'), data.get('longitude'))
         
         db.session.add(vehicle)
         db.session.commit()
@@ -104,6 +138,12 @@ def update_vehicle(vehicle_id):
     vehicle = Vehicle.query.get_or_404(vehicle_id)
     data = request.get_json()
     
+    if data.get('image_hash') and not images.exists(data['image_hash']):
+        return jsonify({
+            'success': False,
+            'error': 'Unknown image_hash; upload the image to /api/images first'
+        }), 400
+    
     try:
         # Update fields if they exist in the request
         for field in ['make', 'model', 'year', 'type', 'price_per_day', 
@@ -114,9 +154,16 @@ def update_vehicle(vehicle_id):
         # Handle image_url and image_urls (support both for backward compatibility)
         if 'image_url' in data or 'image_urls' in data:
             vehicle.image_url = data.get('image_url') or data.get('image_urls')
+        if 'image_hash' in data:
+            vehicle.image_hash = data['image_hash'] or None
+        
+        # Re-geocode when the location or coordinates change
+        if 'location' in data or 'latitude' in data or 'longitude' in data:
+            geocode_vehicle(vehicle, data.get('latitude'), data.get('longitude'))
         
         vehicle.updated_at = datetime.utcnow()
         db.session.commit()
+        events.vehicle_changed(vehicle)
         
         return jsonify({
             'success': True,
@@ -143,7 +190,16 @@ def delete_vehicle(vehicle_id):
     
     vehicle = Vehicle.query.get_or_404(vehicle_id)
     
+    # Bookings keep their vehicle for history and payments; retire it instead
+    if db.session.query(Booking.query.filter_by(vehicle_id=vehicle.id).exists()).scalar():
+        return jsonify({
+            'success': False,
+            'error': 'Vehicle has bookings; take it out of service with POST /api/vehicles/retire instead'
+        }), 409
+    
     try:
+        for window in MaintenanceWindow.query.filter_by(vehicle_id=vehicle.id).all():
+            maintenance.delete(window)
         db.session.delete(vehicle)
         db.session.commit()
         
@@ -159,7 +215,90 @@ def delete_vehicle(vehicle_id):
             'error': str(e)
         }), 500
 
+@bp.route('/retire', methods=['POST'])
+@jwt_required()
+def retire_vehicles():
+    """Take vehicles out of service and cancel their future bookings (admin only)."""
+    current_user_id = get_jwt_identity()
+    current_user = User.query.get(current_user_id)
+    
+    if not current_user.is_admin:
+        return jsonify({"error": "Admin access required"}), 403
+    
+    data = request.get_json() or {}
+    vehicle_ids = data.get('vehicle_ids')
+    if not vehicle_ids or not isinstance(vehicle_ids, list) or not all(isinstance(v, int) for v in vehicle_ids):
+        return jsonify({
+            'success': False,
+            'error': 'vehicle_ids must be a non-empty list of ids'
+        }), 400
+    
+    try:
+        job = fleet_retirement.start(vehicle_ids, data.get('reason'), current_user_id)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    
+    for vehicle_id in job.to_dict()['vehicle_ids']:
+        events.hub.publish('vehicle.availability', {'vehicle_id': vehicle_id, 'is_available': False})
+    fleet_retirement.run_in_background(job.id)
+    
+    return jsonify({
+        'success': True,
+        'message': 'Retirement started',
+        'job': job.to_dict()
+    }), 202
+
+@bp.route('/retirements/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_retirement(job_id):
+    """Progress of a retirement job, with a page of its outcomes (admin only)."""
+    current_user = User.query.get(get_jwt_identity())
+    
+    if not current_user.is_admin:
+        return jsonify({"error": "Admin access required"}), 403
+    
+    job = RetirementJob.query.get_or_404(job_id)
+    after = request.args.get('after_booking_id', 0, type=int)
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    outcomes = fleet_retirement.outcomes(job.id, after, limit)
+    return jsonify({
+        'success': True,
+        'job': job.to_dict(),
+        'outcomes': [outcome.to_dict() for outcome in outcomes]
+    }), 200
+
+@bp.route('/retirements/<int:job_id>/resume', methods=['POST'])
+@jwt_required()
+def resume_retirement(job_id):
+    """Restart an interrupted or failed retirement job from its cursor (admin only)."""
+    current_user = User.query.get(get_jwt_identity())
+    
+    if not current_user.is_admin:
+        return jsonify({"error": "Admin access required"}), 403
+    
+    job = RetirementJob.query.get_or_404(job_id)
+    if job.status == 'completed':
+        return jsonify({
+            'success': False,
+            'error': 'Retirement job already completed'
+        }), 400
+    if job.status == 'failed':
+        job.status, job.error = 'running', None
+        db.session.commit()
+    
+    fleet_retirement.run_in_background(job.id)
+    return jsonify({
+        'success': True,
+        'message': 'Retirement resumed',
+        'job': job.to_dict()
+    }), 202
+
 @bp.route('/available', methods=['GET'])
+@query_budget(2)
 def get_available_vehicles():
     """Get vehicles available for specific dates"""
     start_date = request.args.get('start_date')
@@ -171,21 +310,25 @@ def get_available_vehicles():
             'error': 'Both start_date and end_date are required'
         }), 400
     
+    try:
+        fields = Vehicle.FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
     try:
         start = datetime.fromisoformat(start_date)
         end = datetime.fromisoformat(end_date)
         
-        # Get all available vehicles
-        available_vehicles = []
-        vehicles = Vehicle.query.filter_by(is_available=True).all()
-        
-        for vehicle in vehicles:
-            if vehicle.is_available_for_dates(start, end):
-                available_vehicles.append(vehicle)
+        # One query: availability and booking overlap are checked in SQL
+        available_vehicles = Vehicle.query.options(*Vehicle.FIELDS.load_only(Vehicle, fields)).filter(
+            Vehicle.available_for_dates_filter(start, end)).all()
         
         return jsonify({
             'success': True,
-            'vehicles': [v.to_dict() for v in available_vehicles],
+            'vehicles': [v.to_dict(fields=fields) for v in available_vehicles],
             'count': len(available_vehicles)
         }), 200
         
@@ -199,3 +342,58 @@ def get_available_vehicles():
             'success': False,
             'error': str(e)
         }), 500
+
+@bp.route('/nearby', methods=['GET'])
+@query_budget(8, max_repeats=8)
+def get_nearby_vehicles():
+    """Get the k nearest vehicles to a point, optionally free for specific dates"""
+    latitude = request.args.get('lat', type=float)
+    longitude = request.args.get('lon', type=float)
+    near = request.args.get('near')
+    k = min(request.args.get('k', 10, type=int), 100)
+    max_km = request.args.get('max_km', 50, type=float)
+    if not 0 < max_km <= MAX_SEARCH_KM:
+        return jsonify({
+            'success': False,
+            'error': f'max_km must be greater than 0 and at most {MAX_SEARCH_KM}'
+        }), 400
+    
+    if latitude is None or longitude is None:
+        point = gazetteer.lookup(near) if near else None
+        if not point:
+            return jsonify({
+                'success': False,
+                'error': 'Provide lat and lon, or a known place as near'
+            }), 400
+        latitude, longitude = point
+    
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    try:
+        start = datetime.fromisoformat(start_date) if start_date else None
+        end = datetime.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid date format. Use ISO format (e.g., 2025-06-01T10:00:00)'
+        }), 400
+    
+    try:
+        fields = Vehicle.FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    results = nearest_available(latitude, longitude, k, start, end, max_km,
+                                Vehicle.FIELDS.load_only(Vehicle, fields, 'latitude', 'longitude'))
+    
+    return jsonify({
+        'success': True,
+        'vehicles': [
+            dict(vehicle.to_dict(fields=fields), distance_km=round(distance / 1000, 2))
+            for distance, vehicle in results
+        ],
+        'count': len(results)
+    }), 200
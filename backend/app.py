@@ -1,4 +1,4 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, g
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from datetime import datetime, timedelta
@@ -8,24 +8,193 @@ from functools import wraps
 
 # Import db from models to avoid circular imports
 from models import db, init_app as init_models
+from readiness import warm_up, readiness_report
+from services.events import hub as event_hub
+from services.ratelimit import limiter
+from services.archive import archiver
+from services.gazetteer import gazetteer
+from services.routing import route_engine
+from services import spatial, reconciliation, overlaps, schema
+from services.revocation import revocations
+from services.querybudget import budgets as query_budgets
+from services.holds import holds
+from services.profiler import profiler
+from services.slowqueries import slow_queries
+from services.eventlog import event_log
+from services.outbox import outbox
+from services.images import images
+from services.retirement import fleet_retirement
+from services.maintenance import maintenance
+from services.analytics import analytics
+from services.compression import compressor
 
 # Initialize JWT
 jwt = JWTManager()
 
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    """Reject revoked tokens (in-memory filter, DB only on a filter hit)."""
+    jti = jwt_payload['jti']
+    # Batched sub-requests share g, so a token is only checked once per batch
+    if g.get('token_checked') == jti:
+        return False
+    revoked = revocations.is_revoked(jti)
+    if not revoked:
+        g.token_checked = jti
+    return revoked
+
 def create_app():
     """Create and configure the Flask application."""
     app = Flask(__name__)
     
     # Basic configuration
     app.config['SECRET_KEY'] = 'your-secret-key-here'
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///ranger_rentals.db'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///ranger_rentals.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    
+    # Read replicas, e.g. SQLALCHEMY_REPLICA_URLS=sqlite:///replica_1.db,sqlite:///replica_2.db
+    replica_urls = [url for url in os.environ.get('SQLALCHEMY_REPLICA_URLS', '').split(',') if url]
+    app.config['SQLALCHEMY_BINDS'] = {f'replica_{i}': url for i, url in enumerate(replica_urls, 1)}
+    app.config['SQLALCHEMY_REPLICAS'] = list(app.config['SQLALCHEMY_BINDS'])
+    
+    # Archive storage for closed bookings (may point at the primary database)
+    app.config['SQLALCHEMY_BINDS']['archive'] = os.environ.get('ARCHIVE_DATABASE_URL', 'sqlite:///ranger_rentals_archive.db')
+    app.config['ARCHIVE_HORIZON_DAYS'] = int(os.environ.get('ARCHIVE_HORIZON_DAYS', 180))
+    app.config['ARCHIVE_BATCH_SIZE'] = 500
+    
+    # Offline geocoding and route estimation (see services/routing.py for the file format)
+    app.config['GAZETTEER_FILE'] = os.environ.get('GAZETTEER_FILE')
+    app.config['ROUTE_GRAPH_FILE'] = os.environ.get('ROUTE_GRAPH_FILE')
+    app.config['ROUTE_CACHE_SIZE'] = 10000
+    app.config['ROUTE_RATES_PER_KM'] = {
+        'Sedan': 0.25,
+        'SUV': 0.35,
+        'Truck': 0.50,
+        'default': 0.30
+    }
     app.config['JWT_SECRET_KEY'] = 'jwt-secret-key'
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
+    app.config['REVOCATION_FILTER_CAPACITY'] = 100000
+    app.config['REVOCATION_SYNC_SECONDS'] = 60
+    
+    # Event push channel ('local' for one process, 'socket' to fan out across workers)
+    app.config['EVENTS_BACKEND'] = os.environ.get('EVENTS_BACKEND', 'local')
+    app.config['EVENTS_SOCKET_DIR'] = os.environ.get('EVENTS_SOCKET_DIR', '/tmp/ranger-events')
+    app.config['EVENTS_QUEUE_SIZE'] = 100
+    app.config['EVENTS_HEARTBEAT'] = 15
+    
+    # Rate limiting (set RATELIMIT_STORAGE_URL to a redis:// URL to share buckets across workers)
+    app.config['RATELIMIT_ENABLED'] = os.environ.get('RATELIMIT_ENABLED', '1') == '1'
+    app.config['RATELIMIT_STORAGE_URL'] = os.environ.get('RATELIMIT_STORAGE_URL')
+    app.config['RATELIMIT_LOGIN_PER_IP'] = '20/minute'
+    app.config['RATELIMIT_LOGIN_PER_ACCOUNT'] = '5/minute'
+    app.config['RATELIMIT_REGISTER_PER_IP'] = '5/minute'
+    app.config['RATELIMIT_BLUEPRINT_LIMITS'] = {
+        'bookings': '120/minute',
+        'payments': '60/minute'
+    }
+    
+    # Query budgets ('raise' fails the request, 'warn' prints for a sample; default: raise under testing)
+    app.config['QUERY_BUDGET_MODE'] = os.environ.get('QUERY_BUDGET_MODE')
+    app.config['QUERY_BUDGET_DEFAULT'] = None  # per-endpoint budgets come from @query_budget
+    app.config['QUERY_BUDGET_REPEAT_THRESHOLD'] = 5
+    app.config['QUERY_BUDGET_SAMPLE_RATE'] = float(os.environ.get('QUERY_BUDGET_SAMPLE_RATE', 0.01))
+    
+    # Slow query log (one JSON line per new statement shape, with its EXPLAIN plan)
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+    app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG')  # default: instance/slow_queries.log
+    app.config['SLOW_QUERY_EXPLAIN'] = True
+    app.config['SLOW_QUERY_RELOG_SECONDS'] = 3600
+    app.config['SLOW_QUERY_MAX_FINGERPRINTS'] = 1000
+    
+    # Request profiling: send X-Profile: <PROFILE_TOKEN>, or sample a fraction of requests
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', 'profiles')
+    app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN')
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_MODE'] = os.environ.get('PROFILE_MODE', 'sample')  # or 'trace' (exact, slower)
+    app.config['PROFILE_INTERVAL_MS'] = 1
+    app.config['PROFILE_FORMAT'] = os.environ.get('PROFILE_FORMAT', 'collapsed')  # or 'speedscope'
+    app.config['PROFILE_MAX_FILES'] = 100
+    
+    # Append-only log of booking, payment and vehicle state transitions
+    app.config['EVENT_LOG_ENABLED'] = os.environ.get('EVENT_LOG_ENABLED', '1') == '1'
+    
+    # Notification outbox ('thread' dispatches in each worker; 'off' leaves it to `flask outbox dispatch`)
+    app.config['OUTBOX_DISPATCHER'] = os.environ.get('OUTBOX_DISPATCHER', 'thread')
+    app.config['OUTBOX_BATCH_SIZE'] = 50
+    app.config['OUTBOX_MAX_ATTEMPTS'] = 6
+    app.config['OUTBOX_BACKOFF_SECONDS'] = 30  # doubled per attempt
+    app.config['OUTBOX_BACKOFF_MAX_SECONDS'] = 3600
+    app.config['OUTBOX_POLL_SECONDS'] = 5
+    app.config['OUTBOX_CLAIM_TIMEOUT'] = 300
+    
+    # SMTP for email notifications (unset: notifications are printed)
+    app.config['SMTP_HOST'] = os.environ.get('SMTP_HOST')
+    app.config['SMTP_PORT'] = int(os.environ.get('SMTP_PORT', 25))
+    app.config['SMTP_USERNAME'] = os.environ.get('SMTP_USERNAME')
+    app.config['SMTP_PASSWORD'] = os.environ.get('SMTP_PASSWORD')
+    app.config['SMTP_STARTTLS'] = os.environ.get('SMTP_STARTTLS', '0') == '1'
+    app.config['SMTP_SENDER'] = os.environ.get('SMTP_SENDER', 'no-reply@ranger.com')
+    
+    # Uploaded vehicle images and their resized variants (rendered in the background)
+    app.config['IMAGE_DIR'] = os.environ.get('IMAGE_DIR', 'media')
+    app.config['IMAGE_VARIANTS'] = {'thumb': (160, 120), 'card': (480, 320)}
+    app.config['IMAGE_VARIANT_FORMAT'] = 'WEBP'
+    app.config['IMAGE_VARIANT_QUALITY'] = 80
+    app.config['IMAGE_MAX_BYTES'] = 10 * 1024 * 1024
+    app.config['IMAGE_WORKERS'] = 2
+    
+    # Fleet retirement jobs (bookings cancelled per batch; resumable)
+    app.config['RETIREMENT_BATCH_SIZE'] = 500
+    app.config['RETIREMENT_LEASE_SECONDS'] = 60
+    
+    # Maintenance windows (recurring ones are stored this many days ahead)
+    app.config['MAINTENANCE_HORIZON_DAYS'] = int(os.environ.get('MAINTENANCE_HORIZON_DAYS', 730))
+    app.config['MAINTENANCE_MAX_OCCURRENCES'] = 5000
+    
+    # Utilization and demand forecasts (cached per worker, refreshed incrementally)
+    app.config['ANALYTICS_HISTORY_DAYS'] = int(os.environ.get('ANALYTICS_HISTORY_DAYS', 365))
+    app.config['ANALYTICS_FORECAST_DAYS'] = 14
+    app.config['ANALYTICS_REFRESH_SECONDS'] = int(os.environ.get('ANALYTICS_REFRESH_SECONDS', 60))
+    
+    # Response compression (brotli when installed, else gzip)
+    app.config['COMPRESS_ENABLED'] = os.environ.get('COMPRESS_ENABLED', '1') != '0'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    app.config['COMPRESS_LEVEL'] = 6
+    app.config['COMPRESS_BROTLI_QUALITY'] = 4
+    
+    # Checkout holds (in memory until paid for)
+    app.config['HOLD_TTL_MINUTES'] = int(os.environ.get('HOLD_TTL_MINUTES', 10))
+    app.config['HOLD_MAX_PER_USER'] = 3
+    
+    # Batch endpoint limits
+    app.config['BATCH_MAX_REQUESTS'] = 20
+    app.config['BATCH_MAX_WORKERS'] = 4  # threads for concurrent reads
     
     # Initialize extensions
     init_models(app)  # Initialize models and database
+    schema.init_app(app)
     jwt.init_app(app)
+    event_hub.init_app(app)
+    limiter.init_app(app)
+    archiver.init_app(app)
+    gazetteer.init_app(app)
+    route_engine.init_app(app)
+    spatial.init_app(app)
+    revocations.init_app(app)
+    reconciliation.init_app(app)
+    overlaps.init_app(app)
+    query_budgets.init_app(app)
+    holds.init_app(app)
+    profiler.init_app(app)
+    slow_queries.init_app(app)
+    event_log.init_app(app)
+    outbox.init_app(app)
+    images.init_app(app)
+    fleet_retirement.init_app(app)
+    maintenance.init_app(app)
+    analytics.init_app(app)
+    compressor.init_app(app)
     CORS(app)
     
     # Import models after db is initialized
@@ -33,6 +202,13 @@ def create_app():
     from models.vehicle import Vehicle
     from models.booking import Booking
     from models.payment import Payment
+    from models.tombstone import Tombstone
+    from models.archive import BookingArchive, PaymentArchive
+    from models.revoked_token import RevokedToken
+    from models.entity_event import EntityEvent
+    from models.outbox import OutboxMessage
+    from models.retirement import RetirementJob, RetirementOutcome
+    from models.maintenance import MaintenanceWindow, MaintenanceBlackout
     
     # Import and register blueprints
     from api import api as api_blueprint
@@ -40,8 +216,14 @@ def create_app():
     
     # Create database tables and admin user
     with app.app_context():
-        # Create all database tables
+        # Create all database tables, then add columns and indexes newer than an existing table
         db.create_all()
+        try:
+            added = schema.upgrade()
+            if added:
+                print(f"Schema upgraded: added {', '.join(added)}")
+        except Exception as e:
+            print(f"Schema upgrade failed: {str(e)}")
         
         try:
             # Create admin user if it doesn't exist
@@ -73,6 +255,15 @@ def create_app():
             'timestamp': datetime.utcnow().isoformat()
         })
     
+    # Readiness endpoint - only 200 once the DB pool and caches are warm
+    @app.route('/ready')
+    def readiness_check():
+        report = readiness_report()
+        return jsonify(report), 200 if report['ready'] else 503
+    
+    # Warm before returning so a preloading server shares the warm state
+    warm_up(app)
+    
     return app
 
 # Create the application instance
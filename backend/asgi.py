@@ -0,0 +1,274 @@
+"""
+ASGI entry point for the Ranger Rentals application.
+
+The public, read-only catalog endpoints are served natively with an async
+SQLAlchemy engine so slow queries don't pin a worker thread:
+
+    GET /api/vehicles
+    GET /api/vehicles/<id>
+    GET /api/vehicles/available
+
+The event stream (GET /api/events) is also served natively, so idle
+dashboard connections cost a coroutine and a small queue instead of a thread.
+
+Every other request (including the booking and payment writes) is handed to
+the regular Flask app. Run with:
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import re
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+from flask_jwt_extended import decode_token
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app import app as flask_app
+from models import db
+from models.vehicle import Vehicle
+from models.user import User
+from services.events import hub, AsyncSubscriber, format_sse
+from services.compression import compressor
+from services.revocation import revocations
+
+# Sync driver -> async driver used for the catalog read path
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+    'mysql': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+}
+
+
+def create_async_session_factory(app):
+    """Build an async engine/session factory pointing at the app's database."""
+    with app.app_context():
+        url = db.engine.url
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+    engine = create_async_engine(url)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+engine, AsyncSession = create_async_session_factory(flask_app)
+
+
+def requested_fields(query):
+    """Vehicle fields asked for with ?fields= (None for all); ValueError if unknown."""
+    return Vehicle.FIELDS.parse(query.get('fields', [None])[0])
+
+
+async def get_vehicles(session, query):
+    """Get all vehicles"""
+    fields = requested_fields(query)
+    result = await session.scalars(select(Vehicle).options(*Vehicle.FIELDS.load_only(Vehicle, fields)))
+    vehicles = result.all()
+    return 200, {
+        'success': True,
+        'vehicles': [vehicle.to_dict(fields=fields) for vehicle in vehicles]
+    }
+
+
+async def get_vehicle(session, query, vehicle_id):
+    """Get a specific vehicle by ID"""
+    fields = requested_fields(query)
+    vehicle = await session.get(Vehicle, vehicle_id, options=Vehicle.FIELDS.load_only(Vehicle, fields))
+    if not vehicle:
+        return 404, {
+            'success': False,
+            'error': 'Vehicle not found'
+        }
+    return 200, {
+        'success': True,
+        'vehicle': vehicle.to_dict(fields=fields)
+    }
+
+
+async def get_available_vehicles(session, query):
+    """Get vehicles available for specific dates"""
+    start_date = query.get('start_date', [None])[0]
+    end_date = query.get('end_date', [None])[0]
+
+    if not start_date or not end_date:
+        return 400, {
+            'success': False,
+            'error': 'Both start_date and end_date are required'
+        }
+
+    try:
+        start = datetime.fromisoformat(start_date)
+        end = datetime.fromisoformat(end_date)
+    except ValueError:
+        return 400, {
+            'success': False,
+            'error': 'Invalid date format. Use ISO format (e.g., 2025-06-01T10:00:00)'
+        }
+
+    fields = requested_fields(query)
+    result = await session.scalars(
+        select(Vehicle).options(*Vehicle.FIELDS.load_only(Vehicle, fields))
+        .where(Vehicle.available_for_dates_filter(start, end))
+    )
+    vehicles = result.all()
+
+    return 200, {
+        'success': True,
+        'vehicles': [v.to_dict(fields=fields) for v in vehicles],
+        'count': len(vehicles)
+    }
+
+
+ROUTES = [
+    (re.compile(r'^/api/vehicles/?$'), get_vehicles),
+    (re.compile(r'^/api/vehicles/available/?$'), get_available_vehicles),
+    (re.compile(r'^/api/vehicles/(\d+)/?$'), get_vehicle),
+]
+
+
+def match_route(scope):
+    """Return (handler, args) for an async catalog route, or None."""
+    if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD'):
+        return None
+    for pattern, handler in ROUTES:
+        match = pattern.match(scope['path'])
+        if match:
+            return handler, [int(arg) for arg in match.groups()]
+    return None
+
+
+async def send_json(send, status, payload, head=False, accept_encoding=None):
+    body = json.dumps(payload).encode('utf-8')
+    body, encoding = compressor.encode(body, accept_encoding)
+    headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode('ascii')),
+        (b'access-control-allow-origin', b'*'),
+        (b'vary', b'Accept-Encoding'),
+    ]
+    if encoding:
+        headers.append((b'content-encoding', encoding.encode('ascii')))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers
+    })
+    await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+
+def get_token(scope, query):
+    """Read a bearer token from the Authorization header or ?jwt=."""
+    for name, value in scope.get('headers', []):
+        if name == b'authorization' and value.lower().startswith(b'bearer '):
+            return value[7:].decode('latin-1')
+    return query.get('jwt', [None])[0]
+
+
+def authenticate(token):
+    """The token's user id, or None if it has been revoked (as the Flask blocklist loader checks)."""
+    with flask_app.app_context():
+        claims = decode_token(token)
+        if revocations.is_revoked(claims['jti']):
+            return None
+        return claims['sub']
+
+
+async def stream_events(scope, receive, send, query):
+    """Stream availability and booking status events (Server-Sent Events)."""
+    user_id, is_admin = None, False
+    token = get_token(scope, query)
+    if token:
+        try:
+            # May confirm a revocation on the primary, so off the event loop
+            user_id = await asyncio.to_thread(authenticate, token)
+        except Exception:
+            return await send_json(send, 401, {'msg': 'Invalid token'})
+        if user_id is None:
+            return await send_json(send, 401, {'msg': 'Token has been revoked'})
+        # The only query for the lifetime of the connection
+        async with AsyncSession() as session:
+            user = await session.get(User, user_id)
+            is_admin = bool(user and user.is_admin)
+
+    ready = asyncio.Event()
+    subscriber = hub.subscribe(subscriber=AsyncSubscriber(
+        asyncio.get_running_loop(), ready, user_id=user_id, is_admin=is_admin
+    ))
+
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscriber.close('disconnected')
+
+    watcher = asyncio.ensure_future(wait_disconnect())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+                (b'access-control-allow-origin', b'*'),
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+        while not subscriber.closed:
+            try:
+                await asyncio.wait_for(ready.wait(), hub.heartbeat)
+            except asyncio.TimeoutError:
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                continue
+            ready.clear()
+            chunk = ''.join(format_sse(event) for event in subscriber.drain())
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+        if subscriber.reason != 'disconnected':
+            message = f"event: evicted\ndata: {subscriber.reason or 'closed'}\n\n"
+            await send({'type': 'http.response.body', 'body': message.encode('utf-8')})
+    finally:
+        watcher.cancel()
+        hub.unsubscribe(subscriber)
+
+
+wsgi_application = WsgiToAsgi(flask_app)
+
+
+async def application(scope, receive, send):
+    """ASGI app: async catalog reads, everything else falls through to Flask."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'].rstrip('/') == '/api/events':
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        return await stream_events(scope, receive, send, query)
+
+    route = match_route(scope)
+    if route is None:
+        return await wsgi_application(scope, receive, send)
+
+    handler, args = route
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    try:
+        async with AsyncSession() as session:
+            status, payload = await handler(session, query, *args)
+    except ValueError as e:
+        status, payload = 400, {'success': False, 'error': str(e)}
+    except Exception as e:
+        status, payload = 500, {'success': False, 'error': str(e)}
+
+    accept_encoding = next((value.decode('latin-1') for name, value in scope.get('headers', [])
+                            if name == b'accept-encoding'), None)
+    await send_json(send, status, payload, head=scope['method'] == 'HEAD', accept_encoding=accept_encoding)
@@ -0,0 +1,70 @@
+"""
+Production server configuration for the Ranger Rentals application.
+
+Usage:
+    gunicorn -c gunicorn.conf.py
+
+Every setting can be overridden through the environment, e.g.
+WEB_WORKERS=8 WEB_THREADS=2 gunicorn -c gunicorn.conf.py
+"""
+
+import os
+import signal
+import multiprocessing
+
+wsgi_app = 'app:app'
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+
+# Worker and thread count
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Load the app once in the master so forked workers share its memory copy-on-write
+preload_app = True
+
+# Recycle each worker after N requests (plus jitter so they don't all restart together)
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', max_requests // 10))
+
+# Time a worker gets to finish in-flight requests after SIGTERM
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+errorlog = os.environ.get('WEB_ERROR_LOG', '-')
+
+
+def post_fork(server, worker):
+    """Drop pooled connections inherited from the master and re-warm."""
+    from app import app
+    from models import db
+    from readiness import warm_up
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    warm_up(app)
+
+
+def post_worker_init(worker):
+    """Report not-ready as soon as SIGTERM arrives, then drain as usual."""
+    from readiness import mark_draining
+
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_term(signum, frame):
+        mark_draining()
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_term)
+
+
+def worker_exit(server, worker):
+    """Release pooled connections when a worker is recycled or stopped."""
+    from app import app
+    from models import db
+
+    with app.app_context():
+        db.engine.dispose()
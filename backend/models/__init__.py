@@ -1,18 +1,29 @@
 from flask_sqlalchemy import SQLAlchemy
+from services.replicas import RoutingSession, router as replica_router
 
 # Initialize SQLAlchemy with session options
 db = SQLAlchemy(session_options={
-    'expire_on_commit': False
+    'expire_on_commit': False,
+    'class_': RoutingSession  # Sends read-only requests to replicas, if configured
 })
 
 def init_app(app):
     """Initialize the database with the Flask app."""
     db.init_app(app)
+    replica_router.init_app(app, db)
     with app.app_context():
         # Import models here to avoid circular imports
         from .user import User
         from .vehicle import Vehicle
         from .booking import Booking
         from .payment import Payment
+        from .tombstone import Tombstone, register_listeners
+        from .archive import BookingArchive, PaymentArchive
+        from .revoked_token import RevokedToken
+        from .entity_event import EntityEvent
+        from .outbox import OutboxMessage
+        from .retirement import RetirementJob, RetirementOutcome
+        from .maintenance import MaintenanceWindow, MaintenanceBlackout
+        register_listeners()
     
-    return db
\ No newline at end of file
+    return db
@@ -0,0 +1,64 @@
+from . import db
+from .booking import Booking
+from .fieldsets import field
+from datetime import datetime
+
+class BookingArchive(db.Model):
+    """Closed booking moved out of the hot bookings table."""
+    __tablename__ = 'bookings_archive'
+    __bind_key__ = 'archive'
+
+    id = db.Column(db.Integer, primary_key=True)  # Same id as the original booking
+    vehicle_id = db.Column(db.Integer, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    start_date = db.Column(db.DateTime, nullable=False)
+    end_date = db.Column(db.DateTime, nullable=False)
+    total_price = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    FIELDS = Booking.FIELDS.extend(archived=field(render=lambda b: True))
+
+    def to_dict(self, fields=None):
+        """Convert archived booking to the same shape as Booking.to_dict."""
+        return self.FIELDS.serialize(self, fields)
+
+    def __repr__(self):
+        return f'<BookingArchive {self.id} - {self.start_date} to {self.end_date}>'
+
+
+class PaymentArchive(db.Model):
+    """Payment of an archived booking."""
+    __tablename__ = 'payments_archive'
+    __bind_key__ = 'archive'
+
+    id = db.Column(db.Integer, primary_key=True)  # Same id as the original payment
+    user_id = db.Column(db.Integer, nullable=False)
+    booking_id = db.Column(db.Integer, nullable=False, index=True)
+    amount = db.Column(db.Float, nullable=False)
+    payment_method = db.Column(db.String(50), nullable=False)
+    transaction_id = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        """Convert archived payment to the same shape as Payment.to_dict."""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'booking_id': self.booking_id,
+            'amount': self.amount,
+            'payment_method': self.payment_method,
+            'transaction_id': self.transaction_id,
+            'status': self.status,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+            'archived': True
+        }
+
+    def __repr__(self):
+        return f'<PaymentArchive {self.transaction_id} - {self.amount}>'
@@ -1,39 +1,47 @@
 from datetime import datetime, timedelta
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, exists
 from . import db
+from .fieldsets import Fieldset, field, iso
 
 class Booking(db.Model):
     """Booking model for vehicle reservations."""
     __tablename__ = 'bookings'
+    __table_args__ = (
+        # Overlap checks and the double-booking audit scan a vehicle's bookings by start
+        db.Index('ix_bookings_vehicle_start', 'vehicle_id', 'start_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     start_date = db.Column(db.DateTime, nullable=False)
     end_date = db.Column(db.DateTime, nullable=False)
     total_price = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default='pending')  # 'pending', 'confirmed', 'cancelled', 'completed'
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
     
     # Relationships
     vehicle = db.relationship('Vehicle', backref=db.backref('bookings', lazy=True))
     payments = db.relationship('Payment', backref='booking', lazy=True)
     
-    def to_dict(self):
-        """Convert booking to dictionary."""
-        return {
-            'id': self.id,
-            'vehicle_id': self.vehicle_id,
-            'user_id': self.user_id,
-            'start_date': self.start_date.isoformat(),
-            'end_date': self.end_date.isoformat(),
-            'total_price': float(self.total_price),
-            'status': self.status,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'duration_days': (self.end_date - self.start_date).days
-        }
+    # to_dict keys and the columns they read (?fields=)
+    FIELDS = Fieldset(
+        id=field('id'),
+        vehicle_id=field('vehicle_id'),
+        user_id=field('user_id'),
+        start_date=field('start_date', render=lambda b: iso(b.start_date)),
+        end_date=field('end_date', render=lambda b: iso(b.end_date)),
+        total_price=field('total_price', render=lambda b: float(b.total_price)),
+        status=field('status'),
+        created_at=field('created_at', render=lambda b: iso(b.created_at)),
+        updated_at=field('updated_at', render=lambda b: iso(b.updated_at)),
+        duration_days=field('start_date', 'end_date', render=lambda b: (b.end_date - b.start_date).days)
+    )
+    
+    def to_dict(self, fields=None):
+        """Convert booking to dictionary (only the given fields, if any)."""
+        return self.FIELDS.serialize(self, fields)
         
     def is_available(self):
         """Check if the booking dates are available."""
@@ -55,7 +63,7 @@ class Booking(db.Model):
         return f'<Booking {self.id} - {self.start_date} to {self.end_date}>'
     
     @classmethod
-    def is_vehicle_available(cls, vehicle_id, start_date, end_date):
+    def is_vehicle_available(cls, vehicle_id, start_date, end_date, user_id=None, exclude_booking_id=None):
         """
         Check if a vehicle is available for the given date range
         
@@ -63,6 +71,8 @@ class Booking(db.Model):
             vehicle_id: ID of the vehicle to check
             start_date: Start date (datetime or ISO format string)
             end_date: End date (datetime or ISO format string)
+            user_id: Customer booking it; their own checkout holds don't block them
+            exclude_booking_id: Booking being rescheduled, ignored in the overlap check
             
         Returns:
             bool: True if vehicle is available, False otherwise
@@ -77,30 +87,47 @@ class Booking(db.Model):
         if start_date >= end_date:
             return False
             
-        # Check for any overlapping bookings
-        overlapping_booking = cls.query.filter(
-            cls.vehicle_id == vehicle_id,
-            cls.status.in_(['confirmed', 'pending']),  # Consider both confirmed and pending bookings
-            or_(
+        def overlaps(model):
+            return or_(
                 # Existing booking starts during the requested period
                 and_(
-                    cls.start_date >= start_date,
-                    cls.start_date < end_date
+                    model.start_date >= start_date,
+                    model.start_date < end_date
                 ),
                 # Existing booking ends during the requested period
                 and_(
-                    cls.end_date > start_date,
-                    cls.end_date <= end_date
+                    model.end_date > start_date,
+                    model.end_date <= end_date
                 ),
                 # Existing booking completely contains the requested period
                 and_(
-                    cls.start_date <= start_date,
-                    cls.end_date >= end_date
+                    model.start_date <= start_date,
+                    model.end_date >= end_date
                 )
             )
-        ).first()
         
-        return overlapping_booking is None
+        # Check for any overlapping bookings
+        overlapping_booking = exists().where(
+            cls.vehicle_id == vehicle_id,
+            cls.status.in_(['confirmed', 'pending']),  # Consider both confirmed and pending bookings
+            overlaps(cls)
+        )
+        if exclude_booking_id is not None:
+            overlapping_booking = overlapping_booking.where(cls.id != exclude_booking_id)
+        
+        # Maintenance occurrences block the vehicle like bookings do (same query)
+        from .maintenance import MaintenanceBlackout
+        in_maintenance = exists().where(
+            MaintenanceBlackout.vehicle_id == vehicle_id,
+            overlaps(MaintenanceBlackout)
+        )
+        
+        if db.session.query(or_(overlapping_booking, in_maintenance)).scalar():
+            return False
+        
+        # Another customer may be paying for these dates right now
+        from services.holds import holds
+        return not holds.conflicts(vehicle_id, start_date, end_date, user_id)
         
     @classmethod
     def get_vehicle_bookings(cls, vehicle_id, start_date=None, end_date=None, status=None):
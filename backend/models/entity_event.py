@@ -0,0 +1,33 @@
+from . import db
+from datetime import datetime
+import json
+
+class EntityEvent(db.Model):
+    """Immutable record of one state transition of a booking, payment or vehicle."""
+    __tablename__ = 'entity_events'
+    __table_args__ = (
+        db.Index('ix_entity_events_entity', 'entity_type', 'entity_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(20), nullable=False)  # 'booking', 'payment', 'vehicle'
+    entity_id = db.Column(db.Integer, nullable=False)
+    event = db.Column(db.String(20), nullable=False)  # 'created', 'updated', 'deleted'
+    data = db.Column(db.Text, nullable=False)  # JSON of the new values of changed fields
+    actor_id = db.Column(db.Integer, nullable=True)  # User whose request made the change
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        """Convert event to dictionary."""
+        return {
+            'id': self.id,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'event': self.event,
+            'data': json.loads(self.data),
+            'actor_id': self.actor_id,
+            'created_at': self.created_at.isoformat()
+        }
+
+    def __repr__(self):
+        return f'<EntityEvent {self.entity_type} {self.entity_id} {self.event}>'
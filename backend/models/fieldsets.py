@@ -0,0 +1,58 @@
+"""
+Sparse fieldsets (``?fields=``) for the model serializers.
+
+A model's FIELDS lists each key its to_dict emits, the columns it reads and
+how it is rendered. Views parse ``?fields=id,make,price_per_day`` against it
+and pass ``load_only`` for those columns to the query, so the columns no
+requested field needs are never selected. to_dict(fields=...) then renders
+only the requested keys and touches no other attribute, which would
+otherwise lazy-load the column row by row.
+"""
+
+from sqlalchemy.orm import load_only
+
+
+def iso(value):
+    return value.isoformat() if value else None
+
+
+def field(*columns, render=None):
+    """A serialized key reading `columns`; by default the first column's value as is."""
+    if render is None:
+        name = columns[0]
+        render = lambda obj: getattr(obj, name)
+    return columns, render
+
+
+class Fieldset:
+    """The keys a serializer emits, in order, and the columns behind each."""
+
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def extend(self, **fields):
+        return Fieldset(**self.fields, **fields)
+
+    def parse(self, raw):
+        """Requested field names from a ?fields= value, in serializer order; None for all."""
+        if not raw:
+            return None
+        requested = {name.strip() for name in raw.split(',') if name.strip()}
+        unknown = sorted(requested - self.fields.keys())
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(self.fields)}")
+        return [name for name in self.fields if name in requested]
+
+    def load_only(self, model, fields, *always):
+        """Query options selecting only the columns `fields` (plus `always`) read."""
+        if fields is None:
+            return []
+        columns = dict.fromkeys(('id',) + always)
+        for name in fields:
+            if name in self.fields:  # a wider fieldset's key (e.g. 'archived') reads nothing here
+                columns.update(dict.fromkeys(self.fields[name][0]))
+        return [load_only(*(getattr(model, column) for column in columns))]
+
+    def serialize(self, obj, fields=None):
+        return {name: render(obj) for name, (columns, render) in self.fields.items()
+                if fields is None or name in fields}
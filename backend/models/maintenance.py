@@ -0,0 +1,63 @@
+from . import db
+from datetime import datetime
+
+class MaintenanceWindow(db.Model):
+    """Scheduled time a vehicle is out of service, optionally recurring."""
+    __tablename__ = 'maintenance_windows'
+
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False, index=True)
+    start_date = db.Column(db.DateTime, nullable=False)  # First occurrence
+    end_date = db.Column(db.DateTime, nullable=False)
+    recurrence = db.Column(db.String(10))  # None, 'daily', 'weekly', 'monthly'
+    interval = db.Column(db.Integer, default=1, nullable=False)  # Every n days/weeks/months
+    until = db.Column(db.DateTime)  # No occurrence starts after this (None: open-ended)
+    expanded_until = db.Column(db.DateTime)  # Occurrences are stored up to here
+    reason = db.Column(db.String(255))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    blackouts = db.relationship('MaintenanceBlackout', backref='window', lazy=True,
+                                cascade='all, delete-orphan', passive_deletes=True)
+
+    def to_dict(self):
+        """Convert maintenance window to dictionary."""
+        return {
+            'id': self.id,
+            'vehicle_id': self.vehicle_id,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'recurrence': self.recurrence,
+            'interval': self.interval,
+            'until': self.until.isoformat() if self.until else None,
+            'reason': self.reason,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat()
+        }
+
+    def __repr__(self):
+        return f'<MaintenanceWindow {self.id} vehicle {self.vehicle_id}>'
+
+
+class MaintenanceBlackout(db.Model):
+    """One occurrence of a maintenance window, checked like a booking."""
+    __tablename__ = 'maintenance_blackouts'
+    __table_args__ = (
+        db.Index('ix_maintenance_blackouts_vehicle_dates', 'vehicle_id', 'start_date', 'end_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    window_id = db.Column(db.Integer, db.ForeignKey('maintenance_windows.id', ondelete='CASCADE'),
+                          nullable=False, index=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    start_date = db.Column(db.DateTime, nullable=False)
+    end_date = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        """Convert blackout to dictionary."""
+        return {
+            'window_id': self.window_id,
+            'vehicle_id': self.vehicle_id,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat()
+        }
@@ -1,4 +1,5 @@
 from . import db
+from .fieldsets import Fieldset, field, iso
 from datetime import datetime
 
 class Payment(db.Model):
@@ -7,7 +8,7 @@ class Payment(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=False, index=True)
     amount = db.Column(db.Float, nullable=False)
     payment_method = db.Column(db.String(50), nullable=False)  # e.g., 'credit_card', 'paypal'
     transaction_id = db.Column(db.String(100), unique=True, nullable=False)
@@ -23,19 +24,22 @@ class Payment(db.Model):
         self.status = status
         self.transaction_id = f"TXN{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
 
-    def to_dict(self):
-        """Convert payment object to dictionary."""
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'booking_id': self.booking_id,
-            'amount': self.amount,
-            'payment_method': self.payment_method,
-            'transaction_id': self.transaction_id,
-            'status': self.status,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+    # to_dict keys and the columns they read (?fields=)
+    FIELDS = Fieldset(
+        id=field('id'),
+        user_id=field('user_id'),
+        booking_id=field('booking_id'),
+        amount=field('amount'),
+        payment_method=field('payment_method'),
+        transaction_id=field('transaction_id'),
+        status=field('status'),
+        created_at=field('created_at', render=lambda p: iso(p.created_at)),
+        updated_at=field('updated_at', render=lambda p: iso(p.updated_at))
+    )
+
+    def to_dict(self, fields=None):
+        """Convert payment object to dictionary (only the given fields, if any)."""
+        return self.FIELDS.serialize(self, fields)
 
     def __repr__(self):
         return f'<Payment {self.transaction_id} - {self.amount}>'
@@ -0,0 +1,76 @@
+from . import db
+from datetime import datetime
+import json
+
+class RetirementJob(db.Model):
+    """Taking a set of vehicles out of service, processed in resumable batches."""
+    __tablename__ = 'retirement_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_ids = db.Column(db.Text, nullable=False)  # JSON list
+    reason = db.Column(db.String(255))
+    status = db.Column(db.String(20), default='running', nullable=False)  # 'running', 'completed', 'failed'
+    cutoff = db.Column(db.DateTime, nullable=False)  # Bookings starting after this are cancelled
+    cursor = db.Column(db.Integer, default=0, nullable=False)  # Last booking id processed
+    total = db.Column(db.Integer, default=0, nullable=False)
+    processed = db.Column(db.Integer, default=0, nullable=False)
+    bookings_cancelled = db.Column(db.Integer, default=0, nullable=False)
+    payments_marked = db.Column(db.Integer, default=0, nullable=False)
+    refund_amount = db.Column(db.Float, default=0, nullable=False)
+    runner = db.Column(db.String(32))  # Lease held by the process running the job
+    heartbeat_at = db.Column(db.DateTime)
+    error = db.Column(db.Text)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        """Convert job to dictionary."""
+        return {
+            'id': self.id,
+            'vehicle_ids': json.loads(self.vehicle_ids),
+            'reason': self.reason,
+            'status': self.status,
+            'cutoff': self.cutoff.isoformat(),
+            'total': self.total,
+            'processed': self.processed,
+            'progress': round(self.processed / self.total, 4) if self.total else 1.0,
+            'bookings_cancelled': self.bookings_cancelled,
+            'payments_marked': self.payments_marked,
+            'refund_amount': round(self.refund_amount, 2),
+            'error': self.error,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat(),
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<RetirementJob {self.id} {self.status}>'
+
+
+class RetirementOutcome(db.Model):
+    """What a retirement job did to one booking."""
+    __tablename__ = 'retirement_outcomes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('retirement_jobs.id'), nullable=False, index=True)
+    booking_id = db.Column(db.Integer, nullable=False)
+    vehicle_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    previous_status = db.Column(db.String(20), nullable=False)
+    payments_marked = db.Column(db.Integer, default=0, nullable=False)
+    refund_amount = db.Column(db.Float, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        """Convert outcome to dictionary."""
+        return {
+            'booking_id': self.booking_id,
+            'vehicle_id': self.vehicle_id,
+            'user_id': self.user_id,
+            'previous_status': self.previous_status,
+            'payments_marked': self.payments_marked,
+            'refund_amount': self.refund_amount,
+            'created_at': self.created_at.isoformat()
+        }
@@ -0,0 +1,26 @@
+from . import db
+from datetime import datetime
+
+class RevokedToken(db.Model):
+    """A revoked JWT, kept until the token would have expired anyway."""
+    __tablename__ = 'revoked_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), unique=True, nullable=False)
+    token_type = db.Column(db.String(10), nullable=False)  # 'access', 'refresh'
+    user_id = db.Column(db.Integer, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def to_dict(self):
+        """Convert revoked token to dictionary."""
+        return {
+            'jti': self.jti,
+            'token_type': self.token_type,
+            'user_id': self.user_id,
+            'expires_at': self.expires_at.isoformat(),
+            'revoked_at': self.revoked_at.isoformat()
+        }
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
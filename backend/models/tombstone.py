@@ -0,0 +1,51 @@
+from . import db
+from datetime import datetime
+from sqlalchemy import event
+
+class Tombstone(db.Model):
+    """Record of a deleted row so delta-sync clients can drop it."""
+    __tablename__ = 'tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(20), nullable=False)  # 'vehicle', 'booking'
+    entity_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)  # Owner of a deleted booking
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def to_dict(self):
+        """Convert tombstone to dictionary."""
+        return {
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'deleted_at': self.deleted_at.isoformat()
+        }
+
+    def __repr__(self):
+        return f'<Tombstone {self.entity_type} {self.entity_id}>'
+
+
+def _record_tombstone(entity_type):
+    """Build an after_delete listener that writes a tombstone in the same transaction."""
+    def listener(mapper, connection, target):
+        connection.execute(Tombstone.__table__.insert().values(
+            entity_type=entity_type,
+            entity_id=target.id,
+            user_id=getattr(target, 'user_id', None),
+            deleted_at=datetime.utcnow()
+        ))
+    return listener
+
+
+def register_listeners():
+    """Attach tombstone listeners to the synced models."""
+    from .vehicle import Vehicle
+    from .booking import Booking
+
+    if not event.contains(Vehicle, 'after_delete', _vehicle_deleted):
+        event.listen(Vehicle, 'after_delete', _vehicle_deleted)
+    if not event.contains(Booking, 'after_delete', _booking_deleted):
+        event.listen(Booking, 'after_delete', _booking_deleted)
+
+
+_vehicle_deleted = _record_tombstone('vehicle')
+_booking_deleted = _record_tombstone('booking')
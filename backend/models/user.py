@@ -1,5 +1,6 @@
 from werkzeug.security import generate_password_hash, check_password_hash
 from . import db
+from .fieldsets import Fieldset, field, iso
 from datetime import datetime
 
 class User(db.Model):
@@ -58,15 +59,18 @@ class User(db.Model):
             print(f"Password check error: {e}")
             return False
 
-    def to_dict(self):
-        """Convert user object to dictionary."""
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'is_admin': self.is_admin,
-            'created_at': self.created_at.isoformat()
-        }
+    # to_dict keys and the columns they read (?fields=)
+    FIELDS = Fieldset(
+        id=field('id'),
+        username=field('username'),
+        email=field('email'),
+        is_admin=field('is_admin'),
+        created_at=field('created_at', render=lambda u: iso(u.created_at))
+    )
+
+    def to_dict(self, fields=None):
+        """Convert user object to dictionary (only the given fields, if any)."""
+        return self.FIELDS.serialize(self, fields)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -1,9 +1,20 @@
 from . import db
+from .fieldsets import Fieldset, field, iso
 from datetime import datetime
+from sqlalchemy import or_, and_, exists
+from services.images import images
+import math
+
+# Size of the spatial grid cells (~5.5km of latitude); a vehicle's cell is stored in Vehicle.geo_cell
+GEO_CELL_DEGREES = 0.05
 
 class Vehicle(db.Model):
     """Vehicle model for rental vehicles."""
     __tablename__ = 'vehicles'
+    __table_args__ = (
+        # Nearest-vehicle searches scan latitude/longitude boxes (services/spatial.py)
+        db.Index('ix_vehicles_lat_lon', 'latitude', 'longitude'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     make = db.Column(db.String(50), nullable=False)
@@ -13,32 +24,42 @@ class Vehicle(db.Model):
     price_per_day = db.Column(db.Float, nullable=False)
     is_available = db.Column(db.Boolean, default=True, nullable=False)
     location = db.Column(db.String(100))
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geo_cell = db.Column(db.String(24), index=True)  # Grid cell of the coordinates
     description = db.Column(db.Text)
     image_url = db.Column(db.String(255))  # Single image URL for simplicity
+    image_hash = db.Column(db.String(64))  # Uploaded image (see services/images.py)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
     
     # Relationships
     owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     # The relationship with Booking is defined in the Booking model
     
-    def to_dict(self, include_owner=False):
-        """Convert vehicle object to dictionary."""
-        result = {
-            'id': self.id,
-            'make': self.make,
-            'model': self.model,
-            'year': self.year,
-            'type': self.type,
-            'price_per_day': float(self.price_per_day) if self.price_per_day else None,
-            'is_available': self.is_available,
-            'location': self.location,
-            'description': self.description,
-            'image_url': self.image_url,
-            'owner_id': self.owner_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    # to_dict keys and the columns they read (?fields=)
+    FIELDS = Fieldset(
+        id=field('id'),
+        make=field('make'),
+        model=field('model'),
+        year=field('year'),
+        type=field('type'),
+        price_per_day=field('price_per_day', render=lambda v: float(v.price_per_day) if v.price_per_day else None),
+        is_available=field('is_available'),
+        location=field('location'),
+        latitude=field('latitude'),
+        longitude=field('longitude'),
+        description=field('description'),
+        image_url=field('image_url'),
+        images=field('image_hash', render=lambda v: images.urls(v.image_hash)),
+        owner_id=field('owner_id'),
+        created_at=field('created_at', render=lambda v: iso(v.created_at)),
+        updated_at=field('updated_at', render=lambda v: iso(v.updated_at))
+    )
+    
+    def to_dict(self, include_owner=False, fields=None):
+        """Convert vehicle object to dictionary (only the given fields, if any)."""
+        result = self.FIELDS.serialize(self, fields)
         
         if include_owner and hasattr(self, 'owner') and self.owner:
             result['owner'] = {
@@ -55,17 +76,70 @@ class Vehicle(db.Model):
         if not self.is_available:
             return False
             
-        # Check for any overlapping bookings
+        # Check for any overlapping bookings or maintenance in one query
         from .booking import Booking
-        overlapping = Booking.query.filter(
+        from .maintenance import MaintenanceBlackout
+        overlapping = exists().where(
             Booking.vehicle_id == self.id,
             Booking.status.in_(['pending', 'confirmed']),
             Booking.start_date <= end_date,
             Booking.end_date >= start_date
-        ).first()
+        )
+        in_maintenance = exists().where(
+            MaintenanceBlackout.vehicle_id == self.id,
+            MaintenanceBlackout.start_date <= end_date,
+            MaintenanceBlackout.end_date >= start_date
+        )
         
-        return overlapping is None
+        if db.session.query(or_(overlapping, in_maintenance)).scalar():
+            return False
+        
+        # Checkout holds live in memory, not in the bookings table
+        from services.holds import holds
+        return not holds.conflicts(self.id, start_date, end_date)
+    
+    @classmethod
+    def available_for_dates_filter(cls, start_date, end_date, user_id=None):
+        """SQL filter for vehicles free on the given dates (set-based is_available_for_dates)."""
+        from .booking import Booking
+        from .maintenance import MaintenanceBlackout
+        from services.holds import holds
+        overlapping = exists().where(
+            Booking.vehicle_id == cls.id,
+            Booking.status.in_(['pending', 'confirmed']),
+            Booking.start_date <= end_date,
+            Booking.end_date >= start_date
+        )
+        in_maintenance = exists().where(
+            MaintenanceBlackout.vehicle_id == cls.id,
+            MaintenanceBlackout.start_date <= end_date,
+            MaintenanceBlackout.end_date >= start_date
+        )
+        condition = and_(cls.is_available.is_(True), ~overlapping, ~in_maintenance)
+        held = holds.held_vehicle_ids(start_date, end_date, user_id)
+        if held:
+            condition = and_(condition, cls.id.notin_(held))
+        return condition
         
+    @staticmethod
+    def grid_cell(row, col):
+        """Key of a spatial grid cell."""
+        return f'{row}:{col}'
+    
+    @staticmethod
+    def grid_position(latitude, longitude):
+        """Grid (row, col) containing a coordinate."""
+        return math.floor(latitude / GEO_CELL_DEGREES), math.floor(longitude / GEO_CELL_DEGREES)
+    
+    def set_coordinates(self, latitude, longitude):
+        """Set the vehicle's coordinates and its spatial grid cell."""
+        self.latitude = latitude
+        self.longitude = longitude
+        if latitude is None or longitude is None:
+            self.geo_cell = None
+        else:
+            self.geo_cell = self.grid_cell(*self.grid_position(latitude, longitude))
+    
     def update_availability(self, is_available):
         """Update vehicle availability."""
         self.is_available = is_available
@@ -0,0 +1,80 @@
+"""
+Worker readiness tracking for the Ranger Rentals application.
+
+Each worker warms its database pool and any registered caches before it
+reports itself ready, and reports not-ready again once it starts draining.
+"""
+
+import threading
+from datetime import datetime
+from sqlalchemy import text
+
+from models import db
+
+_lock = threading.Lock()
+_warmers = {}
+_state = {
+    'database': False,
+    'caches': {},
+    'draining': False,
+    'warmed_at': None
+}
+
+
+def register_warmer(name, fn):
+    """Register a cache warm-up callable that runs inside an app context."""
+    with _lock:
+        _warmers[name] = fn
+        _state['caches'][name] = False
+
+
+def warm_up(app):
+    """Open a pooled database connection and warm every registered cache."""
+    with app.app_context():
+        try:
+            db.session.execute(text('SELECT 1'))
+            db.session.remove()
+            _state['database'] = True
+        except Exception as e:
+            print(f"Database warm-up failed: {str(e)}")
+            _state['database'] = False
+
+        for name, fn in list(_warmers.items()):
+            try:
+                fn()
+                _state['caches'][name] = True
+            except Exception as e:
+                print(f"Cache warm-up failed for {name}: {str(e)}")
+                _state['caches'][name] = False
+
+    _state['warmed_at'] = datetime.utcnow()
+
+
+def mark_draining():
+    """Flag this worker as shutting down so load balancers stop routing to it."""
+    _state['draining'] = True
+
+
+def is_ready():
+    """Return True when the pool and all caches are warm and we are not draining."""
+    return (
+        _state['database']
+        and all(_state['caches'].values())
+        and not _state['draining']
+    )
+
+
+def readiness_report():
+    """Build the readiness payload, including connection pool statistics."""
+    pool = db.engine.pool
+    return {
+        'ready': is_ready(),
+        'draining': _state['draining'],
+        'database': _state['database'],
+        'caches': dict(_state['caches']),
+        'pool': {
+            'class': type(pool).__name__,
+            'status': pool.status()
+        },
+        'warmed_at': _state['warmed_at'].isoformat() if _state['warmed_at'] else None
+    }
@@ -1,10 +1,17 @@
 """
 Main entry point for the Ranger Rentals application.
+
+This starts Flask's development server. For production use the
+multi-worker entry point instead:
+
+    gunicorn -c gunicorn.conf.py
 """
 
+import os
 from app import create_app
 
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    debug = os.environ.get("FLASK_DEBUG", "1") == "1"
+    app.run(debug=debug, host="0.0.0.0", port=5000)
@@ -0,0 +1,7 @@
+"""
+Application services shared by the API blueprints.
+
+Each service module exposes an ``init_app(app)`` hook, on a module-level
+instance when the service holds state, following the same pattern as the
+Flask extensions in ``app.py``.
+"""
@@ -0,0 +1,358 @@
+"""
+Fleet utilization and short-horizon demand forecasts.
+
+Booking history (hot and archived) is loaded once into columnar numpy
+arrays, and every statistic is computed with array operations over them:
+
+- an occupancy matrix (vehicle x day) of the fraction of each day a vehicle
+  is booked, over the last ANALYTICS_HISTORY_DAYS and the next
+  ANALYTICS_FORECAST_DAYS, built from difference arrays,
+- utilization per vehicle and per type, and each type's daily series,
+- lead time (booking start minus creation) percentiles and histograms,
+- day-of-week and month-of-year demand curves per type,
+- a forecast per (type, location): an exponentially weighted level of the
+  last eight weeks' day-of-week-adjusted demand, never below what is
+  already on the books.
+
+The arrays and the report are cached per worker. A refresh reads only the
+bookings updated (and booking tombstones written) since the last one,
+subtracts their old contribution from the occupancy matrix and adds the new
+one. The cache is rebuilt from scratch when the day rolls over or a vehicle
+changes.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+from models import db
+from models.booking import Booking
+from models.vehicle import Vehicle
+from models.archive import BookingArchive
+from models.tombstone import Tombstone
+
+# Counted as demand; cancelled and refunded bookings are not
+DEMAND_STATUSES = ('pending', 'confirmed', 'completed')
+LEAD_TIME_BUCKETS = [0, 1, 3, 7, 14, 30, 60, 90]  # days; the last bucket is open-ended
+FORECAST_LOOKBACK_DAYS = 56
+FORECAST_SMOOTHING = 0.2
+# Rows committing just after a refresh can carry an earlier updated_at
+WATERMARK_LAG = timedelta(seconds=2)
+DAY_US = 86_400_000_000
+BOOKING_FIELDS = ('id', 'vehicle_id', 'start', 'end', 'created', 'counted')
+
+
+def _np():
+    import numpy
+    return numpy
+
+
+def to_days(values):
+    """Datetimes to float days since the epoch."""
+    np = _np()
+    return np.array(values, dtype='datetime64[us]').astype(np.int64) / DAY_US
+
+
+def booking_columns(rows):
+    """Columnar arrays from (id, vehicle_id, start_date, end_date, created_at, status) rows."""
+    np = _np()
+    if not rows:
+        return {name: np.zeros(0, dtype=dtype) for name, dtype in zip(
+            BOOKING_FIELDS, (np.int64, np.int64, np.float64, np.float64, np.float64, bool))}
+    ids, vehicle_ids, starts, ends, created, statuses = zip(*rows)
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'vehicle_id': np.array(vehicle_ids, dtype=np.int64),
+        'start': to_days(starts),
+        'end': to_days(ends),
+        'created': to_days(created),
+        'counted': np.fromiter((s in DEMAND_STATUSES for s in statuses), dtype=bool, count=len(statuses))
+    }
+
+
+def take(columns, index):
+    return {name: values[index] for name, values in columns.items()}
+
+
+def concat(*parts):
+    np = _np()
+    return {name: np.concatenate([part[name] for part in parts]) for name in BOOKING_FIELDS}
+
+
+class DemandAnalytics:
+    """Per-worker cache of booking arrays, the occupancy matrix and the report."""
+
+    def __init__(self):
+        self.history_days = 365
+        self.forecast_days = 14
+        self.refresh_seconds = 60
+        self._lock = threading.Lock()
+        self._state = None
+        self._report = None
+        self._checked_at = 0
+
+    def init_app(self, app):
+        self.history_days = app.config.get('ANALYTICS_HISTORY_DAYS', 365)
+        self.forecast_days = app.config.get('ANALYTICS_FORECAST_DAYS', 14)
+        self.refresh_seconds = app.config.get('ANALYTICS_REFRESH_SECONDS', 60)
+        app.extensions['analytics'] = self
+
+    def report(self):
+        """The cached report, refreshed if older than ANALYTICS_REFRESH_SECONDS."""
+        with self._lock:
+            if self._report is None or time.monotonic() - self._checked_at >= self.refresh_seconds:
+                self.refresh()
+            return self._report
+
+    def refresh(self):
+        """Apply bookings changed since the last refresh (or rebuild) and recompute the report."""
+        now = datetime.utcnow()
+        today = int(to_days([now])[0])
+        signature = tuple(db.session.execute(
+            select(func.count(Vehicle.id), func.max(Vehicle.updated_at))).one())
+        state = self._state
+        if state is None or state['today'] != today or state['vehicle_signature'] != signature:
+            self._state = self._build(now, today, signature)
+            self._report = self._summarize(self._state, now)
+        elif self._apply_changes(state, now):
+            self._report = self._summarize(state, now)
+        self._checked_at = time.monotonic()
+
+    def _build(self, now, today, signature):
+        np = _np()
+        watermark = now - WATERMARK_LAG
+        vehicles = db.session.execute(
+            select(Vehicle.id, Vehicle.type, Vehicle.location, Vehicle.price_per_day, Vehicle.created_at)
+            .order_by(Vehicle.id)
+        ).all()
+        ids, types, locations, prices, created = zip(*vehicles) if vehicles else ((), (), (), (), ())
+        type_names, type_codes = np.unique(np.array(types, dtype=str), return_inverse=True)
+        location_names, location_codes = np.unique(np.array([l or '' for l in locations], dtype=str),
+                                                   return_inverse=True)
+
+        day0 = today - self.history_days
+        days = self.history_days + self.forecast_days
+        state = {
+            'today': today,
+            'day0': day0,
+            'days': days,
+            'watermark': watermark,
+            'vehicle_signature': signature,
+            'vehicle_ids': np.array(ids, dtype=np.int64),
+            'type_codes': type_codes.astype(np.int64),
+            'type_names': [str(name) for name in type_names],
+            'location_codes': location_codes.astype(np.int64),
+            'location_names': [str(name) for name in location_names],
+            'prices': np.array(prices, dtype=np.float64),
+            # Days before a vehicle existed don't count against its utilization
+            'since': np.clip(np.floor(to_days(created)) - day0, 0, days).astype(np.int64) if ids
+                     else np.zeros(0, dtype=np.int64),
+            'occupancy': np.zeros((len(ids), days), dtype=np.float32)
+        }
+
+        columns = (Booking.id, Booking.vehicle_id, Booking.start_date, Booking.end_date,
+                   Booking.created_at, Booking.status)
+        hot = booking_columns(db.session.execute(select(*columns)).all())
+        archived = booking_columns(db.session.execute(select(
+            BookingArchive.id, BookingArchive.vehicle_id, BookingArchive.start_date, BookingArchive.end_date,
+            BookingArchive.created_at, BookingArchive.status)).all())
+        # A booking mid-archival can be in both stores; keep the hot copy
+        bookings = concat(hot, archived)
+        _, first = np.unique(bookings['id'], return_index=True)
+        state['bookings'] = take(bookings, first)
+        self._occupy(state, state['bookings'], 1)
+        return state
+
+    def _apply_changes(self, state, now):
+        """Fold in bookings changed since the watermark. False if nothing changed."""
+        np = _np()
+        watermark = now - WATERMARK_LAG
+        changed = booking_columns(db.session.execute(
+            select(Booking.id, Booking.vehicle_id, Booking.start_date, Booking.end_date,
+                   Booking.created_at, Booking.status)
+            .where(Booking.updated_at > state['watermark'])
+        ).all())
+        deleted = np.array(db.session.scalars(
+            select(Tombstone.entity_id).where(Tombstone.entity_type == 'booking',
+                                              Tombstone.deleted_at > state['watermark'])
+        ).all(), dtype=np.int64)
+        state['watermark'] = watermark
+        if not len(changed['id']) and not len(deleted):
+            return False
+
+        bookings = state['bookings']
+        stale = np.isin(bookings['id'], np.concatenate([changed['id'], deleted]))
+        self._occupy(state, take(bookings, stale), -1)
+        bookings = concat(take(bookings, ~stale), changed)
+        state['bookings'] = take(bookings, np.argsort(bookings['id'], kind='stable'))
+        self._occupy(state, changed, 1)
+        return True
+
+    def _occupy(self, state, bookings, sign):
+        """Add (sign=1) or remove (sign=-1) bookings' fractional days in the occupancy matrix."""
+        np = _np()
+        occupancy, days = state['occupancy'], state['days']
+        vehicle_ids = state['vehicle_ids']
+        if not len(vehicle_ids):
+            return
+        rows = np.searchsorted(vehicle_ids, bookings['vehicle_id'])
+        known = rows < len(vehicle_ids)
+        known[known] = vehicle_ids[rows[known]] == bookings['vehicle_id'][known]
+        start = np.clip(bookings['start'] - state['day0'], 0, days)
+        end = np.clip(bookings['end'] - state['day0'], 0, days)
+        keep = bookings['counted'] & known & (end > start)
+        rows, start, end = rows[keep], start[keep], end[keep]
+
+        first, last = np.floor(start).astype(np.int64), np.floor(end).astype(np.int64)
+        same = first == last
+        # Within one day: the booked fraction of that day
+        np.add.at(occupancy, (rows[same], first[same]), sign * (end - start)[same])
+        rows, start, end, first, last = rows[~same], start[~same], end[~same], first[~same], last[~same]
+        # Partial first and last days, then whole days in between via a difference array
+        np.add.at(occupancy, (rows, first), sign * (first + 1 - start))
+        tail = last < days
+        np.add.at(occupancy, (rows[tail], last[tail]), sign * (end - last)[tail])
+        whole = np.zeros((occupancy.shape[0], days + 1), dtype=np.float32)
+        np.add.at(whole, (rows, first + 1), sign)
+        np.add.at(whole, (rows, last), -sign)
+        occupancy += np.cumsum(whole, axis=1)[:, :days]
+
+    def _summarize(self, state, now):
+        np = _np()
+        history, days, day0 = self.history_days, state['days'], state['day0']
+        occupancy = np.clip(state['occupancy'], 0, 1).astype(np.float64)
+        n_vehicles = len(state['vehicle_ids'])
+        exists = (np.arange(days)[None, :] >= state['since'][:, None]).astype(np.float64)
+        past, recent = slice(0, history), slice(max(history - 30, 0), history)
+
+        def ratio(numerator, denominator):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), 0.0)
+
+        dates = (np.arange(days) + day0).astype('datetime64[D]')
+        weekday = (np.arange(days) + day0 + 3) % 7  # the epoch was a Thursday
+        month = dates.astype('datetime64[M]').astype(np.int64) % 12
+        by_weekday = (weekday[:, None] == np.arange(7)[None, :]).astype(np.float64)
+        by_month = (month[:, None] == np.arange(12)[None, :]).astype(np.float64)
+
+        # Vehicles
+        booked = occupancy[:, past].sum(axis=1)
+        vehicle_util = ratio(booked, exists[:, past].sum(axis=1))
+        vehicle_recent = ratio(occupancy[:, recent].sum(axis=1), exists[:, recent].sum(axis=1))
+
+        # Types: one-hot (type x vehicle) products give per-type daily sums
+        n_types = len(state['type_names'])
+        type_onehot = (state['type_codes'][None, :] == np.arange(n_types)[:, None]).astype(np.float64)
+        type_booked, type_fleet = type_onehot @ occupancy, type_onehot @ exists
+        type_daily = ratio(type_booked, type_fleet)
+        type_weekday = ratio(type_booked[:, past] @ by_weekday[past], type_fleet[:, past] @ by_weekday[past])
+        type_month = ratio(type_booked[:, past] @ by_month[past], type_fleet[:, past] @ by_month[past])
+
+        # Lead times and booking-start seasonality over the whole history
+        bookings = state['bookings']
+        rows = np.searchsorted(state['vehicle_ids'], bookings['vehicle_id']) if n_vehicles else \
+            np.zeros(len(bookings['id']), dtype=np.int64)
+        known = rows < n_vehicles
+        known[known] = state['vehicle_ids'][rows[known]] == bookings['vehicle_id'][known]
+        counted = bookings['counted'] & known
+        booking_type = state['type_codes'][rows[counted]] if n_vehicles else rows[counted]
+        lead = np.maximum(bookings['start'][counted] - bookings['created'][counted], 0)
+        bucket = np.searchsorted(LEAD_TIME_BUCKETS, lead, side='right') - 1
+        lead_histogram = np.bincount(booking_type * len(LEAD_TIME_BUCKETS) + bucket,
+                                     minlength=n_types * len(LEAD_TIME_BUCKETS)).reshape(n_types, -1)
+        start_month = np.floor(bookings['start'][counted]).astype('datetime64[D]').astype('datetime64[M]') \
+            .astype(np.int64) % 12
+        starts_by_month = np.bincount(booking_type * 12 + start_month, minlength=n_types * 12).reshape(n_types, 12)
+        order = np.lexsort((lead, booking_type))
+        lead_sorted, type_sorted = lead[order], booking_type[order]
+        bounds = np.searchsorted(type_sorted, np.arange(n_types + 1))
+
+        bucket_names = [f'{low}-{high}d' for low, high in zip(LEAD_TIME_BUCKETS, LEAD_TIME_BUCKETS[1:])] + \
+            [f'{LEAD_TIME_BUCKETS[-1]}d+']
+        types = {}
+        for t, name in enumerate(state['type_names']):
+            leads = lead_sorted[bounds[t]:bounds[t + 1]]
+            p50, p90 = np.percentile(leads, [50, 90]) if len(leads) else (0.0, 0.0)
+            weekday_curve, month_curve = type_weekday[t], type_month[t]
+            types[name] = {
+                'vehicles': int(type_onehot[t].sum()),
+                'utilization': round(float(ratio(type_booked[t, past].sum(), type_fleet[t, past].sum())), 4),
+                'utilization_30d': round(float(ratio(type_booked[t, recent].sum(), type_fleet[t, recent].sum())), 4),
+                'daily': [round(float(u), 4) for u in type_daily[t, recent]],
+                'day_of_week': [round(float(u), 4) for u in weekday_curve],
+                'seasonal': [round(float(u), 4) for u in month_curve],
+                'starts_by_month': [int(n) for n in starts_by_month[t]],
+                'lead_time': {
+                    'bookings': int(len(leads)),
+                    'mean_days': round(float(leads.mean()), 2) if len(leads) else 0.0,
+                    'p50_days': round(float(p50), 2),
+                    'p90_days': round(float(p90), 2),
+                    'histogram': dict(zip(bucket_names, (int(n) for n in lead_histogram[t])))
+                }
+            }
+
+        return {
+            'generated_at': now.isoformat(),
+            'window': {'start': str(dates[0]), 'today': str(dates[history]) if history < days else None,
+                       'end': str(dates[-1])},
+            'bookings': int(len(bookings['id'])),
+            'vehicles': [{
+                'vehicle_id': int(state['vehicle_ids'][i]),
+                'type': state['type_names'][state['type_codes'][i]],
+                'location': state['location_names'][state['location_codes'][i]] or None,
+                'price_per_day': float(state['prices'][i]),
+                'booked_days': round(float(booked[i]), 2),
+                'utilization': round(float(vehicle_util[i]), 4),
+                'utilization_30d': round(float(vehicle_recent[i]), 4)
+            } for i in range(n_vehicles)],
+            'types': types,
+            'forecast': self._forecast(state, occupancy, weekday, dates, ratio)
+        }
+
+    def _forecast(self, state, occupancy, weekday, dates, ratio):
+        """Booked vehicle-days per (type, location) for today and the next days."""
+        np = _np()
+        history, days = self.history_days, state['days']
+        if not len(state['vehicle_ids']) or history >= days:
+            return []
+        group_keys = state['type_codes'] * len(state['location_names']) + state['location_codes']
+        groups, group_codes = np.unique(group_keys, return_inverse=True)
+        onehot = (group_codes[None, :] == np.arange(len(groups))[:, None]).astype(np.float64)
+        demand = onehot @ occupancy
+        fleet = onehot.sum(axis=1)
+        prices = ratio(onehot @ state['prices'], fleet)
+
+        lookback = slice(max(history - FORECAST_LOOKBACK_DAYS, 0), history)
+        past = demand[:, lookback]
+        past_weekday = (weekday[lookback][:, None] == np.arange(7)[None, :]).astype(np.float64)
+        # Day-of-week factors relative to the group's mean; 1 where there is no history
+        weekday_mean = ratio(past @ past_weekday, past_weekday.sum(axis=0)[None, :])
+        overall = past.mean(axis=1, keepdims=True) if past.shape[1] else np.zeros((len(groups), 1))
+        factors = np.where(overall > 0, ratio(weekday_mean, overall), 1.0)
+        adjusted = ratio(past, np.where(factors[:, weekday[lookback]] > 0, factors[:, weekday[lookback]], 1))
+        weights = (1 - FORECAST_SMOOTHING) ** np.arange(past.shape[1])[::-1]
+        level = adjusted @ weights / weights.sum() if past.shape[1] else np.zeros(len(groups))
+
+        ahead = slice(history, days)
+        on_books = demand[:, ahead]
+        expected = np.minimum(np.maximum(level[:, None] * factors[:, weekday[ahead]], on_books), fleet[:, None])
+        utilization = ratio(expected, fleet[:, None])
+
+        n_locations = len(state['location_names'])
+        return [{
+            'type': state['type_names'][int(key) // n_locations],
+            'location': state['location_names'][int(key) % n_locations] or None,
+            'vehicles': int(fleet[g]),
+            'avg_price_per_day': round(float(prices[g]), 2),
+            'days': [{
+                'date': str(date),
+                'on_books': round(float(on_books[g, d]), 2),
+                'forecast': round(float(expected[g, d]), 2),
+                'utilization': round(float(utilization[g, d]), 4)
+            } for d, date in enumerate(dates[ahead])]
+        } for g, key in enumerate(groups)]
+
+
+analytics = DemandAnalytics()
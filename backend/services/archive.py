@@ -0,0 +1,193 @@
+"""
+Archival of closed bookings and their payments.
+
+Completed, cancelled and refunded bookings whose end date is older than the
+horizon are copied to the archive bind and then deleted from the hot tables,
+one batch at a time. Each batch is idempotent (the archive copy replaces any
+earlier copy of the same ids), so an interrupted run is resumed simply by
+running it again. Hot rows are deleted only if they still match the copy
+(same updated_at, same payments); a booking that changed in between stays
+hot, its copy is dropped and a later run archives it again.
+"""
+
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, insert, delete, func, tuple_
+
+from models import db
+from models.booking import Booking
+from models.payment import Payment
+from models.archive import BookingArchive, PaymentArchive
+
+CLOSED_STATUSES = ['completed', 'cancelled', 'refunded']
+
+BOOKING_COLUMNS = ['id', 'vehicle_id', 'user_id', 'start_date', 'end_date', 'total_price',
+                   'status', 'created_at', 'updated_at']
+PAYMENT_COLUMNS = ['id', 'user_id', 'booking_id', 'amount', 'payment_method', 'transaction_id',
+                   'status', 'created_at', 'updated_at']
+
+class BatchChanged(Exception):
+    """A batch's hot rows changed while it was being deleted."""
+
+
+archive_cli = AppGroup('archive', help='Hot/cold archival of closed bookings.')
+
+
+class Archiver:
+    """Moves closed bookings and payments from the hot tables to the archive bind."""
+
+    def __init__(self):
+        self.horizon_days = 180
+        self.batch_size = 500
+
+    def init_app(self, app):
+        self.horizon_days = app.config.get('ARCHIVE_HORIZON_DAYS', 180)
+        self.batch_size = app.config.get('ARCHIVE_BATCH_SIZE', 500)
+        app.cli.add_command(archive_cli)
+        app.extensions['archiver'] = self
+
+    def _candidates(self, conn, cutoff, after_id, limit):
+        return conn.execute(
+            select(*[Booking.__table__.c[name] for name in BOOKING_COLUMNS])
+            .where(
+                Booking.status.in_(CLOSED_STATUSES),
+                Booking.end_date < cutoff,
+                Booking.id > after_id
+            )
+            .order_by(Booking.id)
+            .limit(limit)
+        ).mappings().all()
+
+    def archive_batch(self, cutoff, after_id=0):
+        """Archive one batch. Returns (bookings archived, last booking id considered)."""
+        with db.engine.connect() as conn:
+            bookings = [dict(row) for row in self._candidates(conn, cutoff, after_id, self.batch_size)]
+            if not bookings:
+                return 0, after_id
+            ids = [b['id'] for b in bookings]
+            payments = [dict(row) for row in conn.execute(
+                select(*[Payment.__table__.c[name] for name in PAYMENT_COLUMNS])
+                .where(Payment.booking_id.in_(ids))
+            ).mappings()]
+
+        now = datetime.utcnow()
+        for row in bookings + payments:
+            row['archived_at'] = now
+
+        # 1. Copy to the archive (replacing any copy left by an interrupted run)
+        with db.engines['archive'].begin() as conn:
+            conn.execute(delete(PaymentArchive.__table__).where(PaymentArchive.booking_id.in_(ids)))
+            conn.execute(delete(BookingArchive.__table__).where(BookingArchive.id.in_(ids)))
+            conn.execute(insert(BookingArchive.__table__), bookings)
+            if payments:
+                conn.execute(insert(PaymentArchive.__table__), payments)
+
+        # 2. Remove from the hot tables only what was copied and hasn't changed since
+        archived = self._delete_copied(bookings, payments)
+
+        # 3. Drop the copies of bookings that stayed hot; a later run archives them afresh
+        kept = [booking_id for booking_id in ids if booking_id not in archived]
+        if kept:
+            with db.engines['archive'].begin() as conn:
+                conn.execute(delete(PaymentArchive.__table__).where(PaymentArchive.booking_id.in_(kept)))
+                conn.execute(delete(BookingArchive.__table__).where(BookingArchive.id.in_(kept)))
+
+        return len(archived), ids[-1]
+
+    def _delete_copied(self, bookings, payments):
+        """Delete copied bookings whose row and payments are unchanged. Returns the deleted ids."""
+        copied = {b['id']: b['updated_at'] for b in bookings}
+        copied_payments = {p['id']: p['updated_at'] for p in payments}
+        try:
+            with db.engine.begin() as conn:
+                # Row locks hold the bookings and their payments (FK inserts included) until commit
+                current = conn.execute(
+                    select(Booking.id, Booking.status, Booking.updated_at)
+                    .where(Booking.id.in_(list(copied))).with_for_update()
+                ).all()
+                current_payments = conn.execute(
+                    select(Payment.id, Payment.booking_id, Payment.updated_at)
+                    .where(Payment.booking_id.in_(list(copied))).with_for_update()
+                ).all()
+                stale = {p.booking_id for p in current_payments if copied_payments.get(p.id) != p.updated_at}
+                deletable = {b.id for b in current
+                             if b.status in CLOSED_STATUSES and b.updated_at == copied[b.id] and b.id not in stale}
+                if not deletable:
+                    return set()
+
+                # Matched on updated_at as well, for backends where the locks are no-ops (SQLite)
+                conn.execute(delete(Payment.__table__).where(tuple_(Payment.id, Payment.updated_at).in_(
+                    [(p.id, p.updated_at) for p in current_payments if p.booking_id in deletable])))
+                deleted = conn.execute(delete(Booking.__table__).where(
+                    tuple_(Booking.id, Booking.updated_at).in_([(i, copied[i]) for i in deletable]),
+                    Booking.status.in_(CLOSED_STATUSES)
+                )).rowcount
+                left = conn.execute(select(Payment.id).where(Payment.booking_id.in_(deletable)).limit(1)).first()
+                if deleted != len(deletable) or left is not None:
+                    raise BatchChanged()
+        except BatchChanged:
+            # Something changed between the check and the delete: keep the whole batch hot
+            return set()
+        return deletable
+
+    def run(self, horizon_days=None, max_batches=None):
+        """Archive everything older than the horizon, batch by batch."""
+        horizon_days = self.horizon_days if horizon_days is None else horizon_days
+        cutoff = datetime.utcnow() - timedelta(days=horizon_days)
+        total, last_id, batches = 0, 0, 0
+        while max_batches is None or batches < max_batches:
+            count, next_id = self.archive_batch(cutoff, last_id)
+            if next_id == last_id:
+                break
+            last_id = next_id
+            total += count
+            batches += 1
+            print(f"Archived {total} bookings (up to id {last_id})")
+        return total
+
+
+archiver = Archiver()
+
+
+def user_booking_history(user_id, fields=None):
+    """All bookings for a user, hot and archived, newest first (only `fields`' columns, if given)."""
+    hot = Booking.query.options(*Booking.FIELDS.load_only(Booking, fields, 'start_date')) \
+        .filter_by(user_id=user_id).all()
+    cold = BookingArchive.query.options(*BookingArchive.FIELDS.load_only(BookingArchive, fields, 'start_date')) \
+        .filter_by(user_id=user_id).all()
+    return sorted(hot + cold, key=lambda b: b.start_date, reverse=True)
+
+
+def find_booking(booking_id):
+    """Look a booking up in the hot table, then in the archive."""
+    return Booking.query.get(booking_id) or BookingArchive.query.get(booking_id)
+
+
+def find_payment(payment_id):
+    """Look a payment up in the hot table, then in the archive."""
+    return db.session.get(Payment, payment_id) or db.session.get(PaymentArchive, payment_id)
+
+
+def booking_payment_history(booking_id):
+    """Payments for a booking from whichever storage holds it."""
+    return (Payment.query.filter_by(booking_id=booking_id).all()
+            or PaymentArchive.query.filter_by(booking_id=booking_id).all())
+
+
+@archive_cli.command('run')
+@click.option('--horizon-days', type=int, default=None, help='Archive bookings that ended more than N days ago.')
+@click.option('--max-batches', type=int, default=None, help='Stop after N batches (rerun to resume).')
+def run_archive(horizon_days, max_batches):
+    """Move closed bookings and their payments to the archive."""
+    total = archiver.run(horizon_days, max_batches)
+    print(f"Done: {total} bookings archived")
+
+
+@archive_cli.command('status')
+def archive_status():
+    """Show hot and archived row counts."""
+    for label, model in [('bookings', Booking), ('payments', Payment),
+                         ('bookings_archive', BookingArchive), ('payments_archive', PaymentArchive)]:
+        print(f"{label}: {db.session.scalar(select(func.count()).select_from(model))}")
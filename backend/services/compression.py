@@ -0,0 +1,150 @@
+"""
+Negotiated response compression.
+
+Responses of a compressible type (JSON, text, JavaScript, SVG) are encoded
+with brotli or gzip, whichever the client's Accept-Encoding ranks higher
+(brotli on a tie, if the ``brotli`` package is installed). Bodies smaller
+than COMPRESS_MIN_SIZE bytes are sent as is, since the encoding overhead
+outweighs the saving. Streamed responses, such as the event stream, are
+wrapped in an incremental encoder that flushes after every chunk, so each
+chunk still reaches the client as soon as it is produced. File downloads
+(images, profiles) pass through untouched.
+
+The ASGI catalog reads use the same negotiation through ``encode``.
+"""
+
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'image/svg+xml')
+
+
+def parse_accept_encoding(header):
+    """{coding: q} from an Accept-Encoding header."""
+    weights = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    return weights
+
+
+def choose_encoding(header, available):
+    """The best of `available` (in preference order) the client accepts, or None."""
+    weights = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+class StreamEncoder:
+    """Incremental gzip/brotli encoder; every encode() returns a flushed, decodable prefix."""
+
+    def __init__(self, encoding, level=6, brotli_quality=4):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def encode(self, chunk):
+        if self.encoding == 'br':
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.finish() if self.encoding == 'br' else self._compressor.flush()
+
+
+class Compressor:
+    """Compresses Flask responses after the view has run."""
+
+    def __init__(self):
+        self.enabled = True
+        self.min_size = 1024
+        self.level = 6
+        self.brotli_quality = 4
+        self.encodings = ('br', 'gzip') if brotli else ('gzip',)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+        self.level = app.config.get('COMPRESS_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+        app.after_request(self._compress)
+        app.extensions['compression'] = self
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def encode(self, body, accept_encoding, mimetype='application/json'):
+        """(body, encoding) for a complete body; encoding is None if sent as is."""
+        if not self.enabled or len(body) < self.min_size or not compressible(mimetype):
+            return body, None
+        encoding = choose_encoding(accept_encoding, self.encodings)
+        if not encoding:
+            return body, None
+        return self.compress(body, encoding), encoding
+
+    def _stream(self, chunks, encoding):
+        encoder = StreamEncoder(encoding, self.level, self.brotli_quality)
+        try:
+            for chunk in chunks:
+                data = encoder.encode(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                if data:
+                    yield data
+            yield encoder.finish()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
+
+    def _compress(self, response):
+        if (not self.enabled or request.method == 'HEAD' or response.status_code in (204, 206, 304)
+                or response.status_code < 200 or response.direct_passthrough
+                or 'Content-Encoding' in response.headers or not compressible(response.mimetype)):
+            return response
+        response.vary.add('Accept-Encoding')
+        accept_encoding = request.headers.get('Accept-Encoding')
+
+        if response.is_streamed:
+            encoding = choose_encoding(accept_encoding, self.encodings)
+            if not encoding:
+                return response
+            response.response = self._stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            body, encoding = self.encode(response.get_data(), accept_encoding, response.mimetype)
+            if not encoding:
+                return response
+            response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+compressor = Compressor()
@@ -0,0 +1,122 @@
+"""
+Customer dashboard assembled from a fixed set of queries.
+
+Upcoming bookings and the newest page of past bookings (hot and archived)
+are fetched by user with the ordering and limit in SQL, then vehicles by
+``id IN`` and payments by ``booking_id IN``. The number of queries, and the
+amount of history read, is the same whether the user has ten bookings or ten
+thousand. Only the columns the dashboard shows are selected.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import select, and_, not_
+
+from models import db
+from models.booking import Booking
+from models.payment import Payment
+from models.vehicle import Vehicle
+from models.archive import BookingArchive, PaymentArchive
+from services.images import images
+
+ACTIVE_STATUSES = ('pending', 'confirmed')
+VEHICLE_SUMMARY = (Vehicle.id, Vehicle.make, Vehicle.model, Vehicle.year, Vehicle.type,
+                   Vehicle.location, Vehicle.image_url, Vehicle.image_hash, Vehicle.price_per_day)
+
+
+def _bookings(model, *criteria, order=None, limit=None):
+    query = (select(model.id, model.vehicle_id, model.start_date, model.end_date,
+                    model.total_price, model.status)
+             .where(*criteria).order_by(order).limit(limit))
+    return db.session.execute(query).mappings().all()
+
+
+def _payments(model, booking_ids):
+    if not booking_ids:
+        return []
+    return db.session.execute(
+        select(model.id, model.booking_id, model.amount, model.status,
+               model.payment_method, model.created_at)
+        .where(model.booking_id.in_(booking_ids))
+        .order_by(model.booking_id, model.id)
+    ).mappings().all()
+
+
+def payment_summary(total_price, payments):
+    """Overall payment status of a booking from its payment rows."""
+    paid = sum(p['amount'] for p in payments if p['status'] == 'completed')
+    if any(p['status'] == 'refunded' for p in payments) and not paid:
+        status = 'refunded'
+    elif paid >= total_price - 0.01:
+        status = 'paid'
+    elif paid > 0:
+        status = 'partially_paid'
+    else:
+        status = 'unpaid'
+    return {
+        'status': status,
+        'amount_paid': round(paid, 2),
+        'payments': [{
+            'id': p['id'],
+            'amount': float(p['amount']),
+            'status': p['status'],
+            'payment_method': p['payment_method'],
+            'created_at': p['created_at'].isoformat()
+        } for p in payments]
+    }
+
+
+def build_dashboard(user_id, past_limit=20, now=None):
+    """Upcoming and the most recent past bookings with vehicle and payment summaries."""
+    now = now or datetime.utcnow()
+    upcoming_filter = and_(Booking.status.in_(ACTIVE_STATUSES), Booking.end_date >= now)
+    upcoming = _bookings(Booking, Booking.user_id == user_id, upcoming_filter,
+                         order=Booking.start_date)
+    # Newest past bookings from each store, merged and trimmed below
+    recent = _bookings(Booking, Booking.user_id == user_id, not_(upcoming_filter),
+                       order=Booking.start_date.desc(), limit=past_limit)
+    archived = _bookings(BookingArchive, BookingArchive.user_id == user_id,
+                         order=BookingArchive.start_date.desc(), limit=past_limit)
+    past = sorted([(b, False) for b in recent] + [(b, True) for b in archived],
+                  key=lambda item: item[0]['start_date'], reverse=True)[:past_limit]
+    hot = list(upcoming) + [b for b, is_archived in past if not is_archived]
+    cold = [b for b, is_archived in past if is_archived]
+
+    vehicle_ids = list({b['vehicle_id'] for b in hot} | {b['vehicle_id'] for b in cold})
+    vehicles = {}
+    if vehicle_ids:
+        for row in db.session.execute(select(*VEHICLE_SUMMARY).where(Vehicle.id.in_(vehicle_ids))).mappings():
+            vehicles[row['id']] = {
+                'id': row['id'],
+                'make': row['make'],
+                'model': row['model'],
+                'year': row['year'],
+                'type': row['type'],
+                'location': row['location'],
+                'image_url': row['image_url'],
+                'images': images.urls(row['image_hash']),
+                'price_per_day': float(row['price_per_day']) if row['price_per_day'] else None
+            }
+
+    payments = {}
+    for p in (list(_payments(Payment, [b['id'] for b in hot]))
+              + list(_payments(PaymentArchive, [b['id'] for b in cold]))):
+        payments.setdefault(p['booking_id'], []).append(p)
+
+    def entry(booking, is_archived):
+        return {
+            'id': booking['id'],
+            'start_date': booking['start_date'].isoformat(),
+            'end_date': booking['end_date'].isoformat(),
+            'total_price': float(booking['total_price']),
+            'status': booking['status'],
+            'duration_days': (booking['end_date'] - booking['start_date']).days,
+            'archived': is_archived,
+            'vehicle': vehicles.get(booking['vehicle_id']),
+            'payment': payment_summary(booking['total_price'], payments.get(booking['id'], []))
+        }
+
+    return {
+        'upcoming': [entry(b, False) for b in upcoming],
+        'past': [entry(b, is_archived) for b, is_archived in past]
+    }
@@ -0,0 +1,193 @@
+"""
+Append-only event log of booking, payment and vehicle state transitions.
+
+Changes are captured from the ORM rather than from each endpoint: after every
+flush the tracked fields of new, changed and deleted rows are turned into
+events and buffered on the session. Just before the transaction commits, the
+whole buffer is written with a single multi-row INSERT, so the events commit
+(or roll back) with the change they describe, and a request that flushes
+several times still pays for one insert.
+
+A row gets at most one event per transaction, storing only the new values of
+the fields that changed, so its state at any point is the fold of its events
+up to there (see replay()). Statements that bypass the ORM aren't seen:
+set-based jobs that change state add their events with record_many(), and
+archiving isn't a state transition.
+"""
+
+import json
+from datetime import datetime
+
+from flask import has_request_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, inspect, insert, select
+
+from models import db
+from models.entity_event import EntityEvent
+from services.replicas import RoutingSession
+
+BUFFER_KEY = 'entity_events'
+
+# Fields whose changes are state transitions, per entity type
+TRACKED_FIELDS = {
+    'booking': ('vehicle_id', 'user_id', 'start_date', 'end_date', 'total_price', 'status'),
+    'payment': ('booking_id', 'user_id', 'amount', 'payment_method', 'status'),
+    'vehicle': ('owner_id', 'price_per_day', 'is_available', 'location'),
+}
+
+
+def encode(value):
+    """JSON-safe form of a column value."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def current_actor():
+    """The authenticated user making the change, if any."""
+    if not has_request_context():
+        return None
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+def replay(events, state=None):
+    """Fold events (EntityEvent rows or their dicts) into the entity's state.
+
+    Returns None if the entity was deleted.
+    """
+    state = dict(state) if state else None
+    for entry in events:
+        if isinstance(entry, EntityEvent):
+            entry = entry.to_dict()
+        if entry['event'] == 'deleted':
+            state = None
+        elif entry['event'] == 'created' or state is None:
+            state = dict(entry['data'])
+        else:
+            state.update(entry['data'])
+    return state
+
+
+class EventLog:
+    """Captures tracked changes on the session and writes them at commit."""
+
+    def __init__(self):
+        self.enabled = True
+        self.entity_types = {}
+        self._listening = False
+
+    def init_app(self, app):
+        from models.booking import Booking
+        from models.payment import Payment
+        from models.vehicle import Vehicle
+
+        self.enabled = app.config.get('EVENT_LOG_ENABLED', True)
+        self.entity_types = {Booking: 'booking', Payment: 'payment', Vehicle: 'vehicle'}
+        if not self._listening:
+            event.listen(RoutingSession, 'after_flush', self._collect)
+            event.listen(RoutingSession, 'before_commit', self._write)
+            event.listen(RoutingSession, 'after_transaction_end', self._discard)
+            self._listening = True
+        app.extensions['event_log'] = self
+
+    def _collect(self, session, flush_context):
+        """Buffer events for the rows this flush wrote."""
+        if not self.enabled:
+            return
+        buffer = session.info.setdefault(BUFFER_KEY, [])
+        latest = session.info.setdefault(BUFFER_KEY + '.latest', {})
+        actor = current_actor()
+        now = datetime.utcnow()
+
+        def add(target, name, data):
+            key = (self.entity_types[type(target)], target.id)
+            previous = latest.get(key)
+            # One transaction is one transition: fold later flushes into it
+            if name == 'updated' and previous is not None and previous['event'] != 'deleted':
+                previous['data'].update(data)
+                return
+            latest[key] = {
+                'entity_type': key[0],
+                'entity_id': key[1],
+                'event': name,
+                'data': data,
+                'actor_id': actor,
+                'created_at': now
+            }
+            buffer.append(latest[key])
+
+        for target in session.new:
+            if type(target) in self.entity_types:
+                fields = TRACKED_FIELDS[self.entity_types[type(target)]]
+                add(target, 'created', {field: encode(getattr(target, field)) for field in fields})
+        for target in session.dirty:
+            if type(target) in self.entity_types:
+                attrs = inspect(target).attrs
+                changed = {}
+                for field in TRACKED_FIELDS[self.entity_types[type(target)]]:
+                    history = attrs[field].history
+                    if history.added:
+                        changed[field] = encode(history.added[0])
+                if changed:
+                    add(target, 'updated', changed)
+        for target in session.deleted:
+            if type(target) in self.entity_types:
+                add(target, 'deleted', {})
+
+    def record_many(self, entity_type, event_name, items, actor_id=None):
+        """Buffer events for rows changed outside the ORM; items are (entity_id, data)."""
+        if not self.enabled:
+            return
+        now = datetime.utcnow()
+        db.session.info.setdefault(BUFFER_KEY, []).extend({
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'event': event_name,
+            'data': data,
+            'actor_id': actor_id,
+            'created_at': now
+        } for entity_id, data in items)
+
+    def _write(self, session):
+        """Group-commit the buffered events in the closing transaction."""
+        # Flush now so the commit's own flush has nothing left to buffer
+        session.flush()
+        buffer = session.info.pop(BUFFER_KEY, None)
+        session.info.pop(BUFFER_KEY + '.latest', None)
+        if buffer:
+            for entry in buffer:
+                entry['data'] = json.dumps(entry['data'], sort_keys=True)
+            session.execute(insert(EntityEvent), buffer)
+
+    def _discard(self, session, transaction):
+        # Whatever is left when the outermost transaction ends was rolled back
+        if transaction.parent is None:
+            session.info.pop(BUFFER_KEY, None)
+            session.info.pop(BUFFER_KEY + '.latest', None)
+
+    def history(self, entity_type, entity_id, until_id=None):
+        """Events for one entity, oldest first."""
+        query = select(EntityEvent).where(
+            EntityEvent.entity_type == entity_type,
+            EntityEvent.entity_id == entity_id
+        ).order_by(EntityEvent.id)
+        if until_id is not None:
+            query = query.where(EntityEvent.id <= until_id)
+        return db.session.scalars(query).all()
+
+    def rebuild(self, entity_type, entity_id, until_id=None):
+        """An entity's state after its events up to until_id (default: all)."""
+        return replay(self.history(entity_type, entity_id, until_id))
+
+    def feed(self, after_id=0, entity_types=None, limit=500):
+        """The next events after a cursor, for consumers that follow the log."""
+        query = select(EntityEvent).where(EntityEvent.id > after_id).order_by(EntityEvent.id).limit(limit)
+        if entity_types:
+            query = query.where(EntityEvent.entity_type.in_(entity_types))
+        return db.session.scalars(query).all()
+
+
+event_log = EventLog()
@@ -0,0 +1,280 @@
+"""
+In-process publish/subscribe hub for vehicle availability and booking events.
+
+Subscribers hold a small bounded queue. A subscriber whose queue is full when
+an event arrives is evicted rather than allowed to buffer without limit, so
+slow clients can't grow memory. Events published in one worker reach the
+other workers through a pluggable fan-out backend.
+"""
+
+import json
+import os
+import socket
+import threading
+import itertools
+from collections import deque
+from datetime import datetime
+
+
+class Subscriber:
+    """One connected event-stream client."""
+    __slots__ = ('user_id', 'is_admin', 'queue', 'maxsize', 'closed', 'reason', '_cond')
+
+    def __init__(self, user_id=None, is_admin=False, maxsize=100):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.queue = deque()
+        self.maxsize = maxsize
+        self.closed = False
+        self.reason = None
+        self._cond = threading.Condition()
+
+    def wants(self, event):
+        """Public events go to everyone, booking events only to their owner and admins."""
+        owner = event.get('user_id')
+        return owner is None or self.is_admin or owner == self.user_id
+
+    def offer(self, event):
+        """Queue an event. Returns False if the subscriber had to be evicted."""
+        with self._cond:
+            if self.closed:
+                return False
+            if len(self.queue) >= self.maxsize:
+                self.closed = True
+                self.reason = 'slow consumer'
+                self._cond.notify_all()
+                return False
+            self.queue.append(event)
+            self._cond.notify_all()
+        self.wake()
+        return True
+
+    def wake(self):
+        """Hook for consumers that don't block on the condition (e.g. asyncio)."""
+
+    def close(self, reason=None):
+        with self._cond:
+            self.closed = True
+            self.reason = reason
+            self._cond.notify_all()
+        self.wake()
+
+    def drain(self):
+        """Pop every queued event without blocking."""
+        with self._cond:
+            events = list(self.queue)
+            self.queue.clear()
+        return events
+
+    def wait(self, timeout=None):
+        """Block until events arrive, the subscriber closes, or the timeout passes."""
+        with self._cond:
+            if not self.queue and not self.closed:
+                self._cond.wait(timeout)
+        return self.drain()
+
+
+class AsyncSubscriber(Subscriber):
+    """Subscriber woken through an asyncio event instead of a blocked thread."""
+    __slots__ = ('loop', 'ready')
+
+    def __init__(self, loop, ready, **kwargs):
+        super().__init__(**kwargs)
+        self.loop = loop
+        self.ready = ready
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self.ready.set)
+
+
+class LocalFanout:
+    """Single-process backend: events only reach this worker's subscribers."""
+
+    def start(self, deliver):
+        self.deliver = deliver
+
+    def broadcast(self, event):
+        self.deliver(event)
+
+    def stop(self):
+        pass
+
+
+class SocketFanout:
+    """
+    Cross-worker backend using Unix datagram sockets in a shared directory.
+
+    Each worker binds ``<dir>/worker-<pid>.sock`` and a background thread
+    delivers whatever it receives. Publishing sends the event to every socket
+    in the directory, including our own. Intended for single-host deployments
+    and tests; a broker-backed backend can implement the same three methods.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = None
+        self.sock = None
+
+    def start(self, deliver):
+        self.deliver = deliver
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f'worker-{os.getpid()}.sock')
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        threading.Thread(target=self._receive, name='event-fanout', daemon=True).start()
+
+    def _receive(self):
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except OSError:
+                return
+            try:
+                self.deliver(json.loads(data))
+            except ValueError:
+                print("Dropped malformed fan-out event")
+
+    def broadcast(self, event):
+        data = json.dumps(event).encode('utf-8')
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            for name in os.listdir(self.directory):
+                if not name.endswith('.sock'):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    sender.sendto(data, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Worker went away without cleaning up
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                except OSError as e:
+                    print(f"Fan-out to {name} failed: {str(e)}")
+        finally:
+            sender.close()
+
+    def stop(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class EventHub:
+    """Publish/subscribe hub shared by all request threads in a worker."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.listeners = {}
+        self.backend = LocalFanout()
+        self.queue_size = 100
+        self.heartbeat = 15
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pid = None
+
+    def init_app(self, app):
+        """Configure the hub from the app config."""
+        self.queue_size = app.config.get('EVENTS_QUEUE_SIZE', 100)
+        self.heartbeat = app.config.get('EVENTS_HEARTBEAT', 15)
+        if app.config.get('EVENTS_BACKEND', 'local') == 'socket':
+            self.backend = SocketFanout(app.config['EVENTS_SOCKET_DIR'])
+        else:
+            self.backend = LocalFanout()
+        app.extensions['event_hub'] = self
+
+    def _ensure_started(self):
+        # Backends are started lazily so each forked worker gets its own socket
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.backend.start(self._deliver)
+                    self._pid = os.getpid()
+
+    def subscribe(self, user_id=None, is_admin=False, subscriber=None):
+        self._ensure_started()
+        subscriber = subscriber or Subscriber(user_id, is_admin, self.queue_size)
+        subscriber.maxsize = self.queue_size
+        with self._lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+    def on(self, event_type, fn):
+        """Call fn(event) in every worker whenever an event of this type arrives."""
+        self.listeners.setdefault(event_type, []).append(fn)
+
+    def publish(self, event_type, data, user_id=None, internal=False):
+        """Publish an event to every worker's subscribers.
+
+        Internal events only reach listeners registered with on(), never
+        event-stream clients.
+        """
+        self._ensure_started()
+        event = {
+            'id': f'{os.getpid()}-{next(self._ids)}',
+            'type': event_type,
+            'user_id': user_id,
+            'data': data,
+            'internal': internal,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        try:
+            self.backend.broadcast(event)
+        except Exception as e:
+            print(f"Error publishing {event_type} event: {str(e)}")
+
+    def _deliver(self, event):
+        for fn in self.listeners.get(event['type'], ()):
+            try:
+                fn(event)
+            except Exception as e:
+                print(f"Error in {event['type']} listener: {str(e)}")
+        if event.get('internal'):
+            return
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            if subscriber.wants(event) and not subscriber.offer(event):
+                self.unsubscribe(subscriber)
+
+
+def format_sse(event):
+    """Encode an event in text/event-stream framing."""
+    payload = dict(event['data'], timestamp=event['timestamp'])
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(payload)}\n\n"
+
+
+hub = EventHub()
+
+
+def booking_changed(booking, event_type='booking.status'):
+    """Publish a booking status event and the resulting availability change."""
+    hub.publish(event_type, {
+        'booking_id': booking.id,
+        'vehicle_id': booking.vehicle_id,
+        'status': 'deleted' if event_type == 'booking.deleted' else booking.status
+    }, user_id=booking.user_id)
+    hub.publish('vehicle.availability', {
+        'vehicle_id': booking.vehicle_id,
+        'booking_id': booking.id,
+        'start_date': booking.start_date.isoformat(),
+        'end_date': booking.end_date.isoformat(),
+        'booked': event_type != 'booking.deleted' and booking.status in ['pending', 'confirmed']
+    })
+
+
+def vehicle_changed(vehicle):
+    """Publish a vehicle's fleet-wide availability flag."""
+    hub.publish('vehicle.availability', {
+        'vehicle_id': vehicle.id,
+        'is_available': vehicle.is_available
+    })
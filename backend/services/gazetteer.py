@@ -0,0 +1,66 @@
+"""
+Offline place-name lookup.
+
+Loads a local CSV gazetteer (``name,lat,lon`` with a header row) so free-text
+locations such as ``Vehicle.location`` can be turned into coordinates without
+calling an external geocoding service.
+"""
+
+import csv
+import re
+
+
+def normalize(name):
+    """Case- and whitespace-insensitive key for a place name."""
+    return re.sub(r'\s+', ' ', name or '').strip().lower()
+
+
+def parse_coordinates(text):
+    """Parse a literal 'lat,lon' string. Returns (lat, lon) or None."""
+    match = re.fullmatch(r'\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*', text or '')
+    if not match:
+        return None
+    lat, lon = float(match.group(1)), float(match.group(2))
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return lat, lon
+    return None
+
+
+class Gazetteer:
+    """In-memory name -> (lat, lon) map loaded from a CSV file."""
+
+    def __init__(self):
+        self.places = {}
+
+    def init_app(self, app):
+        path = app.config.get('GAZETTEER_FILE')
+        if path:
+            self.load(path)
+        app.extensions['gazetteer'] = self
+
+    def load(self, path):
+        places = {}
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                places[normalize(row['name'])] = (float(row['lat']), float(row['lon']))
+        self.places = places
+        print(f"Loaded {len(places)} places from {path}")
+
+    def lookup(self, text):
+        """Resolve a place name or literal 'lat,lon'. Returns (lat, lon) or None."""
+        coordinates = parse_coordinates(text)
+        if coordinates:
+            return coordinates
+        key = normalize(text)
+        if key in self.places:
+            return self.places[key]
+        # 'Queen St, Auckland' -> try the most specific known suffix
+        parts = [p.strip() for p in key.split(',')]
+        for i in range(1, len(parts)):
+            suffix = ', '.join(parts[i:])
+            if suffix in self.places:
+                return self.places[suffix]
+        return None
+
+
+gazetteer = Gazetteer()
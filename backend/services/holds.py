@@ -0,0 +1,194 @@
+"""
+Short-lived checkout holds.
+
+A hold reserves a vehicle for a date range for a few minutes while the
+customer pays. Holds live only in memory: a dict of active holds, indexed by
+vehicle, plus a heap ordered by expiry that is swept lazily whenever the
+table is consulted. Nothing is written to the database unless the hold is
+paid for, when it is promoted to a confirmed booking in the payment's
+transaction.
+
+Placing or releasing a hold is mirrored to other workers through the event
+hub's internal events. Expiry uses wall-clock time so every worker drops a
+hold at the same moment. The booking availability check against the
+database remains the final guard when a hold is promoted.
+"""
+
+import heapq
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from services.events import hub
+
+PLACED_EVENT = 'internal.hold.placed'
+RELEASED_EVENT = 'internal.hold.released'
+
+
+class Hold:
+    """A vehicle reserved for a date range until expires_at (epoch seconds)."""
+    __slots__ = ('id', 'vehicle_id', 'user_id', 'start_date', 'end_date',
+                 'total_price', 'expires_at', 'claimed')
+
+    def __init__(self, id, vehicle_id, user_id, start_date, end_date, total_price, expires_at):
+        self.id = id
+        self.vehicle_id = vehicle_id
+        self.user_id = user_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.total_price = total_price
+        self.expires_at = expires_at
+        self.claimed = False
+
+    def overlaps(self, start_date, end_date):
+        return self.start_date < end_date and self.end_date > start_date
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'vehicle_id': self.vehicle_id,
+            'user_id': self.user_id,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'total_price': float(self.total_price),
+            'expires_at': datetime.utcfromtimestamp(self.expires_at).isoformat(),
+            'expires_in': max(0, round(self.expires_at - time.time()))
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['id'],
+            data['vehicle_id'],
+            data['user_id'],
+            datetime.fromisoformat(data['start_date']),
+            datetime.fromisoformat(data['end_date']),
+            data['total_price'],
+            data['expires_at_epoch']
+        )
+
+
+class HoldTable:
+    """Expiring in-memory table of checkout holds."""
+
+    def __init__(self):
+        self.ttl = 600
+        self.max_per_user = 3
+        self.holds = {}
+        self.by_vehicle = {}
+        self._expiry = []     # (expires_at, hold_id) heap; stale entries skipped
+        self._released = {}   # hold_id -> expires_at, so late 'placed' echoes are ignored
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('HOLD_TTL_MINUTES', 10) * 60
+        self.max_per_user = app.config.get('HOLD_MAX_PER_USER', 3)
+        hub.on(PLACED_EVENT, lambda event: self._install(Hold.from_dict(event['data'])))
+        hub.on(RELEASED_EVENT, lambda event: self._remove(event['data']['id']))
+        app.extensions['holds'] = self
+
+    def _install(self, hold):
+        with self._lock:
+            if hold.id in self.holds or hold.id in self._released or hold.expires_at <= time.time():
+                return
+            self.holds[hold.id] = hold
+            self.by_vehicle.setdefault(hold.vehicle_id, {})[hold.id] = hold
+            heapq.heappush(self._expiry, (hold.expires_at, hold.id))
+
+    def _remove(self, hold_id):
+        with self._lock:
+            hold = self.holds.pop(hold_id, None)
+            if hold is None:
+                return None
+            if hold.expires_at > time.time():
+                self._released[hold_id] = hold.expires_at
+            vehicle_holds = self.by_vehicle.get(hold.vehicle_id)
+            if vehicle_holds is not None:
+                vehicle_holds.pop(hold_id, None)
+                if not vehicle_holds:
+                    del self.by_vehicle[hold.vehicle_id]
+            return hold
+
+    def _expire(self):
+        """Drop holds (and release markers) whose time is up."""
+        now = time.time()
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                _, hold_id = heapq.heappop(self._expiry)
+                hold = self.holds.get(hold_id)
+                if hold is not None and not hold.claimed:
+                    self._remove(hold_id)
+                self._released.pop(hold_id, None)
+
+    def conflicts(self, vehicle_id, start_date, end_date, user_id=None):
+        """True if another user holds the vehicle for overlapping dates."""
+        if not self.holds:
+            return False
+        self._expire()
+        with self._lock:
+            for hold in self.by_vehicle.get(vehicle_id, {}).values():
+                if hold.user_id != user_id and hold.overlaps(start_date, end_date):
+                    return True
+        return False
+
+    def held_vehicle_ids(self, start_date, end_date, user_id=None):
+        """Ids of vehicles held by other users for overlapping dates."""
+        if not self.holds:
+            return set()
+        self._expire()
+        with self._lock:
+            return {hold.vehicle_id for hold in self.holds.values()
+                    if hold.user_id != user_id and hold.overlaps(start_date, end_date)}
+
+    def user_holds(self, user_id):
+        self._expire()
+        with self._lock:
+            return [hold for hold in self.holds.values() if hold.user_id == user_id]
+
+    def place(self, vehicle_id, user_id, start_date, end_date, total_price):
+        """Hold a vehicle. Returns the Hold, or None if another hold overlaps.
+
+        The caller checks bookings in the database first; the check against
+        other holds and the insert happen under one lock.
+        """
+        self._expire()
+        with self._lock:
+            if self.conflicts(vehicle_id, start_date, end_date, user_id):
+                return None
+            hold = Hold(uuid.uuid4().hex, vehicle_id, user_id, start_date, end_date,
+                        total_price, time.time() + self.ttl)
+            self._install(hold)
+        data = dict(hold.to_dict(), expires_at_epoch=hold.expires_at)
+        hub.publish(PLACED_EVENT, data, internal=True)
+        return hold
+
+    def claim(self, hold_id, user_id):
+        """Mark a live hold as being paid for. Returns it, or None.
+
+        A claimed hold keeps blocking other customers and cannot be claimed
+        twice, until it is released (paid) or unclaimed (payment failed).
+        """
+        self._expire()
+        with self._lock:
+            hold = self.holds.get(hold_id)
+            if hold is None or hold.user_id != user_id or hold.claimed:
+                return None
+            hold.claimed = True
+            return hold
+
+    def unclaim(self, hold):
+        with self._lock:
+            hold.claimed = False
+            # Its heap entry may have been skipped while it was claimed
+            if hold.expires_at <= time.time():
+                self._remove(hold.id)
+
+    def release(self, hold_id):
+        """Remove a hold everywhere (paid for or cancelled)."""
+        hold = self._remove(hold_id)
+        hub.publish(RELEASED_EVENT, {'id': hold_id}, internal=True)
+        return hold
+
+
+holds = HoldTable()
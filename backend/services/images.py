@@ -0,0 +1,163 @@
+"""
+Content-addressed vehicle images with resized variants.
+
+An upload is named by the SHA-256 of its bytes and stored once under
+``IMAGE_DIR/original/<hash>``, so uploading the same file twice reuses it.
+Each variant in IMAGE_VARIANTS (by default a thumbnail and a catalog card
+size) is rendered by a small thread pool after the upload returns and is
+written to ``IMAGE_DIR/<variant>/<hash>.<format>``. A variant that is missing
+when requested (not rendered yet, or deleted) is queued again.
+
+Since the content decides the URL, ready variants are served as immutable
+for a year. Changing IMAGE_VARIANTS sizes therefore needs a new variant
+name. Pillow is only needed by the workers that render variants.
+"""
+
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Leading bytes of the accepted upload formats
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+
+def sniff(data):
+    """MIME type of an image from its leading bytes, or None."""
+    for signature, mimetype in SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+class ImageStore:
+    """Stores originals by content hash and renders their variants."""
+
+    def __init__(self):
+        self.directory = 'media'
+        self.variants = {'thumb': (160, 120), 'card': (480, 320)}
+        self.format = 'WEBP'
+        self.quality = 80
+        self.max_bytes = 10 * 1024 * 1024
+        self.workers = 2
+        self._executor = None
+        self._pid = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.directory = os.path.abspath(app.config.get('IMAGE_DIR', 'media'))
+        self.variants = app.config.get('IMAGE_VARIANTS', self.variants)
+        self.format = app.config.get('IMAGE_VARIANT_FORMAT', 'WEBP').upper()
+        self.quality = app.config.get('IMAGE_VARIANT_QUALITY', 80)
+        self.max_bytes = app.config.get('IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+        self.workers = app.config.get('IMAGE_WORKERS', 2)
+        app.extensions['images'] = self
+
+    @property
+    def extension(self):
+        return '.jpg' if self.format == 'JPEG' else f'.{self.format.lower()}'
+
+    def original_path(self, digest):
+        return os.path.join(self.directory, 'original', digest)
+
+    def variant_path(self, digest, variant):
+        return os.path.join(self.directory, variant, digest + self.extension)
+
+    def exists(self, digest):
+        return bool(digest and HASH_PATTERN.match(digest) and os.path.exists(self.original_path(digest)))
+
+    def urls(self, digest):
+        """Public URLs of an image's original and variants."""
+        if not digest:
+            return None
+        urls = {'original': f'/api/images/{digest}/original'}
+        for variant in self.variants:
+            urls[variant] = f'/api/images/{digest}/{variant}'
+        return urls
+
+    @staticmethod
+    def _write_atomic(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def store(self, data):
+        """Save an upload. Returns (hash, created); created is False for a duplicate."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.original_path(digest)
+        created = not os.path.exists(path)
+        if created:
+            self._write_atomic(path, data)
+        if created or not self.ready(digest):
+            self.schedule(digest)
+        return digest, created
+
+    def ready(self, digest):
+        return all(os.path.exists(self.variant_path(digest, variant)) for variant in self.variants)
+
+    def schedule(self, digest):
+        """Render an image's missing variants in the background (once at a time)."""
+        with self._lock:
+            if digest in self._pending:
+                return
+            self._pending.add(digest)
+            # Pools don't survive a fork; each worker creates its own
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='image-variants')
+                self._pid = os.getpid()
+            executor = self._executor
+        executor.submit(self._render, digest)
+
+    def _render(self, digest):
+        try:
+            self.render(digest)
+        except Exception as e:
+            print(f"Could not render variants of image {digest}: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(digest)
+
+    def render(self, digest):
+        """Write every missing variant of an image."""
+        from PIL import Image, ImageOps
+
+        missing = {name: size for name, size in self.variants.items()
+                   if not os.path.exists(self.variant_path(digest, name))}
+        if not missing:
+            return
+        with Image.open(self.original_path(digest)) as original:
+            # Let JPEG decode at a reduced scale when the largest variant allows it
+            largest = max(missing.values())
+            original.draft('RGB', largest)
+            image = ImageOps.exif_transpose(original)
+            mode = 'RGBA' if image.mode in ('RGBA', 'LA', 'P') and self.format != 'JPEG' else 'RGB'
+            image = image.convert(mode)
+            for name, size in sorted(missing.items(), key=lambda item: item[1], reverse=True):
+                variant = image.copy()
+                variant.thumbnail(size, Image.LANCZOS)
+                buffer = io.BytesIO()
+                variant.save(buffer, self.format, quality=self.quality, optimize=True)
+                self._write_atomic(self.variant_path(digest, name), buffer.getvalue())
+
+
+images = ImageStore()
@@ -0,0 +1,172 @@
+"""
+Maintenance blackout windows.
+
+A window is a blackout interval for one vehicle, optionally repeating every
+n days, weeks or months until a date (or indefinitely). Its occurrences are
+stored as maintenance_blackouts rows, indexed by (vehicle_id, start_date,
+end_date) like bookings, so every availability check adds one more
+``EXISTS`` to the query it already runs instead of expanding recurrences per
+vehicle. One-off windows are stored whole; repeating ones are expanded
+MAINTENANCE_HORIZON_DAYS ahead.
+The horizon moves forward at start-up and with ``flask maintenance extend``
+(run it daily).
+"""
+
+import calendar
+from datetime import datetime, timedelta
+
+from flask.cli import AppGroup
+from sqlalchemy import select, insert, delete, and_, or_
+
+from models import db
+from models.booking import Booking
+from models.maintenance import MaintenanceWindow, MaintenanceBlackout
+from readiness import register_warmer
+
+RECURRENCES = ('daily', 'weekly', 'monthly')
+
+maintenance_cli = AppGroup('maintenance', help='Maintenance window commands.')
+
+
+def add_months(moment, months):
+    """Same day and time n months later, clamped to the end of shorter months."""
+    month = moment.month - 1 + months
+    year, month = moment.year + month // 12, month % 12 + 1
+    return moment.replace(year=year, month=month, day=min(moment.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrences(window, after, before):
+    """(start, end) of a window's occurrences starting in [after, before)."""
+    duration = window.end_date - window.start_date
+    interval = max(1, window.interval or 1)
+    limit = min(before, window.until + timedelta(microseconds=1)) if window.until else before
+    if not window.recurrence:
+        if after <= window.start_date < limit:
+            yield window.start_date, window.end_date
+        return
+
+    n = 0
+    if window.recurrence in ('daily', 'weekly'):
+        step = timedelta(days=interval * (7 if window.recurrence == 'weekly' else 1))
+        # Jump straight to the first occurrence at or after `after`
+        if after > window.start_date:
+            n = -(-(after - window.start_date) // step)
+        start = window.start_date + n * step
+        while start < limit:
+            yield start, start + duration
+            n += 1
+            start = window.start_date + n * step
+    else:
+        start = window.start_date
+        while start < limit:
+            if start >= after:
+                yield start, start + duration
+            n += 1
+            start = add_months(window.start_date, n * interval)
+
+
+class MaintenanceSchedule:
+    """Stores maintenance windows and keeps their occurrences expanded."""
+
+    def __init__(self):
+        self.horizon_days = 730
+        self.max_occurrences = 5000
+
+    def init_app(self, app):
+        self.horizon_days = app.config.get('MAINTENANCE_HORIZON_DAYS', 730)
+        self.max_occurrences = app.config.get('MAINTENANCE_MAX_OCCURRENCES', 5000)
+        register_warmer('maintenance_horizon', self.extend_all)
+        app.cli.add_command(maintenance_cli)
+        app.extensions['maintenance'] = self
+
+    def horizon(self, now=None):
+        return (now or datetime.utcnow()) + timedelta(days=self.horizon_days)
+
+    def expand(self, window, horizon=None):
+        """Store the window's occurrences up to the horizon (the caller commits)."""
+        horizon = horizon or self.horizon()
+        if not window.recurrence:
+            # A single occurrence is stored in full, however far ahead it is
+            if window.expanded_until:
+                return 0
+            db.session.execute(insert(MaintenanceBlackout), [{
+                'window_id': window.id, 'vehicle_id': window.vehicle_id,
+                'start_date': window.start_date, 'end_date': window.end_date}])
+            window.expanded_until = max(horizon, window.end_date)
+            return 1
+        after = window.expanded_until or window.start_date
+        if after >= horizon:
+            return 0
+        rows = []
+        for start, end in occurrences(window, after, horizon):
+            rows.append({'window_id': window.id, 'vehicle_id': window.vehicle_id,
+                         'start_date': start, 'end_date': end})
+            if len(rows) > self.max_occurrences:
+                raise ValueError(f'Window repeats more than {self.max_occurrences} times within the horizon')
+        if rows:
+            db.session.execute(insert(MaintenanceBlackout), rows)
+        window.expanded_until = horizon
+        return len(rows)
+
+    def create(self, vehicle_id, start_date, end_date, recurrence=None, interval=1, until=None,
+               reason=None, user_id=None):
+        window = MaintenanceWindow(vehicle_id=vehicle_id, start_date=start_date, end_date=end_date,
+                                   recurrence=recurrence, interval=interval, until=until,
+                                   reason=reason, created_by=user_id)
+        db.session.add(window)
+        db.session.flush()
+        self.expand(window)
+        return window
+
+    def delete(self, window):
+        """Remove a window and its stored occurrences (the caller commits)."""
+        db.session.execute(delete(MaintenanceBlackout).where(MaintenanceBlackout.window_id == window.id))
+        db.session.delete(window)
+
+    def extend_all(self):
+        """Move every open window's stored occurrences up to the current horizon."""
+        horizon = self.horizon()
+        windows = db.session.scalars(
+            select(MaintenanceWindow).where(
+                # One-off windows only if never stored (created beyond the horizon by older versions)
+                or_(MaintenanceWindow.recurrence.isnot(None), MaintenanceWindow.expanded_until.is_(None)),
+                or_(MaintenanceWindow.expanded_until.is_(None), MaintenanceWindow.expanded_until < horizon),
+                or_(MaintenanceWindow.until.is_(None), MaintenanceWindow.expanded_until.is_(None),
+                    MaintenanceWindow.until >= MaintenanceWindow.expanded_until)
+            )
+        ).all()
+        added = sum(self.expand(window, horizon) for window in windows)
+        db.session.commit()
+        return added
+
+    def conflicting_bookings(self, window):
+        """Active bookings that overlap any stored occurrence of the window."""
+        return db.session.scalars(
+            select(Booking).join(MaintenanceBlackout, and_(
+                MaintenanceBlackout.vehicle_id == Booking.vehicle_id,
+                MaintenanceBlackout.start_date < Booking.end_date,
+                MaintenanceBlackout.end_date > Booking.start_date
+            )).where(
+                MaintenanceBlackout.window_id == window.id,
+                Booking.status.in_(['pending', 'confirmed'])
+            ).distinct().order_by(Booking.start_date)
+        ).all()
+
+    def blackouts(self, vehicle_id, start_date, end_date):
+        """Stored occurrences for a vehicle overlapping a date range."""
+        return db.session.scalars(
+            select(MaintenanceBlackout).where(
+                MaintenanceBlackout.vehicle_id == vehicle_id,
+                MaintenanceBlackout.start_date < end_date,
+                MaintenanceBlackout.end_date > start_date
+            ).order_by(MaintenanceBlackout.start_date)
+        ).all()
+
+
+maintenance = MaintenanceSchedule()
+
+
+@maintenance_cli.command('extend')
+def extend_maintenance():
+    """Expand recurring maintenance windows up to the horizon."""
+    print(f"Added {maintenance.extend_all()} maintenance occurrences")
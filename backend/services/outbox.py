@@ -0,0 +1,486 @@
+"""
+Transactional outbox for customer notifications.
+
+Endpoints never talk to a mail server. They add an ``outbox`` row with
+notify() in the same transaction as the booking or payment change, so a
+notification exists if and only if the change committed. A dispatcher thread
+in each worker (or ``flask outbox dispatch`` when OUTBOX_DISPATCHER=off)
+claims due rows in batches and sends them through the transport registered
+for their channel. SMTP connections are kept open across a batch.
+
+Delivery is at least once. A failed send is retried with exponential backoff
+(OUTBOX_BACKOFF_SECONDS doubled per attempt, capped, with jitter) until
+OUTBOX_MAX_ATTEMPTS, then the row is marked ``dead``. Permanent failures go
+straight to ``dead``. Rows left in ``sending`` by a worker that died are
+claimed again after OUTBOX_CLAIM_TIMEOUT seconds. LocalSMTPServer is a
+minimal SMTP stand-in for development and tests.
+"""
+
+import os
+import random
+import smtplib
+import socketserver
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, insert, update, func, or_, and_, event
+
+from models import db
+from models.outbox import OutboxMessage
+from services.replicas import RoutingSession
+
+ENQUEUED_KEY = 'outbox_enqueued'
+
+outbox_cli = AppGroup('outbox', help='Notification outbox commands.')
+
+# topic -> (subject, body), formatted with the notification context
+TEMPLATES = {
+    'booking.created': (
+        'Booking #{booking_id} confirmed',
+        'Hi {username},\n\nYour {vehicle} is booked from {start_date} to {end_date}.\n'
+        'Total: {total_price:.2f}\n\nRanger Rentals\n'
+    ),
+    'payment.completed': (
+        'Payment received for booking #{booking_id}',
+        'Hi {username},\n\nWe received your payment of {amount:.2f} ({transaction_id}) '
+        'for your {vehicle}, {start_date} to {end_date}.\n\nRanger Rentals\n'
+    ),
+    'booking.cancelled': (
+        'Booking #{booking_id} cancelled',
+        'Hi {username},\n\nWe are sorry: your {vehicle} booking from {start_date} to {end_date} '
+        'has been cancelled because the vehicle was taken out of service ({reason}).\n'
+        'Refund due: {refund_amount:.2f}\n\nRanger Rentals\n'
+    ),
+    'booking.conflict_cancelled': (
+        'Booking #{booking_id} cancelled',
+        'Hi {username},\n\nWe are sorry: your {vehicle} booking from {start_date} to {end_date} '
+        'has been cancelled because the vehicle was also booked by another customer for those dates.\n'
+        'Refund due: {refund_amount:.2f}\n\nRanger Rentals\n'
+    ),
+    'payment.refunded': (
+        'Refund for booking #{booking_id}',
+        'Hi {username},\n\nYour payment of {amount:.2f} ({transaction_id}) for booking '
+        '#{booking_id} has been refunded.\n\nRanger Rentals\n'
+    ),
+}
+
+
+class PermanentDeliveryError(Exception):
+    """A send that will never succeed (bad address, unknown channel)."""
+
+
+def booking_context(booking):
+    """Template fields describing a booking."""
+    vehicle = booking.vehicle
+    return {
+        'booking_id': booking.id,
+        'vehicle': f'{vehicle.year} {vehicle.make} {vehicle.model}' if vehicle else 'vehicle',
+        'start_date': booking.start_date.strftime('%Y-%m-%d %H:%M'),
+        'end_date': booking.end_date.strftime('%Y-%m-%d %H:%M'),
+        'total_price': float(booking.total_price)
+    }
+
+
+class LogTransport:
+    """Prints messages instead of sending them (channels without a provider)."""
+
+    def send(self, message):
+        print(f"Notification ({message.channel}) to {message.recipient}: {message.subject or message.body[:80]}")
+
+    def close(self):
+        pass
+
+
+class SMTPTransport:
+    """Sends email over one SMTP connection, reused until closed."""
+
+    def __init__(self, host, port=25, username=None, password=None, starttls=False,
+                 sender='no-reply@ranger.com', timeout=10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.sender = sender
+        self.timeout = timeout
+        self.connection = None
+
+    def _connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password)
+        self.connection = connection
+
+    def send(self, message):
+        email = EmailMessage()
+        email['From'] = self.sender
+        email['To'] = message.recipient
+        email['Subject'] = message.subject or ''
+        # Stable id so receivers can drop a redelivery
+        email['Message-ID'] = f"<outbox-{message.id}@{self.sender.rpartition('@')[2] or 'localhost'}>"
+        email.set_content(message.body)
+
+        while True:
+            reused = self.connection is not None
+            if not reused:
+                self._connect()
+            try:
+                self.connection.send_message(email)
+                return
+            except smtplib.SMTPServerDisconnected:
+                # A reused connection may have timed out on the server; reconnect once
+                self.connection = None
+                if not reused:
+                    raise
+            except smtplib.SMTPRecipientsRefused as e:
+                if all(code >= 500 for code, _ in e.recipients.values()):
+                    raise PermanentDeliveryError(f'Recipient refused: {e.recipients}')
+                raise
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code >= 500:
+                    raise PermanentDeliveryError(f'{e.smtp_code} {e.smtp_error!r}')
+                raise
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.connection = None
+
+
+class Outbox:
+    """Writes notifications with the business change and dispatches them later."""
+
+    def __init__(self):
+        self.app = None
+        self.mode = 'thread'
+        self.batch_size = 50
+        self.max_attempts = 6
+        self.backoff = 30
+        self.backoff_max = 3600
+        self.poll_interval = 5
+        self.claim_timeout = 300
+        self.transports = {'email': LogTransport(), 'sms': LogTransport()}
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._listening = False
+
+    def init_app(self, app):
+        self.app = app
+        self.mode = app.config.get('OUTBOX_DISPATCHER', 'thread')
+        self.batch_size = app.config.get('OUTBOX_BATCH_SIZE', 50)
+        self.max_attempts = app.config.get('OUTBOX_MAX_ATTEMPTS', 6)
+        self.backoff = app.config.get('OUTBOX_BACKOFF_SECONDS', 30)
+        self.backoff_max = app.config.get('OUTBOX_BACKOFF_MAX_SECONDS', 3600)
+        self.poll_interval = app.config.get('OUTBOX_POLL_SECONDS', 5)
+        self.claim_timeout = app.config.get('OUTBOX_CLAIM_TIMEOUT', 300)
+        if app.config.get('SMTP_HOST'):
+            self.transports['email'] = SMTPTransport(
+                app.config['SMTP_HOST'],
+                app.config.get('SMTP_PORT', 25),
+                app.config.get('SMTP_USERNAME'),
+                app.config.get('SMTP_PASSWORD'),
+                app.config.get('SMTP_STARTTLS', False),
+                app.config.get('SMTP_SENDER', 'no-reply@ranger.com')
+            )
+        if not self._listening:
+            event.listen(RoutingSession, 'after_commit', self._committed)
+            self._listening = True
+        # Started from a request so each forked worker gets its own thread
+        app.before_request(self._ensure_started)
+        app.cli.add_command(outbox_cli)
+        app.extensions['outbox'] = self
+
+    def register_transport(self, channel, transport):
+        """Deliver a channel through transport.send(message) / transport.close()."""
+        self.transports[channel] = transport
+
+    def notify(self, topic, user, **context):
+        """Add an email for user to the current transaction (the caller commits)."""
+        context.setdefault('username', user.username)
+        subject, body = self.render(topic, **context)
+        return self.enqueue('email', user.email, topic, body, subject)
+
+    @staticmethod
+    def render(topic, **context):
+        """(subject, body) of a topic's template."""
+        subject, body = TEMPLATES[topic]
+        return subject.format(**context), body.format(**context)
+
+    def enqueue(self, channel, recipient, topic, body, subject=None):
+        message = OutboxMessage(channel=channel, recipient=recipient, topic=topic,
+                                body=body, subject=subject)
+        db.session.add(message)
+        db.session.info[ENQUEUED_KEY] = True
+        return message
+
+    def enqueue_many(self, messages):
+        """Add message dicts (channel, recipient, topic, body, subject) with one INSERT."""
+        if messages:
+            db.session.execute(insert(OutboxMessage), messages)
+            db.session.info[ENQUEUED_KEY] = True
+
+    def _committed(self, session):
+        if session.info.pop(ENQUEUED_KEY, False):
+            self.wake()
+
+    def wake(self):
+        """Ask the dispatcher to run now instead of at its next poll."""
+        self._ensure_started()
+        self._wake.set()
+
+    def _ensure_started(self):
+        if self.mode != 'thread' or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='outbox-dispatcher', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    while self.dispatch_batch():
+                        pass
+            except Exception as e:
+                print(f"Outbox dispatcher error: {str(e)}")
+            self.close_transports()
+
+    def _due(self, now):
+        return or_(
+            and_(OutboxMessage.status == 'pending', OutboxMessage.next_attempt_at <= now),
+            and_(OutboxMessage.status == 'sending',
+                 OutboxMessage.claimed_at < now - timedelta(seconds=self.claim_timeout))
+        )
+
+    def claim(self):
+        """Mark up to batch_size due messages as ours and return them."""
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        ids = db.session.scalars(
+            select(OutboxMessage.id).where(self._due(now))
+            .order_by(OutboxMessage.id).limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not ids:
+            db.session.rollback()
+            return []
+        # Re-checking the due condition makes a concurrent claim of the same rows a no-op
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids), self._due(now))
+            .values(status='sending', claim_token=token, claimed_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return db.session.scalars(
+            select(OutboxMessage).where(OutboxMessage.claim_token == token).order_by(OutboxMessage.id)
+        ).all()
+
+    def retry_delay(self, attempts):
+        delay = min(self.backoff * 2 ** (attempts - 1), self.backoff_max)
+        return delay * random.uniform(0.8, 1.2)
+
+    def dispatch_batch(self):
+        """Claim and send one batch; outcomes are committed together. Returns the batch size."""
+        messages = self.claim()
+        for message in messages:
+            message.attempts += 1
+            message.claim_token = None
+            transport = self.transports.get(message.channel)
+            try:
+                if transport is None:
+                    raise PermanentDeliveryError(f'No transport for channel {message.channel}')
+                transport.send(message)
+            except Exception as e:
+                message.last_error = f'{type(e).__name__}: {str(e)}'[:1000]
+                if isinstance(e, PermanentDeliveryError) or message.attempts >= self.max_attempts:
+                    message.status = 'dead'
+                    print(f"Outbox message {message.id} dead after {message.attempts} attempts: {message.last_error}")
+                else:
+                    message.status = 'pending'
+                    message.next_attempt_at = datetime.utcnow() + timedelta(seconds=self.retry_delay(message.attempts))
+            else:
+                message.status = 'sent'
+                message.sent_at = datetime.utcnow()
+                message.last_error = None
+        if messages:
+            db.session.commit()
+        return len(messages)
+
+    def close_transports(self):
+        for transport in self.transports.values():
+            try:
+                transport.close()
+            except Exception as e:
+                print(f"Error closing {type(transport).__name__}: {str(e)}")
+
+    def counts(self):
+        rows = db.session.execute(
+            select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)
+        ).all()
+        return {status: count for status, count in rows}
+
+
+outbox = Outbox()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough of RFC 5321 for smtplib."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 localhost Ranger Rentals test SMTP')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').rstrip('\r\n')
+            verb = command[:4].upper()
+            if verb == 'HELO':
+                self.reply('250 localhost')
+            elif verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250-8BITMIME')
+                self.reply('250 SMTPUTF8')
+            elif verb == 'MAIL':
+                sender, recipients = command.partition(':')[2].split()[0].strip('<>'), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.partition(':')[2].split()[0].strip('<>'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(data[1:] if data.startswith(b'..') else data)
+                if random.random() < server.fail_rate:
+                    self.reply('451 Temporary failure, try again later')
+                else:
+                    with server.lock:
+                        server.messages.append({'from': sender, 'to': recipients, 'data': b''.join(lines)})
+                    self.reply('250 OK: queued')
+                sender, recipients = None, []
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """In-process SMTP server that keeps what it receives.
+
+    Point SMTP_HOST/SMTP_PORT at it in development or tests. fail_rate
+    rejects that fraction of messages with a 451 to exercise retries.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, fail_rate=0.0):
+        self.messages = []
+        self.connections = 0
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        super().__init__((host, port), _SMTPHandler)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='local-smtp', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+@outbox_cli.command('dispatch')
+@click.option('--once', is_flag=True, help='Send what is due now and exit.')
+def dispatch_outbox(once):
+    """Run the dispatcher in the foreground (for OUTBOX_DISPATCHER=off)."""
+    try:
+        while True:
+            sent = 0
+            while True:
+                count = outbox.dispatch_batch()
+                if not count:
+                    break
+                sent += count
+            if sent:
+                print(f"Dispatched {sent} messages")
+            if once:
+                break
+            outbox.close_transports()
+            time.sleep(outbox.poll_interval)
+    finally:
+        outbox.close_transports()
+
+
+@outbox_cli.command('status')
+def outbox_status():
+    """Show outbox messages by status."""
+    for status, count in sorted(outbox.counts().items()):
+        print(f"{status}: {count}")
+
+
+@outbox_cli.command('retry')
+@click.option('--id', 'message_id', type=int, help='Only this message.')
+def retry_dead(message_id):
+    """Queue dead messages for another round of attempts."""
+    query = update(OutboxMessage).where(OutboxMessage.status == 'dead')
+    if message_id:
+        query = query.where(OutboxMessage.id == message_id)
+    result = db.session.execute(query.values(status='pending', attempts=0, next_attempt_at=datetime.utcnow())
+                                .execution_options(synchronize_session=False))
+    db.session.commit()
+    print(f"Requeued {result.rowcount} messages")
+
+
+@outbox_cli.command('smtp-server')
+@click.option('--host', default='127.0.0.1')
+@click.option('--port', type=int, default=8025)
+def run_smtp_server(host, port):
+    """Run the local SMTP stand-in and print what it receives."""
+    server = LocalSMTPServer(host, port)
+    print(f"Listening on {host}:{port}; set SMTP_HOST={host} SMTP_PORT={port}")
+    server.start()
+    seen = 0
+    try:
+        while True:
+            time.sleep(0.5)
+            for message in server.messages[seen:]:
+                print(f"--- {message['from']} -> {', '.join(message['to'])}")
+                print(message['data'].decode('utf-8', 'replace'))
+            seen = len(server.messages)
+    except KeyboardInterrupt:
+        server.stop()
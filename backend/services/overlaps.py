@@ -0,0 +1,191 @@
+"""
+Double-booking audit.
+
+Pending and confirmed bookings are streamed through a server-side cursor
+ordered by (vehicle_id, start_date, id), which the ix_bookings_vehicle_start
+index serves without a sort, and swept once. Bookings are half-open
+intervals, as in Booking.is_vehicle_available, so a booking starting when
+another ends is not a conflict.
+
+Bookings are grouped by vehicle as they stream past, so only one vehicle's
+bookings are held in memory. Within a vehicle they are decided in priority
+order: confirmed first, then the earlier created, then the lower id. A
+booking is kept unless it overlaps one already kept, in which case it loses
+to that one. A booking is therefore reported only if it overlaps a booking
+that stays, never because of one that was itself cancelled.
+
+With --resolve the losers are cancelled afterwards in batches, their
+completed payments set to ``refund_pending`` and their customers emailed.
+"""
+
+import bisect
+import csv
+import itertools
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, update
+
+from models import db
+from models.booking import Booking
+from models.payment import Payment
+from models.user import User
+from models.vehicle import Vehicle
+from services.eventlog import event_log
+from services.outbox import outbox
+from services.reconciliation import stream
+
+ACTIVE_STATUSES = ('pending', 'confirmed')
+REPORT_FIELDS = ['vehicle_id', 'booking_id', 'status', 'start_date', 'end_date', 'created_at',
+                 'conflicts_with', 'conflict_status', 'conflict_start_date', 'conflict_end_date', 'action']
+
+bookings_cli = AppGroup('bookings', help='Booking audit commands.')
+
+
+def priority(booking):
+    """Sort key of who keeps the slot: confirmed first, then earliest created."""
+    return (booking['status'] != 'confirmed', booking['created_at'], booking['id'])
+
+
+def resolve(bookings):
+    """Yield (loser, winner) for one vehicle's bookings, keeping them in priority order."""
+    starts, kept = [], []  # kept bookings never overlap, so sorted by start they are sorted by end too
+    for booking in sorted(bookings, key=priority):
+        i = bisect.bisect_left(starts, booking['end_date'])
+        if i and kept[i - 1]['end_date'] > booking['start_date']:
+            yield booking, kept[i - 1]
+        else:
+            starts.insert(i, booking['start_date'])
+            kept.insert(i, booking)
+
+
+def sweep(bookings):
+    """Yield (loser, winner) for every conflict in bookings sorted by vehicle_id."""
+    for _, group in itertools.groupby(bookings, key=lambda booking: booking['vehicle_id']):
+        yield from resolve(group)
+
+
+class OverlapAudit:
+    """Finds overlapping active bookings and optionally cancels the losers."""
+
+    def __init__(self, report_path, chunk_size=5000, resolve=False, actor_id=None):
+        self.report_path = report_path
+        self.chunk_size = chunk_size
+        self.resolve = resolve
+        self.actor_id = actor_id
+        self.stats = {'bookings': 0, 'conflicts': 0, 'cancelled': 0, 'payments_marked': 0}
+
+    def run(self):
+        """Sweep every active booking, write the report and resolve. Returns the run stats."""
+        losers = []
+        with open(self.report_path, 'w', newline='') as report, db.engines[None].connect() as conn:
+            writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            bookings = stream(conn, select(Booking.id, Booking.vehicle_id, Booking.status, Booking.start_date,
+                                           Booking.end_date, Booking.created_at)
+                              .where(Booking.status.in_(ACTIVE_STATUSES))
+                              .order_by(Booking.vehicle_id, Booking.start_date, Booking.id), self.chunk_size)
+
+            for loser, winner in sweep(self._count(bookings)):
+                writer.writerow({
+                    'vehicle_id': loser['vehicle_id'],
+                    'booking_id': loser['id'],
+                    'status': loser['status'],
+                    'start_date': loser['start_date'].isoformat(),
+                    'end_date': loser['end_date'].isoformat(),
+                    'created_at': loser['created_at'].isoformat(),
+                    'conflicts_with': winner['id'],
+                    'conflict_status': winner['status'],
+                    'conflict_start_date': winner['start_date'].isoformat(),
+                    'conflict_end_date': winner['end_date'].isoformat(),
+                    'action': 'cancel' if self.resolve else 'review'
+                })
+                self.stats['conflicts'] += 1
+                if self.resolve:
+                    losers.append(loser['id'])
+
+        # The cursor is closed before writing so SQLite isn't locked against us
+        for i in range(0, len(losers), self.chunk_size):
+            self.cancel(losers[i:i + self.chunk_size])
+        return self.stats
+
+    def _count(self, bookings):
+        for booking in bookings:
+            self.stats['bookings'] += 1
+            if self.stats['bookings'] % (self.chunk_size * 100) == 0:
+                print(f"Swept {self.stats['bookings']} bookings, {self.stats['conflicts']} conflicts")
+            yield booking
+
+    def cancel(self, booking_ids):
+        """Cancel still-active bookings in one transaction, with refunds due and emails."""
+        now = datetime.utcnow()
+        rows = db.session.execute(
+            select(Booking.id, Booking.start_date, Booking.end_date, User.username, User.email,
+                   Vehicle.year, Vehicle.make, Vehicle.model)
+            .join(User, User.id == Booking.user_id)
+            .join(Vehicle, Vehicle.id == Booking.vehicle_id)
+            .where(Booking.id.in_(booking_ids), Booking.status.in_(ACTIVE_STATUSES))
+            .with_for_update(of=Booking)
+        ).mappings().all()
+        if not rows:
+            db.session.rollback()
+            return
+        booking_ids = [row['id'] for row in rows]
+        db.session.execute(
+            update(Booking).where(Booking.id.in_(booking_ids))
+            .values(status='cancelled', updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+        payments = db.session.execute(
+            select(Payment.id, Payment.booking_id, Payment.amount)
+            .where(Payment.booking_id.in_(booking_ids), Payment.status == 'completed')
+        ).all()
+        if payments:
+            db.session.execute(
+                update(Payment).where(Payment.id.in_([p.id for p in payments]))
+                .values(status='refund_pending', updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        refunds = {}
+        for payment in payments:
+            refunds[payment.booking_id] = refunds.get(payment.booking_id, 0) + payment.amount
+
+        event_log.record_many('booking', 'updated', [(bid, {'status': 'cancelled'}) for bid in booking_ids],
+                              self.actor_id)
+        event_log.record_many('payment', 'updated', [(p.id, {'status': 'refund_pending'}) for p in payments],
+                              self.actor_id)
+        messages = []
+        for row in rows:
+            subject, body = outbox.render(
+                'booking.conflict_cancelled',
+                username=row['username'],
+                booking_id=row['id'],
+                vehicle=f"{row['year']} {row['make']} {row['model']}",
+                start_date=row['start_date'].strftime('%Y-%m-%d %H:%M'),
+                end_date=row['end_date'].strftime('%Y-%m-%d %H:%M'),
+                refund_amount=refunds.get(row['id'], 0)
+            )
+            messages.append({'channel': 'email', 'recipient': row['email'], 'topic': 'booking.conflict_cancelled',
+                             'subject': subject, 'body': body})
+        outbox.enqueue_many(messages)
+        db.session.commit()
+        self.stats['cancelled'] += len(booking_ids)
+        self.stats['payments_marked'] += len(payments)
+
+
+@bookings_cli.command('audit-overlaps')
+@click.option('--report', default='overlaps.csv', help='CSV file to write conflicts to.')
+@click.option('--resolve', is_flag=True, help='Cancel the losing booking of each conflict.')
+@click.option('--chunk-size', type=int, default=5000, help='Rows fetched per cursor round trip.')
+def audit_overlaps(report, resolve, chunk_size):
+    """Find pending/confirmed bookings that overlap on the same vehicle."""
+    stats = OverlapAudit(report, chunk_size=chunk_size, resolve=resolve).run()
+    print(f"Done: {stats['bookings']} bookings, {stats['conflicts']} conflicts written to {report}")
+    if resolve:
+        print(f"Cancelled {stats['cancelled']} bookings, {stats['payments_marked']} payments to refund")
+
+
+def init_app(app):
+    app.cli.add_command(bookings_cli)
@@ -0,0 +1,289 @@
+"""
+On-demand per-request profiling.
+
+A request is profiled when it carries ``X-Profile: <PROFILE_TOKEN>`` or is
+picked by PROFILE_SAMPLE_RATE, until the request is torn down, so time in
+SQLAlchemy, JSON encoding, password hashing and the after-request hooks all
+shows up under the frames that called it. Two modes (PROFILE_MODE, or an
+``X-Profile-Mode`` header on token-triggered requests):
+
+- ``sample``: a thread records the handling thread's stack every
+  PROFILE_INTERVAL_MS. Each stack is weighted by the time since the
+  previous sample, since the sampler only runs when the GIL is released
+  (about every 5ms under CPU-bound code). Cheap, but coarse, so it suits
+  slow requests.
+- ``trace``: ``sys.setprofile`` times every Python and C call on the
+  handling thread. Exact, and slower, so it suits short requests.
+
+Each capture is written to PROFILE_DIR as a collapsed-stack file (one
+``frame;frame;frame microseconds`` line per stack, for flamegraph.pl or speedscope)
+or as a speedscope JSON file. The oldest files are deleted beyond
+PROFILE_MAX_FILES. Capture metadata is kept in the file name so any worker
+can list every capture.
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import request
+
+ENVIRON_KEY = 'ranger.profile'
+EXTENSIONS = {'collapsed': '.collapsed.txt', 'speedscope': '.speedscope.json'}
+NAME_PATTERN = re.compile(
+    r'^(?P<timestamp>\d{8}T\d{6}\d{3})-(?P<method>[A-Z]+)-(?P<endpoint>[\w.]+)-'
+    r'(?P<duration_ms>\d+)ms-(?P<mode>sample|trace)(?P<ext>\.collapsed\.txt|\.speedscope\.json)$')
+
+
+def frame_label(code, _labels={}):
+    """Readable 'function (file:line)' name for a code object or builtin (cached)."""
+    label = _labels.get(code)
+    if label is None:
+        if not hasattr(code, 'co_filename'):
+            label = _labels[code] = f"{getattr(code, '__qualname__', repr(code))} (builtin)"
+            return label
+        filename = code.co_filename
+        for marker in ('site-packages' + os.sep, os.getcwd() + os.sep, sysconfig.get_paths()['stdlib'] + os.sep):
+            if marker in filename:
+                filename = filename.split(marker, 1)[1]
+                break
+        label = _labels[code] = f'{code.co_name} ({filename}:{code.co_firstlineno})'
+    return label
+
+
+class Sampler(threading.Thread):
+    """Samples one thread's stack at a fixed interval."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        last = time.perf_counter_ns()
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            # Wake-ups come no faster than the GIL switch interval, so weight by the time actually elapsed
+            now = time.perf_counter_ns()
+            elapsed, last = now - last, now
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += elapsed
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        # Microseconds, like the tracer
+        return Counter({stack: ns // 1000 for stack, ns in self.stacks.items() if ns >= 1000})
+
+
+class Tracer:
+    """Deterministic profile of the current thread via sys.setprofile."""
+
+    def __init__(self):
+        self.stacks = Counter()
+        self.stack = []
+        self.last = 0
+
+    def start(self):
+        # Seed with the callers so returns from them pop correctly
+        frame = sys._getframe(1)
+        callers = []
+        while frame is not None:
+            callers.append(frame.f_code)
+            frame = frame.f_back
+        self.stack = list(reversed(callers))
+        self.last = time.perf_counter_ns()
+        sys.setprofile(self)
+
+    def __call__(self, frame, event, arg):
+        now = time.perf_counter_ns()
+        stack = self.stack
+        if stack:
+            self.stacks[tuple(stack)] += now - self.last
+        if event == 'call':
+            stack.append(frame.f_code)
+        elif event == 'c_call':
+            stack.append(arg)
+        elif event == 'return':
+            if stack and stack[-1] is frame.f_code:
+                stack.pop()
+        elif stack and stack[-1] is arg:  # c_return / c_exception
+            stack.pop()
+        self.last = time.perf_counter_ns()
+
+    def stop(self):
+        sys.setprofile(None)
+        return Counter({stack: ns // 1000 for stack, ns in self.stacks.items() if ns >= 1000})
+
+
+class Profiler:
+    """Profiles selected requests and writes the captures."""
+
+    def __init__(self):
+        self.directory = 'profiles'
+        self.token = None
+        self.sample_rate = 0.0
+        self.mode = 'sample'
+        self.interval = 0.001
+        self.format = 'collapsed'
+        self.max_files = 100
+
+    def init_app(self, app):
+        self.directory = app.config.get('PROFILE_DIR', 'profiles')
+        self.token = app.config.get('PROFILE_TOKEN')
+        self.sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+        self.mode = app.config.get('PROFILE_MODE', 'sample')
+        self.interval = app.config.get('PROFILE_INTERVAL_MS', 1) / 1000
+        self.format = app.config.get('PROFILE_FORMAT', 'collapsed')
+        self.max_files = app.config.get('PROFILE_MAX_FILES', 100)
+        app.before_request(self._start)
+        app.after_request(self._tag)
+        app.teardown_request(self._finish)
+        app.extensions['profiler'] = self
+
+    def _wanted(self):
+        """Profiling mode for this request, or None."""
+        header = request.headers.get('X-Profile')
+        if header and self.token and header == self.token:
+            mode = request.headers.get('X-Profile-Mode', self.mode)
+            return mode if mode in ('sample', 'trace') else self.mode
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.mode
+        return None
+
+    def _start(self):
+        mode = self._wanted()
+        if not mode:
+            return
+        profile = Tracer() if mode == 'trace' else Sampler(threading.get_ident(), self.interval)
+        # Kept in the WSGI environ rather than g, which batch sub-requests share
+        request.environ[ENVIRON_KEY] = {
+            'profile': profile,
+            'mode': mode,
+            'started': time.perf_counter(),
+            'name': datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')[:18]
+        }
+        profile.start()
+
+    def _tag(self, response):
+        capture = request.environ.get(ENVIRON_KEY)
+        if capture:
+            response.headers['X-Profile-Id'] = capture['name']
+        return response
+
+    def _finish(self, exc=None):
+        capture = request.environ.pop(ENVIRON_KEY, None)
+        if not capture:
+            return
+        stacks = capture['profile'].stop()
+        duration_ms = (time.perf_counter() - capture['started']) * 1000
+        try:
+            self.write(capture['name'], request.method, request.endpoint or 'unknown',
+                       duration_ms, capture['mode'], stacks)
+        except OSError as e:
+            print(f"Could not write profile: {str(e)}")
+
+    @staticmethod
+    def trim(stack):
+        """Drop server frames above Flask's request dispatch."""
+        for i, code in enumerate(stack):
+            if getattr(code, 'co_name', None) == 'full_dispatch_request':
+                return stack[i:]
+        return stack
+
+    def write(self, name, method, endpoint, duration_ms, mode, stacks):
+        """Write stacks (weights in microseconds) and rotate old captures."""
+        os.makedirs(self.directory, exist_ok=True)
+        filename = f'{name}-{method}-{endpoint}-{round(duration_ms)}ms-{mode}{EXTENSIONS[self.format]}'
+        path = os.path.join(self.directory, filename)
+        trimmed = Counter()
+        for stack, weight in stacks.items():
+            trimmed[self.trim(stack)] += weight
+        stacks = trimmed
+
+        if self.format == 'speedscope':
+            frames, index = [], {}
+            profile_samples, weights = [], []
+            for stack, count in stacks.items():
+                ids = []
+                for code in stack:
+                    if code not in index:
+                        index[code] = len(frames)
+                        frames.append({'name': frame_label(code),
+                                       'file': getattr(code, 'co_filename', None),
+                                       'line': getattr(code, 'co_firstlineno', None)})
+                    ids.append(index[code])
+                profile_samples.append(ids)
+                weights.append(count / 1000)
+            document = {
+                '$schema': 'https://www.speedscope.app/file-format-schema.json',
+                'name': f'{method} {endpoint}',
+                'exporter': 'ranger-rentals',
+                'shared': {'frames': frames},
+                'profiles': [{
+                    'type': 'sampled',
+                    'name': f'{method} {endpoint}',
+                    'unit': 'milliseconds',
+                    'startValue': 0,
+                    'endValue': round(duration_ms, 3),
+                    'samples': profile_samples,
+                    'weights': weights
+                }]
+            }
+            with open(path, 'w') as f:
+                json.dump(document, f)
+        else:
+            with open(path, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(';'.join(frame_label(code) for code in stack) + f' {count}\n')
+
+        self.rotate()
+        return filename
+
+    def rotate(self):
+        """Delete the oldest captures beyond max_files."""
+        files = sorted(name for name in os.listdir(self.directory) if NAME_PATTERN.match(name))
+        for name in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def captures(self, limit=50):
+        """Most recent captures, newest first, parsed from the file names."""
+        if not os.path.isdir(self.directory):
+            return []
+        result = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            match = NAME_PATTERN.match(name)
+            if not match:
+                continue
+            result.append({
+                'id': name,
+                'created_at': datetime.strptime(match['timestamp'][:15], '%Y%m%dT%H%M%S').isoformat(),
+                'method': match['method'],
+                'endpoint': match['endpoint'],
+                'duration_ms': int(match['duration_ms']),
+                'mode': match['mode'],
+                'format': 'speedscope' if match['ext'].startswith('.speedscope') else 'collapsed',
+                'size': os.path.getsize(os.path.join(self.directory, name))
+            })
+            if len(result) >= limit:
+                break
+        return result
+
+
+profiler = Profiler()
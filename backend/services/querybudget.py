@@ -0,0 +1,114 @@
+"""
+Per-request query budgets and N+1 detection.
+
+A ``before_cursor_execute`` listener records every statement run while a
+request is being handled. After the request the statements are fingerprinted
+(literals and IN-list lengths stripped) and checked against the endpoint's
+budget, declared with ``@query_budget(n)``, and for repeated identical
+shapes, the usual sign of a lazy load inside a loop.
+
+With QUERY_BUDGET_MODE='raise' (the default when app.testing is set) a
+violation raises QueryBudgetExceeded listing the offending statements, so a
+test hitting the endpoint fails. With 'warn' (the default otherwise) only a
+sample of requests is recorded and violations are printed. 'off' disables it.
+"""
+
+import random
+import re
+from collections import Counter
+from functools import lru_cache
+
+from flask import g, has_request_context, request, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more queries than its budget, or an N+1 pattern."""
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement):
+    """Statement shape with literals, IN-list lengths and whitespace normalised."""
+    shape = re.sub(r"'(?:[^']|'')*'", '?', statement)
+    shape = re.sub(r'\b\d+(?:\.\d+)?\b', '?', shape)
+    shape = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(?)', shape)
+    return re.sub(r'\s+', ' ', shape).strip()
+
+
+def query_budget(max_queries, max_repeats=None):
+    """Declare the most queries a view may run (and optionally repeats allowed)."""
+    def decorator(fn):
+        fn.query_budget = max_queries
+        fn.query_max_repeats = max_repeats
+        return fn
+    return decorator
+
+
+class QueryBudget:
+    """Records statements per request and enforces declared budgets."""
+
+    def __init__(self):
+        self.mode = None
+        self.default_budget = None
+        self.repeat_threshold = 5
+        self.sample_rate = 0.01
+        self._listening = False
+
+    def init_app(self, app):
+        self.mode = app.config.get('QUERY_BUDGET_MODE')
+        self.default_budget = app.config.get('QUERY_BUDGET_DEFAULT')
+        self.repeat_threshold = app.config.get('QUERY_BUDGET_REPEAT_THRESHOLD', 5)
+        self.sample_rate = app.config.get('QUERY_BUDGET_SAMPLE_RATE', 0.01)
+        if not self._listening:
+            # Engine-level so the primary, replicas and archive are all counted
+            event.listen(Engine, 'before_cursor_execute', self._record)
+            self._listening = True
+        app.before_request(self._start)
+        app.after_request(self._check)
+        app.extensions['query_budget'] = self
+
+    def _mode(self):
+        # Resolved per request: tests usually set TESTING after create_app()
+        return self.mode or ('raise' if current_app.testing else 'warn')
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            log = g.get('query_log')
+            if log is not None:
+                log.append(statement)
+
+    def _start(self):
+        mode = self._mode()
+        if mode == 'raise' or (mode == 'warn' and random.random() < self.sample_rate):
+            g.query_log = []
+
+    def _check(self, response):
+        log = g.pop('query_log', None)
+        if log is None:
+            return response
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', self.default_budget)
+        max_repeats = getattr(view, 'query_max_repeats', None) or self.repeat_threshold
+
+        shapes = Counter(fingerprint(statement) for statement in log)
+        repeated = [(shape, n) for shape, n in shapes.most_common() if n >= max_repeats]
+        over = budget is not None and len(log) > budget
+        if not over and not repeated:
+            return response
+
+        lines = [f"{request.method} {request.path} ({request.endpoint}) ran "
+                 f"{len(log)} queries, budget {budget if budget is not None else 'none'}"]
+        for shape, n in repeated:
+            lines.append(f"  possible N+1, {n}x: {shape}")
+        if over:
+            lines.extend(f"  {i + 1}. {fingerprint(statement)}" for i, statement in enumerate(log))
+        message = '\n'.join(lines)
+
+        if self._mode() == 'raise':
+            raise QueryBudgetExceeded(message)
+        print(f"Query budget warning: {message}")
+        return response
+
+
+budgets = QueryBudget()
@@ -0,0 +1,186 @@
+"""
+Token-bucket rate limiting.
+
+Buckets live in an in-process store by default, so a check is a dict lookup
+and a little arithmetic and never touches the main database. Multi-worker
+deployments can point RATELIMIT_STORAGE_URL at Redis to share buckets.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify, current_app
+
+PERIODS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+}
+
+
+def parse_rate(rate):
+    """Parse '10/minute' into (capacity, tokens refilled per second)."""
+    count, period = rate.split('/')
+    count = int(count)
+    seconds = PERIODS[period.strip().rstrip('s')]
+    return count, count / seconds
+
+
+class MemoryStore:
+    """Per-process buckets kept in a bounded LRU map."""
+
+    def __init__(self, max_keys=100000):
+        self.buckets = OrderedDict()
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate, cost=1):
+        """Take tokens from a bucket. Returns seconds to wait, 0 if allowed."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * refill_rate)
+            if tokens >= cost:
+                self.buckets[key] = (tokens - cost, now)
+                wait = 0
+            else:
+                self.buckets[key] = (tokens, now)
+                wait = (cost - tokens) / refill_rate
+            self.buckets.move_to_end(key)
+            # Forgetting the least recently used bucket only ever refills it
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return wait
+
+    def reset(self):
+        with self._lock:
+            self.buckets.clear()
+
+
+class RedisStore:
+    """Buckets shared across workers through Redis (requires the redis package)."""
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'last')
+    local tokens = tonumber(bucket[1]) or capacity
+    local last = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - last) * rate)
+    local wait = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+    else
+        wait = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'last', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def consume(self, key, capacity, refill_rate, cost=1):
+        return float(self.script(keys=[f'ratelimit:{key}'], args=[capacity, refill_rate, cost]))
+
+    def reset(self):
+        for key in self.client.scan_iter('ratelimit:*'):
+            self.client.delete(key)
+
+
+def ip_key():
+    """Bucket key for the client address."""
+    return request.remote_addr or 'unknown'
+
+
+def account_key():
+    """Bucket key for the account named in a login/register body."""
+    data = request.get_json(silent=True) or {}
+    account = data.get('email') or data.get('username')
+    return str(account).strip().lower() if account else None
+
+
+def too_many_requests(wait):
+    retry_after = max(1, math.ceil(wait))
+    response = jsonify({
+        'error': 'Too many requests',
+        'retry_after': retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+class RateLimiter:
+    """Token-bucket limiter with per-route decorators and per-blueprint defaults."""
+
+    def __init__(self):
+        self.store = MemoryStore()
+        self.enabled = True
+        self.blueprint_limits = {}
+
+    def init_app(self, app):
+        """Configure storage and per-blueprint limits from the app config."""
+        self.enabled = app.config.get('RATELIMIT_ENABLED', True)
+        url = app.config.get('RATELIMIT_STORAGE_URL')
+        self.store = RedisStore(url) if url else MemoryStore()
+        self.blueprint_limits = {
+            name: parse_rate(rate)
+            for name, rate in app.config.get('RATELIMIT_BLUEPRINT_LIMITS', {}).items()
+        }
+        app.before_request(self.check_blueprint_limit)
+        app.extensions['rate_limiter'] = self
+
+    def hit(self, scope, key, rate):
+        """Consume one token. Returns seconds to wait, 0 if allowed."""
+        if not self.enabled or key is None:
+            return 0
+        capacity, refill_rate = rate
+        return self.store.consume(f'{scope}:{key}', capacity, refill_rate)
+
+    def check_blueprint_limit(self):
+        """Apply the configured per-IP limit for the request's blueprint."""
+        if not request.blueprint:
+            return None
+        name = request.blueprint.rsplit('.', 1)[-1]
+        rate = self.blueprint_limits.get(name)
+        if rate:
+            wait = self.hit(f'bp:{name}', ip_key(), rate)
+            if wait:
+                return too_many_requests(wait)
+        return None
+
+    def limit(self, rate, key=ip_key, scope=None):
+        """Decorator limiting a view to `rate` per key.
+
+        `rate` is either a literal like '5/minute' or the name of a config
+        key holding one, which is read on first use.
+        """
+        parsed = parse_rate(rate) if '/' in rate else None
+
+        def decorator(fn):
+            name = scope or f'{fn.__module__}.{fn.__name__}:{key.__name__}'
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                nonlocal parsed
+                if parsed is None:
+                    parsed = parse_rate(current_app.config[rate])
+                wait = self.hit(name, key(), parsed)
+                if wait:
+                    return too_many_requests(wait)
+                return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+limiter = RateLimiter()
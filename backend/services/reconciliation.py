@@ -0,0 +1,203 @@
+"""
+Streaming reconciliation of bookings against payments.
+
+Bookings (ordered by id) and payments (ordered by booking_id, id) are read
+through server-side cursors in chunks and merge-joined, so memory use stays
+constant however large the tables are. Discrepancies are appended to a CSV
+report as they are found, and a checkpoint file records the last booking id
+whose results are safely in the report, and the report's length at that
+point, so an interrupted run can resume. Rows written after the checkpoint
+are cut off on resume, since those bookings are checked again.
+"""
+
+import csv
+import json
+import os
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select
+
+from models import db
+from models.booking import Booking
+from models.payment import Payment
+from models.archive import BookingArchive, PaymentArchive
+
+TOLERANCE = 0.01
+REPORT_FIELDS = ['booking_id', 'payment_id', 'issue', 'booking_status', 'expected', 'actual', 'detail']
+
+reconcile_cli = AppGroup('reconcile', help='Payment reconciliation commands.')
+
+
+def stream(conn, statement, chunk_size):
+    """Yield rows from a server-side cursor, fetched chunk_size at a time."""
+    result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(statement)
+    for partition in result.mappings().partitions():
+        yield from partition
+
+
+def check_booking(booking, payments):
+    """Return discrepancy rows for one booking and its payments."""
+    issues = []
+    status = booking['status']
+    paid = sum(p['amount'] for p in payments if p['status'] == 'completed')
+    refunded = [p for p in payments if p['status'] == 'refunded']
+
+    def issue(kind, expected=None, actual=None, payment_id=None, detail=''):
+        issues.append({
+            'booking_id': booking['id'],
+            'payment_id': payment_id,
+            'issue': kind,
+            'booking_status': status,
+            'expected': expected,
+            'actual': actual,
+            'detail': detail
+        })
+
+    if status in ('confirmed', 'completed'):
+        if not payments:
+            issue('unpaid', booking['total_price'], 0)
+        elif paid < booking['total_price'] - TOLERANCE:
+            issue('underpaid', booking['total_price'], round(paid, 2))
+        elif paid > booking['total_price'] + TOLERANCE:
+            issue('overpaid', booking['total_price'], round(paid, 2))
+    elif status == 'refunded':
+        for p in payments:
+            if p['status'] == 'completed':
+                issue('refund_incomplete', 'refunded', p['status'], p['id'])
+    elif status == 'cancelled':
+        if paid > TOLERANCE:
+            issue('cancelled_not_refunded', 0, round(paid, 2))
+        for p in payments:
+            if p['status'] == 'refund_pending':
+                issue('refund_pending', 'refunded', p['status'], p['id'])
+
+    if refunded and status not in ('refunded', 'cancelled'):
+        for p in refunded:
+            issue('refund_inconsistent', 'refunded or cancelled booking', status, p['id'])
+    return issues
+
+
+class Reconciler:
+    """Merge-joins bookings and payments and reports discrepancies."""
+
+    def __init__(self, report_path, checkpoint_path=None, chunk_size=5000, archive=False):
+        self.report_path = report_path
+        self.checkpoint_path = checkpoint_path or f'{report_path}.checkpoint'
+        self.chunk_size = chunk_size
+        self.bookings = BookingArchive if archive else Booking
+        self.payments = PaymentArchive if archive else Payment
+        self.stats = {'bookings': 0, 'payments': 0, 'issues': 0}
+        self.last_booking_id = 0
+        self.report_offset = None
+
+    def load_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+            self.last_booking_id = state['last_booking_id']
+            self.stats = state['stats']
+            self.report_offset = state.get('report_offset')
+            return True
+        return False
+
+    def save_checkpoint(self, report):
+        report.flush()
+        os.fsync(report.fileno())
+        self.report_offset = report.tell()
+        tmp = f'{self.checkpoint_path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({
+                'last_booking_id': self.last_booking_id,
+                'stats': self.stats,
+                'report_offset': self.report_offset,
+                'updated_at': datetime.utcnow().isoformat()
+            }, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def run(self, resume=False):
+        """Reconcile every booking after the checkpoint. Returns the run stats."""
+        resumed = resume and os.path.exists(self.report_path) and self.load_checkpoint()
+        if not resumed:
+            self.last_booking_id = 0
+            self.stats = {'bookings': 0, 'payments': 0, 'issues': 0}
+        B, P = self.bookings, self.payments
+        after = self.last_booking_id
+
+        with open(self.report_path, 'r+' if resumed else 'w', newline='') as report, \
+                db.engines[getattr(B, '__bind_key__', None)].connect() as bconn, \
+                db.engines[getattr(P, '__bind_key__', None)].connect() as pconn:
+            writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+            if resumed:
+                # Drop rows written past the checkpoint; their bookings are rechecked
+                if self.report_offset is None:  # checkpoint from before offsets were recorded
+                    report.seek(0, os.SEEK_END)
+                else:
+                    report.seek(self.report_offset)
+                    report.truncate()
+            else:
+                writer.writeheader()
+
+            bookings = stream(bconn, select(B.id, B.status, B.total_price)
+                              .where(B.id > after).order_by(B.id), self.chunk_size)
+            payments = stream(pconn, select(P.id, P.booking_id, P.amount, P.status)
+                              .where(P.booking_id > after).order_by(P.booking_id, P.id), self.chunk_size)
+
+            payment = next(payments, None)
+            for booking in bookings:
+                # Payments sorting before this booking belong to no booking
+                while payment is not None and payment['booking_id'] < booking['id']:
+                    self._orphan(writer, payment)
+                    payment = next(payments, None)
+
+                group = []
+                while payment is not None and payment['booking_id'] == booking['id']:
+                    group.append(payment)
+                    payment = next(payments, None)
+
+                issues = check_booking(booking, group)
+                writer.writerows(issues)
+                self.stats['issues'] += len(issues)
+                self.stats['bookings'] += 1
+                self.stats['payments'] += len(group)
+                self.last_booking_id = booking['id']
+                if self.stats['bookings'] % self.chunk_size == 0:
+                    self.save_checkpoint(report)
+                    print(f"Reconciled {self.stats['bookings']} bookings, {self.stats['issues']} issues")
+
+            while payment is not None:
+                self._orphan(writer, payment)
+                payment = next(payments, None)
+
+            self.save_checkpoint(report)
+        return self.stats
+
+    def _orphan(self, writer, payment):
+        writer.writerow({
+            'booking_id': payment['booking_id'],
+            'payment_id': payment['id'],
+            'issue': 'orphan_payment',
+            'booking_status': None,
+            'expected': None,
+            'actual': payment['amount'],
+            'detail': 'payment references a missing booking'
+        })
+        self.stats['payments'] += 1
+        self.stats['issues'] += 1
+
+
+@reconcile_cli.command('run')
+@click.option('--report', default='reconciliation.csv', help='CSV file to write discrepancies to.')
+@click.option('--resume', is_flag=True, help='Continue from the checkpoint next to the report.')
+@click.option('--chunk-size', type=int, default=5000, help='Rows fetched per cursor round trip.')
+@click.option('--archive', is_flag=True, help='Reconcile the archive tables instead of the hot ones.')
+def run_reconciliation(report, resume, chunk_size, archive):
+    """Check payment totals and refund states against bookings."""
+    stats = Reconciler(report, chunk_size=chunk_size, archive=archive).run(resume)
+    print(f"Done: {stats['bookings']} bookings, {stats['payments']} payments, "
+          f"{stats['issues']} issues written to {report}")
+
+
+def init_app(app):
+    app.cli.add_command(reconcile_cli)
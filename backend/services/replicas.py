@@ -0,0 +1,157 @@
+"""
+Read-replica routing for the shared ``db`` session.
+
+Read-only requests (GET/HEAD/OPTIONS) are sent to a healthy replica bind.
+Writes, anything flushed during the request and every read after it go to
+the primary, so a request always sees its own writes. Replicas are the
+SQLALCHEMY_BINDS keys listed in SQLALCHEMY_REPLICAS.
+"""
+
+import itertools
+import sqlite3
+import threading
+import time
+
+import click
+import sqlalchemy as sa
+from flask import g, has_request_context, request
+from flask.cli import AppGroup
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRouter:
+    """Health-aware round-robin selection among replica binds."""
+
+    def __init__(self):
+        self.keys = []
+        self.retry_interval = 30
+        self.down_until = {}
+        self._cycle = itertools.cycle([])
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        """Attach error listeners to the replica engines and register the CLI."""
+        self.keys = list(app.config.get('SQLALCHEMY_REPLICAS', []))
+        self.retry_interval = app.config.get('SQLALCHEMY_REPLICA_RETRY', 30)
+        self.down_until = {key: 0 for key in self.keys}
+        self._cycle = itertools.cycle(self.keys)
+
+        with app.app_context():
+            for key in self.keys:
+                event.listen(db.engines[key], 'handle_error', self._error_listener(key))
+
+        app.cli.add_command(replica_cli)
+        app.extensions['replica_router'] = self
+
+    def _error_listener(self, key):
+        def listener(context):
+            if context.is_disconnect or isinstance(context.sqlalchemy_exception, sa.exc.OperationalError):
+                self.mark_down(key)
+        return listener
+
+    def mark_down(self, key):
+        print(f"Replica {key} marked unhealthy for {self.retry_interval}s")
+        self.down_until[key] = time.monotonic() + self.retry_interval
+
+    def _probe(self, engine, key):
+        """Re-check a replica whose back-off expired."""
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+            return True
+        except Exception:
+            self.mark_down(key)
+            return False
+
+    def choose(self, engines):
+        """Return the next healthy replica engine, or None to use the primary."""
+        now = time.monotonic()
+        for _ in range(len(self.keys)):
+            with self._lock:
+                key = next(self._cycle)
+            down_until = self.down_until[key]
+            if down_until == 0:
+                return engines[key]
+            if down_until <= now and self._probe(engines[key], key):
+                self.down_until[key] = 0
+                return engines[key]
+        return None
+
+    def status(self):
+        now = time.monotonic()
+        return {key: self.down_until[key] <= now for key in self.keys}
+
+
+router = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """Session that sends read-only request traffic to replica binds."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        # Only the default bind is replicated; other bind keys keep their engine
+        if bind is None and engine is self._db.engine and self._can_use_replica(clause):
+            # Pin one replica per request so its reads are mutually consistent
+            if 'db_replica' not in g:
+                g.db_replica = router.choose(self._db.engines)
+            if g.db_replica is not None:
+                return g.db_replica
+        return engine
+
+    def _can_use_replica(self, clause):
+        if not router.keys or self._flushing or not has_request_context():
+            return False
+        if isinstance(clause, sa.sql.dml.UpdateBase):
+            return False
+        return request.method in READ_METHODS and not g.get('db_use_primary')
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _stick_to_primary(session, flush_context):
+    """Reads after a write in the same request must see that write."""
+    if has_request_context():
+        g.db_use_primary = True
+
+
+def copy_sqlite(source, target):
+    """Copy one SQLite database file onto another with the online backup API."""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+replica_cli = AppGroup('replicas', help='Read-replica commands.')
+
+
+@replica_cli.command('sync')
+def sync_replicas():
+    """Copy the primary SQLite database onto each SQLite replica (local testing)."""
+    from models import db
+
+    primary = db.engine.url
+    if primary.get_backend_name() != 'sqlite':
+        raise click.ClickException('replicas sync only supports SQLite; use real replication elsewhere')
+
+    for key in router.keys:
+        replica = db.engines[key].url
+        if replica.get_backend_name() != 'sqlite':
+            print(f"Skipping non-SQLite replica {key}")
+            continue
+        db.engines[key].dispose()
+        copy_sqlite(primary.database, replica.database)
+        print(f"Copied {primary.database} -> {replica.database}")
+
+
+@replica_cli.command('status')
+def replica_status():
+    """Show replica health as seen by this process."""
+    for key, healthy in router.status().items():
+        print(f"{key}: {'healthy' if healthy else 'down'}")
@@ -0,0 +1,285 @@
+"""
+Fleet retirement: take vehicles out of service in set-based batches.
+
+start() marks the vehicles unavailable and records a job with a cutoff time.
+run() then cancels the vehicles' pending and confirmed bookings that start
+after the cutoff, RETIREMENT_BATCH_SIZE bookings per transaction. Each batch:
+
+- locks its still-active bookings and cancels them with one UPDATE,
+- sets their completed payments to ``refund_pending`` with one UPDATE (an
+  admin completes them through the refund endpoint),
+- writes a retirement_outcomes row per booking, the event-log events and the
+  customer emails with one INSERT each,
+- advances the job's booking-id cursor and counters.
+
+Every batch commits on its own, so an interrupted job resumes from its
+cursor. A lease (runner plus heartbeat) stops two processes running the same
+job. A job whose heartbeat is older than RETIREMENT_LEASE_SECONDS can be
+taken over.
+"""
+
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import select, insert, update, func, or_, and_
+
+from models import db
+from models.booking import Booking
+from models.payment import Payment
+from models.user import User
+from models.vehicle import Vehicle
+from models.retirement import RetirementJob, RetirementOutcome
+from services.eventlog import event_log
+from services.outbox import outbox
+from services.spatial import spatial_cli
+
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+
+class JobLeased(Exception):
+    """The job is being run by another process."""
+
+
+class FleetRetirement:
+    """Creates and runs retirement jobs."""
+
+    def __init__(self):
+        self.app = None
+        self.batch_size = 500
+        self.lease_seconds = 60
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get('RETIREMENT_BATCH_SIZE', 500)
+        self.lease_seconds = app.config.get('RETIREMENT_LEASE_SECONDS', 60)
+        app.extensions['fleet_retirement'] = self
+
+    def _future_bookings(self, job, vehicle_ids):
+        return and_(
+            Booking.vehicle_id.in_(vehicle_ids),
+            Booking.status.in_(ACTIVE_STATUSES),
+            Booking.start_date > job.cutoff
+        )
+
+    def start(self, vehicle_ids, reason=None, user_id=None):
+        """Take vehicles out of service and create the job that cancels their bookings."""
+        vehicle_ids = sorted(set(vehicle_ids))
+        now = datetime.utcnow()
+        found = db.session.scalars(select(Vehicle.id).where(Vehicle.id.in_(vehicle_ids))).all()
+        missing = sorted(set(vehicle_ids) - set(found))
+        if missing:
+            raise ValueError(f'Unknown vehicle ids: {missing}')
+
+        db.session.execute(
+            update(Vehicle).where(Vehicle.id.in_(vehicle_ids), Vehicle.is_available.is_(True))
+            .values(is_available=False, updated_at=now)
+            .execution_options(synchronize_session='fetch')
+        )
+        event_log.record_many('vehicle', 'updated', [(vid, {'is_available': False}) for vid in vehicle_ids], user_id)
+        job = RetirementJob(vehicle_ids=json.dumps(vehicle_ids), reason=reason, cutoff=now,
+                            created_by=user_id, status='running')
+        job.total = db.session.scalar(
+            select(func.count()).select_from(Booking).where(self._future_bookings(job, vehicle_ids)))
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    def _acquire(self, job_id, token):
+        """Take the job's lease; False if another live runner holds it."""
+        now = datetime.utcnow()
+        result = db.session.execute(
+            update(RetirementJob)
+            .where(RetirementJob.id == job_id, RetirementJob.status == 'running',
+                   or_(RetirementJob.runner.is_(None),
+                       RetirementJob.heartbeat_at < now - timedelta(seconds=self.lease_seconds)))
+            .values(runner=token, heartbeat_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def run(self, job_id, progress=None):
+        """Process a job's remaining batches. progress(job) is called after each batch."""
+        token = uuid.uuid4().hex
+        if not self._acquire(job_id, token):
+            raise JobLeased(f'Retirement job {job_id} is not running or is leased by another process')
+        job = db.session.get(RetirementJob, job_id, populate_existing=True)
+        try:
+            while self.run_batch(job, token):
+                if progress:
+                    progress(job)
+            job.status = 'completed'
+            job.finished_at = datetime.utcnow()
+            job.runner = None
+            db.session.commit()
+        except JobLeased:
+            db.session.rollback()
+            raise
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(RetirementJob, job_id, populate_existing=True)
+            job.status = 'failed'
+            job.error = f'{type(e).__name__}: {str(e)}'[:1000]
+            job.runner = None
+            db.session.commit()
+            raise
+        if progress:
+            progress(job)
+        return job
+
+    def run_batch(self, job, token):
+        """Cancel the next batch of bookings in one transaction. Returns how many."""
+        vehicle_ids = json.loads(job.vehicle_ids)
+        now = datetime.utcnow()
+        rows = db.session.execute(
+            select(Booking.id, Booking.user_id, Booking.vehicle_id, Booking.status,
+                   Booking.start_date, Booking.end_date, User.username, User.email,
+                   Vehicle.year, Vehicle.make, Vehicle.model)
+            .join(User, User.id == Booking.user_id)
+            .join(Vehicle, Vehicle.id == Booking.vehicle_id)
+            .where(self._future_bookings(job, vehicle_ids), Booking.id > job.cursor)
+            .order_by(Booking.id).limit(self.batch_size)
+        ).mappings().all()
+        if not rows:
+            return 0
+        selected, last_id = len(rows), rows[-1]['id']
+        booking_ids = [row['id'] for row in rows]
+
+        # Lock the ones still active, so a booking changed since the SELECT is left alone
+        active = dict(db.session.execute(
+            select(Booking.id, Booking.status)
+            .where(Booking.id.in_(booking_ids), Booking.status.in_(ACTIVE_STATUSES))
+            .with_for_update()
+        ).all())
+        rows = [{**row, 'status': active[row['id']]} for row in rows if row['id'] in active]
+        booking_ids = [row['id'] for row in rows]
+        if booking_ids:
+            result = db.session.execute(
+                update(Booking).where(Booking.id.in_(booking_ids), Booking.status.in_(ACTIVE_STATUSES))
+                .values(status='cancelled', updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != len(booking_ids):
+                # Only without row locks (SQLite): another writer got in between, so redo the batch
+                db.session.rollback()
+                return self.run_batch(job, token)
+
+        payments = db.session.execute(
+            select(Payment.id, Payment.booking_id, Payment.amount)
+            .where(Payment.booking_id.in_(booking_ids), Payment.status == 'completed')
+        ).all() if booking_ids else []
+        if payments:
+            db.session.execute(
+                update(Payment).where(Payment.id.in_([p.id for p in payments]))
+                .values(status='refund_pending', updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        marked, refunds = {}, {}
+        for payment in payments:
+            marked[payment.booking_id] = marked.get(payment.booking_id, 0) + 1
+            refunds[payment.booking_id] = refunds.get(payment.booking_id, 0) + payment.amount
+
+        if rows:
+            db.session.execute(insert(RetirementOutcome), [{
+                'job_id': job.id,
+                'booking_id': row['id'],
+                'vehicle_id': row['vehicle_id'],
+                'user_id': row['user_id'],
+                'previous_status': row['status'],
+                'payments_marked': marked.get(row['id'], 0),
+                'refund_amount': refunds.get(row['id'], 0),
+                'created_at': now
+            } for row in rows])
+            event_log.record_many('booking', 'updated', [(row['id'], {'status': 'cancelled'}) for row in rows],
+                                  job.created_by)
+            event_log.record_many('payment', 'updated', [(p.id, {'status': 'refund_pending'}) for p in payments],
+                                  job.created_by)
+            messages = []
+            for row in rows:
+                subject, body = outbox.render(
+                    'booking.cancelled',
+                    username=row['username'],
+                    booking_id=row['id'],
+                    vehicle=f"{row['year']} {row['make']} {row['model']}",
+                    start_date=row['start_date'].strftime('%Y-%m-%d %H:%M'),
+                    end_date=row['end_date'].strftime('%Y-%m-%d %H:%M'),
+                    reason=job.reason or 'fleet retirement',
+                    refund_amount=refunds.get(row['id'], 0)
+                )
+                messages.append({'channel': 'email', 'recipient': row['email'], 'topic': 'booking.cancelled',
+                                 'subject': subject, 'body': body})
+            outbox.enqueue_many(messages)
+
+        # Advance the cursor under the lease; losing it rolls the whole batch back
+        result = db.session.execute(
+            update(RetirementJob).where(RetirementJob.id == job.id, RetirementJob.runner == token)
+            .values(
+                cursor=last_id,
+                processed=RetirementJob.processed + selected,
+                bookings_cancelled=RetirementJob.bookings_cancelled + len(rows),
+                payments_marked=RetirementJob.payments_marked + len(payments),
+                refund_amount=RetirementJob.refund_amount + sum(refunds.values()),
+                heartbeat_at=now
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise JobLeased(f'Lost the lease on retirement job {job.id}')
+        db.session.commit()
+        db.session.refresh(job)
+        return selected
+
+    def run_in_background(self, job_id):
+        """Run a job on a daemon thread (the API's path); resume it if the process dies."""
+        def target():
+            with self.app.app_context():
+                try:
+                    self.run(job_id)
+                except Exception as e:
+                    print(f"Retirement job {job_id} stopped: {str(e)}")
+        threading.Thread(target=target, name=f'retirement-{job_id}', daemon=True).start()
+
+    def outcomes(self, job_id, after_booking_id=0, limit=500):
+        return db.session.scalars(
+            select(RetirementOutcome).where(RetirementOutcome.job_id == job_id,
+                                            RetirementOutcome.booking_id > after_booking_id)
+            .order_by(RetirementOutcome.booking_id).limit(limit)
+        ).all()
+
+
+fleet_retirement = FleetRetirement()
+
+
+def _print_progress(job):
+    print(f"Job {job.id}: {job.processed}/{job.total} bookings, {job.bookings_cancelled} cancelled, "
+          f"{job.payments_marked} payments to refund ({job.refund_amount:.2f}) [{job.status}]")
+
+
+@spatial_cli.command('retire')
+@click.argument('vehicle_ids', nargs=-1, type=int, required=True)
+@click.option('--reason', default=None, help='Shown to affected customers.')
+def retire_vehicles(vehicle_ids, reason):
+    """Take vehicles out of service and cancel their future bookings."""
+    job = fleet_retirement.start(vehicle_ids, reason)
+    print(f"Created retirement job {job.id} ({job.total} bookings to cancel)")
+    fleet_retirement.run(job.id, _print_progress)
+
+
+@spatial_cli.command('resume-retirement')
+@click.argument('job_id', type=int)
+def resume_retirement(job_id):
+    """Continue an interrupted retirement job from its cursor."""
+    job = db.session.get(RetirementJob, job_id)
+    if not job:
+        print(f"No retirement job {job_id}")
+        return
+    if job.status == 'failed':
+        job.status, job.error = 'running', None
+        db.session.commit()
+    try:
+        fleet_retirement.run(job_id, _print_progress)
+    except JobLeased as e:
+        print(str(e))
@@ -0,0 +1,172 @@
+"""
+JWT revocation list.
+
+Revoked token ids (``jti``) are stored in the revoked_tokens table until the
+token would have expired. Each worker keeps a Bloom filter of every revoked
+jti in memory, so the common case of a token that was never revoked is a few
+bit tests with no database access. Only a filter hit (a revoked token or a
+rare false positive) is confirmed against the table on the primary.
+
+New revocations reach other workers through the event hub's fan-out backend,
+and each worker also picks up anything it missed with a periodic sync.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import g, has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import select, delete
+
+from models import db
+from models.revoked_token import RevokedToken
+from readiness import register_warmer
+from services.events import hub
+
+REVOKED_EVENT = 'internal.token.revoked'
+
+tokens_cli = AppGroup('tokens', help='Token revocation commands.')
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (per-process hash seed)."""
+    __slots__ = ('size', 'hashes', 'bits', 'count')
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, key):
+        if key in self:
+            return
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % self.size
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class RevocationStore:
+    """Bloom filter in front of the revoked_tokens table."""
+
+    def __init__(self):
+        self.capacity = 100000
+        self.error_rate = 0.001
+        self.sync_interval = 60
+        self.filter = BloomFilter(self.capacity, self.error_rate)
+        self._synced_at = None
+        self._next_sync = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.capacity = app.config.get('REVOCATION_FILTER_CAPACITY', 100000)
+        self.error_rate = app.config.get('REVOCATION_FILTER_ERROR_RATE', 0.001)
+        self.sync_interval = app.config.get('REVOCATION_SYNC_SECONDS', 60)
+        register_warmer('revocation_filter', self.rebuild)
+        hub.on(REVOKED_EVENT, lambda event: self.filter.add(event['data']['jti']))
+        app.cli.add_command(tokens_cli)
+        app.extensions['revocations'] = self
+
+    def rebuild(self):
+        """Rebuild the filter from unexpired revocations, growing it if needed."""
+        now = datetime.utcnow()
+        with db.engine.connect() as conn:
+            jtis = conn.execute(
+                select(RevokedToken.jti).where(RevokedToken.expires_at > now)
+            ).scalars().all()
+        bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        with self._lock:
+            self.filter = bloom
+            self._synced_at = now
+            self._next_sync = time.monotonic() + self.sync_interval
+
+    def _sync(self):
+        """Add revocations made since the last sync (covers missed fan-out)."""
+        with self._lock:
+            if time.monotonic() < self._next_sync:
+                return
+            self._next_sync = time.monotonic() + self.sync_interval
+            since = self._synced_at
+            self._synced_at = datetime.utcnow()
+        if since is None:
+            return self.rebuild()
+        # Small overlap for rows committed just after their revoked_at
+        with db.engine.connect() as conn:
+            jtis = conn.execute(
+                select(RevokedToken.jti).where(RevokedToken.revoked_at > since - timedelta(seconds=5))
+            ).scalars().all()
+        for jti in jtis:
+            self.filter.add(jti)
+        if self.filter.count > 2 * self.capacity:
+            self.rebuild()
+
+    def is_revoked(self, jti):
+        """True if the token id has been revoked."""
+        if time.monotonic() >= self._next_sync:
+            self._sync()
+        if jti not in self.filter:
+            return False
+        # Confirm on the primary: a replica may not have the revocation yet
+        with db.engine.connect() as conn:
+            return conn.execute(
+                select(RevokedToken.id).where(RevokedToken.jti == jti)
+            ).first() is not None
+
+    def revoke(self, jti, token_type, expires_at, user_id=None):
+        """Record a revocation and propagate it to every worker."""
+        if not RevokedToken.query.filter_by(jti=jti).first():
+            db.session.add(RevokedToken(
+                jti=jti,
+                token_type=token_type,
+                user_id=user_id,
+                expires_at=expires_at
+            ))
+            db.session.commit()
+        self.filter.add(jti)
+        if has_app_context():
+            g.pop('token_checked', None)  # later requests in a batch must recheck
+        hub.publish(REVOKED_EVENT, {'jti': jti}, internal=True)
+
+    def revoke_payload(self, payload):
+        """Revoke a decoded JWT payload."""
+        self.revoke(
+            payload['jti'],
+            payload.get('type', 'access'),
+            datetime.utcfromtimestamp(payload['exp']),
+            payload.get('sub')
+        )
+
+    def purge(self):
+        """Delete revocations of tokens that have expired anyway, then rebuild."""
+        result = db.session.execute(
+            delete(RevokedToken).where(RevokedToken.expires_at <= datetime.utcnow())
+        )
+        db.session.commit()
+        self.rebuild()
+        return result.rowcount
+
+
+revocations = RevocationStore()
+
+
+@tokens_cli.command('purge')
+def purge_tokens():
+    """Remove expired revocations and rebuild the filter."""
+    print(f"Purged {revocations.purge()} expired revocations")
@@ -0,0 +1,327 @@
+"""
+Offline route estimation.
+
+The road graph is stored in a compact array-backed (CSR) file: node
+coordinates, an offsets array and flat edge arrays for target, length and
+travel time. Shortest paths use A* with landmark lower bounds (ALT): travel
+times to and from a handful of landmarks are precomputed when the file is
+built, which prunes most of the search. Recent results are kept in an LRU
+cache keyed on the snapped node pair.
+
+Build a graph file from CSV exports (e.g. of an OSM extract):
+
+    flask --app app routes build nodes.csv edges.csv roads.rgraph
+
+nodes.csv: id,lat,lon
+edges.csv: from,to,length_m,speed_kmh[,oneway]
+"""
+
+import array
+import csv
+import heapq
+import math
+import struct
+from functools import lru_cache
+
+import click
+from flask.cli import AppGroup
+
+from readiness import register_warmer
+from services.gazetteer import gazetteer
+
+MAGIC = b'RRGRAPH1'
+HEADER = struct.Struct('<8sIII')  # magic, nodes, edges, landmarks
+INF = float('inf')
+GRID_SIZE = 0.01  # degrees per nearest-node grid cell (~1km)
+SNAP_SPEED_KMH = 30  # assumed speed between a point and its nearest node
+
+routes_cli = AppGroup('routes', help='Road graph and route estimation commands.')
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * 6371000 * math.asin(math.sqrt(a))
+
+
+class RoadGraph:
+    """Directed road graph in CSR form with optional landmark tables."""
+
+    def __init__(self, lat, lon, offsets, targets, length, time,
+                 landmarks=None, lm_from=None, lm_to=None):
+        self.lat = lat
+        self.lon = lon
+        self.offsets = offsets
+        self.targets = targets
+        self.length = length
+        self.time = time
+        self.landmarks = landmarks or array.array('I')
+        self.lm_from = lm_from or array.array('f')  # landmark -> node travel time
+        self.lm_to = lm_to or array.array('f')      # node -> landmark travel time
+        self._build_grid()
+
+    @property
+    def node_count(self):
+        return len(self.lat)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    @classmethod
+    def from_csv(cls, nodes_path, edges_path):
+        """Build a graph from node and edge CSV files."""
+        index = {}
+        lat, lon = array.array('d'), array.array('d')
+        with open(nodes_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                index[row['id']] = len(lat)
+                lat.append(float(row['lat']))
+                lon.append(float(row['lon']))
+
+        adjacency = [[] for _ in range(len(lat))]
+        with open(edges_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                a, b = index[row['from']], index[row['to']]
+                length = float(row['length_m'])
+                seconds = length / (float(row['speed_kmh']) / 3.6)
+                adjacency[a].append((b, length, seconds))
+                if row.get('oneway', '0') not in ('1', 'yes', 'true'):
+                    adjacency[b].append((a, length, seconds))
+
+        offsets = array.array('I', [0])
+        targets, length, time = array.array('I'), array.array('f'), array.array('f')
+        for edges in adjacency:
+            for b, metres, seconds in edges:
+                targets.append(b)
+                length.append(metres)
+                time.append(seconds)
+            offsets.append(len(targets))
+        return cls(lat, lon, offsets, targets, length, time)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            magic, n, m, k = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f'{path} is not a road graph file')
+
+            def read(typecode, count):
+                values = array.array(typecode)
+                values.fromfile(f, count)
+                return values
+
+            return cls(read('d', n), read('d', n), read('I', n + 1), read('I', m),
+                       read('f', m), read('f', m), read('I', k), read('f', k * n), read('f', k * n))
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, self.node_count, self.edge_count, len(self.landmarks)))
+            for values in (self.lat, self.lon, self.offsets, self.targets, self.length,
+                           self.time, self.landmarks, self.lm_from, self.lm_to):
+                values.tofile(f)
+
+    def _reversed(self):
+        """Reverse adjacency as (offsets, targets, time) for backward searches."""
+        incoming = [[] for _ in range(self.node_count)]
+        for a in range(self.node_count):
+            for e in range(self.offsets[a], self.offsets[a + 1]):
+                incoming[self.targets[e]].append((a, self.time[e]))
+        offsets, targets, time = array.array('I', [0]), array.array('I'), array.array('f')
+        for edges in incoming:
+            for b, seconds in edges:
+                targets.append(b)
+                time.append(seconds)
+            offsets.append(len(targets))
+        return offsets, targets, time
+
+    def _dijkstra(self, source, offsets, targets, time):
+        """Travel time from source to every node over the given adjacency."""
+        dist = [INF] * self.node_count
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                nd = d + time[e]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return dist
+
+    def precompute_landmarks(self, count=8):
+        """Pick landmarks by farthest-point selection and store their time tables."""
+        reverse = self._reversed()
+        landmarks, from_tables, to_tables = [], [], []
+        closest = [INF] * self.node_count
+        candidate = 0
+        for _ in range(min(count, self.node_count)):
+            forward = self._dijkstra(candidate, self.offsets, self.targets, self.time)
+            backward = self._dijkstra(candidate, *reverse)
+            landmarks.append(candidate)
+            from_tables.append(forward)
+            to_tables.append(backward)
+            # Next landmark: the reachable node farthest from every landmark so far
+            for v in range(self.node_count):
+                if forward[v] < closest[v]:
+                    closest[v] = forward[v]
+            reachable = [(d, v) for v, d in enumerate(closest) if d != INF and v not in landmarks]
+            if not reachable:
+                break
+            candidate = max(reachable)[1]
+
+        self.landmarks = array.array('I', landmarks)
+        self.lm_from = array.array('f', [d for table in from_tables for d in table])
+        self.lm_to = array.array('f', [d for table in to_tables for d in table])
+
+    def _heuristic(self, v, t):
+        """Lower bound on travel time v -> t from the triangle inequality."""
+        n = self.node_count
+        best = 0.0
+        for i in range(len(self.landmarks)):
+            base = i * n
+            lt, lv = self.lm_from[base + t], self.lm_from[base + v]
+            vl, tl = self.lm_to[base + v], self.lm_to[base + t]
+            if lt != INF and lv != INF and lt - lv > best:
+                best = lt - lv
+            if vl != INF and tl != INF and vl - tl > best:
+                best = vl - tl
+        return best
+
+    def shortest_path(self, source, target):
+        """Fastest route between two nodes. Returns (seconds, metres) or None."""
+        if source == target:
+            return 0.0, 0.0
+        best = {source: 0.0}
+        metres = {source: 0.0}
+        heap = [(self._heuristic(source, target), 0.0, source)]
+        settled = set()
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if u == target:
+                return d, metres[u]
+            if u in settled:
+                continue
+            settled.add(u)
+            for e in range(self.offsets[u], self.offsets[u + 1]):
+                v = self.targets[e]
+                nd = d + self.time[e]
+                if nd < best.get(v, INF):
+                    best[v] = nd
+                    metres[v] = metres[u] + self.length[e]
+                    heapq.heappush(heap, (nd + self._heuristic(v, target), nd, v))
+        return None
+
+    def _build_grid(self):
+        grid = {}
+        for i in range(self.node_count):
+            grid.setdefault((int(self.lat[i] // GRID_SIZE), int(self.lon[i] // GRID_SIZE)), []).append(i)
+        self.grid = grid
+
+    def nearest_node(self, lat, lon, max_rings=50):
+        """Closest graph node to a coordinate, searching outward ring by ring."""
+        row, col = int(lat // GRID_SIZE), int(lon // GRID_SIZE)
+        cell_m = GRID_SIZE * 111320 * max(math.cos(math.radians(lat)), 0.01)
+        best, best_d = None, INF
+        for ring in range(max_rings + 1):
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) != ring:
+                        continue
+                    for i in self.grid.get((r, c), ()):
+                        d = haversine_m(lat, lon, self.lat[i], self.lon[i])
+                        if d < best_d:
+                            best, best_d = i, d
+            # Anything in a further ring is at least `ring` cells away
+            if best is not None and best_d <= ring * cell_m:
+                return best
+        return best
+
+
+class RouteEngine:
+    """Loads the road graph and answers cached distance/time estimates."""
+
+    def __init__(self):
+        self.graph = None
+        self.path = None
+        self.cache_size = 10000
+        self._route = None
+
+    def init_app(self, app):
+        self.path = app.config.get('ROUTE_GRAPH_FILE')
+        self.cache_size = app.config.get('ROUTE_CACHE_SIZE', 10000)
+        if self.path:
+            register_warmer('route_graph', self.load)
+        app.cli.add_command(routes_cli)
+        app.extensions['route_engine'] = self
+
+    def load(self, graph=None):
+        """Load (or install) the graph and start a fresh route cache."""
+        if graph is None and self.graph is not None:
+            return
+        self.graph = graph or RoadGraph.load(self.path)
+        self._route = lru_cache(maxsize=self.cache_size)(self.graph.shortest_path)
+        print(f"Loaded road graph: {self.graph.node_count} nodes, {self.graph.edge_count} edges")
+
+    @property
+    def loaded(self):
+        return self.graph is not None
+
+    def estimate(self, origin, destination):
+        """Driving distance/time between two (lat, lon) points, or None if unroutable."""
+        if not self.loaded:
+            self.load()
+        graph = self.graph
+        a = graph.nearest_node(*origin)
+        b = graph.nearest_node(*destination)
+        if a is None or b is None:
+            return None
+        route = self._route(a, b)
+        if route is None:
+            return None
+        seconds, metres = route
+        # Add the off-graph legs to and from the snapped nodes
+        snap = (haversine_m(*origin, graph.lat[a], graph.lon[a])
+                + haversine_m(*destination, graph.lat[b], graph.lon[b]))
+        seconds += snap / (SNAP_SPEED_KMH / 3.6)
+        metres += snap
+        return {
+            'distance_km': round(metres / 1000, 2),
+            'duration_minutes': round(seconds / 60, 1)
+        }
+
+    def cache_info(self):
+        return self._route.cache_info()._asdict() if self._route else None
+
+
+route_engine = RouteEngine()
+
+
+@routes_cli.command('build')
+@click.argument('nodes_csv')
+@click.argument('edges_csv')
+@click.argument('output')
+@click.option('--landmarks', type=int, default=8, help='Number of ALT landmarks to precompute.')
+def build_graph(nodes_csv, edges_csv, output, landmarks):
+    """Convert node/edge CSVs into a compact road graph file."""
+    graph = RoadGraph.from_csv(nodes_csv, edges_csv)
+    print(f"Read {graph.node_count} nodes and {graph.edge_count} edges")
+    graph.precompute_landmarks(landmarks)
+    graph.save(output)
+    print(f"Wrote {output} with {len(graph.landmarks)} landmarks")
+
+
+@routes_cli.command('estimate')
+@click.argument('origin')
+@click.argument('destination')
+def estimate_route(origin, destination):
+    """Estimate a route between two places or 'lat,lon' pairs."""
+    a, b = gazetteer.lookup(origin), gazetteer.lookup(destination)
+    if not a or not b:
+        raise click.ClickException('Unknown origin or destination')
+    print(route_engine.estimate(a, b))
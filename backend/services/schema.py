@@ -0,0 +1,63 @@
+"""
+In-place upgrades of an existing database.
+
+``db.create_all()`` creates missing tables but never alters existing ones,
+so columns and indexes added to a model after its table was created are
+added here: each column in ADDED_COLUMNS that the table lacks gets an
+``ALTER TABLE ... ADD COLUMN``, and every index declared on the primary
+database's models is created if missing. Every step checks first, so the
+upgrade runs at start-up and is safe to repeat with
+``flask schema upgrade``.
+"""
+
+from flask.cli import AppGroup
+from sqlalchemy import inspect, text
+
+from models import db
+from models.vehicle import Vehicle
+
+# Nullable columns added to existing tables, in the order they were introduced
+ADDED_COLUMNS = [
+    (Vehicle, ('latitude', 'longitude', 'geo_cell')),
+    (Vehicle, ('image_hash',)),
+]
+
+schema_cli = AppGroup('schema', help='Database schema commands.')
+
+
+def upgrade(engine=None):
+    """Add missing columns and indexes to the primary database. Returns what was added."""
+    added = []
+    with (engine or db.engine).begin() as conn:
+        inspector = inspect(conn)
+        for model, names in ADDED_COLUMNS:
+            table = model.__table__
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for name in names:
+                if name in existing:
+                    continue
+                column = table.c[name]
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {name} '
+                                  f'{column.type.compile(dialect=conn.dialect)}'))
+                added.append(f'{table.name}.{name}')
+        tables = set(inspector.get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+                    added.append(index.name)
+    return added
+
+
+@schema_cli.command('upgrade')
+def upgrade_schema():
+    """Add columns and indexes missing from an existing database."""
+    added = upgrade()
+    print(f"Added {', '.join(added)}" if added else 'Schema is up to date')
+
+
+def init_app(app):
+    app.cli.add_command(schema_cli)
@@ -0,0 +1,214 @@
+"""
+Slow query log with EXPLAIN capture.
+
+Every statement is timed with ``before_cursor_execute`` and
+``after_cursor_execute``. One slower than SLOW_QUERY_MS is recorded under its
+fingerprint (see services.querybudget), along with redacted parameters, the
+endpoint or CLI command that ran it and the plan from the dialect's EXPLAIN
+(``EXPLAIN QUERY PLAN`` on SQLite). The plan is captured on a raw cursor of
+the same connection, so it sees the same data and isn't itself counted or
+timed. On databases other than SQLite it runs inside a savepoint, so a
+failing EXPLAIN leaves the request's transaction usable.
+
+Only the first occurrence of a fingerprint is written to SLOW_QUERY_LOG
+(JSON lines). Repeats just update in-memory counters, which are written
+again at most every SLOW_QUERY_RELOG_SECONDS. The log stays small under load.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import click
+from flask import has_request_context, request
+from flask.cli import AppGroup
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from services.querybudget import fingerprint
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+    'mariadb': 'EXPLAIN ',
+}
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+slow_cli = AppGroup('slow-queries', help='Slow query log commands.')
+
+
+def redact(parameters):
+    """Parameter types and sizes only, never values."""
+    def describe(value):
+        if value is None:
+            return None
+        if isinstance(value, (str, bytes)):
+            return f'<{type(value).__name__}:{len(value)}>'
+        return f'<{type(value).__name__}>'
+
+    if isinstance(parameters, dict):
+        return {key: describe(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [describe(value) for value in parameters]
+    return describe(parameters)
+
+
+def current_source():
+    """The endpoint or CLI command running the statement."""
+    if has_request_context():
+        return f'{request.method} {request.endpoint or request.path}'
+    context = click.get_current_context(silent=True)
+    if context is not None:
+        return f'cli {context.command_path}'
+    return None
+
+
+class SlowQueryLog:
+    """Times statements and logs slow ones, once per fingerprint."""
+
+    def __init__(self):
+        self.threshold = 0.1
+        self.path = 'slow_queries.log'
+        self.explain = True
+        self.relog_seconds = 3600
+        self.max_fingerprints = 1000
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._listening = False
+
+    def init_app(self, app):
+        self.threshold = app.config.get('SLOW_QUERY_MS', 100) / 1000
+        self.path = app.config.get('SLOW_QUERY_LOG') or os.path.join(app.instance_path, 'slow_queries.log')
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.explain = app.config.get('SLOW_QUERY_EXPLAIN', True)
+        self.relog_seconds = app.config.get('SLOW_QUERY_RELOG_SECONDS', 3600)
+        self.max_fingerprints = app.config.get('SLOW_QUERY_MAX_FINGERPRINTS', 1000)
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before)
+            event.listen(Engine, 'after_cursor_execute', self._after)
+            self._listening = True
+        app.cli.add_command(slow_cli)
+        app.extensions['slow_queries'] = self
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_start', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('slow_query_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        if elapsed >= self.threshold:
+            try:
+                self.record(conn, statement, parameters, executemany, elapsed)
+            except Exception as e:
+                print(f"Slow query log error: {str(e)}")
+
+    def record(self, conn, statement, parameters, executemany, elapsed):
+        shape = fingerprint(statement)
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(shape)
+            if entry is not None:
+                entry['count'] += 1
+                entry['total_ms'] += elapsed * 1000
+                entry['max_ms'] = max(entry['max_ms'], elapsed * 1000)
+                self.entries.move_to_end(shape)
+                if now - entry['logged_at'] < self.relog_seconds:
+                    return
+                entry['logged_at'] = now
+                line = dict(entry, event='repeat', at=datetime.utcnow().isoformat())
+            else:
+                entry = None
+        if entry is None:
+            # First sighting: capture the plan outside the lock
+            plan = None
+            if self.explain and not executemany:
+                plan = self.explain_plan(conn, statement, parameters)
+            entry = {
+                'fingerprint': shape,
+                'source': current_source(),
+                'parameters': redact(parameters),
+                'plan': plan,
+                'count': 1,
+                'total_ms': elapsed * 1000,
+                'max_ms': elapsed * 1000,
+                'first_seen': datetime.utcnow().isoformat(),
+                'logged_at': now
+            }
+            with self._lock:
+                if shape in self.entries:
+                    return  # another thread logged it first
+                self.entries[shape] = entry
+                while len(self.entries) > self.max_fingerprints:
+                    self.entries.popitem(last=False)
+            line = dict(entry, event='slow', at=entry['first_seen'])
+            print(f"Slow query ({elapsed * 1000:.0f}ms, {entry['source']}): {shape[:200]}")
+
+        line.pop('logged_at', None)
+        line['total_ms'] = round(line['total_ms'], 2)
+        line['max_ms'] = round(line['max_ms'], 2)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(line, default=str) + '\n')
+
+    @staticmethod
+    def explain_plan(conn, statement, parameters):
+        """The dialect's plan for a statement, as a list of rows, or None."""
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if not prefix or not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        cursor = conn.connection.dbapi_connection.cursor()
+        # A failed EXPLAIN (e.g. a statement timeout) would otherwise abort the request's
+        # transaction on PostgreSQL; SQLite's EXPLAIN QUERY PLAN can't fail that way
+        savepoint = conn.dialect.name != 'sqlite'
+        try:
+            if savepoint:
+                cursor.execute('SAVEPOINT slow_query_explain')
+            try:
+                cursor.execute(prefix + statement, parameters)
+                plan = [' | '.join(str(col) for col in row) for row in cursor.fetchall()]
+            except Exception as e:
+                if savepoint:
+                    cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                plan = [f'EXPLAIN failed: {str(e)}']
+            if savepoint:
+                cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+            return plan
+        except Exception as e:
+            return [f'EXPLAIN failed: {str(e)}']
+        finally:
+            cursor.close()
+
+    def summary(self, limit=20):
+        """Slowest fingerprints seen by this process, by total time."""
+        with self._lock:
+            entries = sorted(self.entries.values(), key=lambda e: e['total_ms'], reverse=True)
+        return entries[:limit]
+
+
+slow_queries = SlowQueryLog()
+
+
+@slow_cli.command('show')
+@click.option('--limit', type=int, default=20, help='Number of fingerprints to show.')
+def show_slow_queries(limit):
+    """Summarise the slow query log file by fingerprint."""
+    totals = {}
+    try:
+        with open(slow_queries.path) as f:
+            for line in f:
+                entry = json.loads(line)
+                # Each line carries cumulative counters; keep the latest
+                totals[entry['fingerprint']] = entry
+    except FileNotFoundError:
+        print(f"No slow queries logged ({slow_queries.path} does not exist)")
+        return
+    for entry in sorted(totals.values(), key=lambda e: e['total_ms'], reverse=True)[:limit]:
+        print(f"{entry['count']:>6}x  max {entry['max_ms']:>8.1f}ms  total {entry['total_ms']:>10.1f}ms  {entry['source']}")
+        print(f"        {entry['fingerprint'][:300]}")
+        for row in entry.get('plan') or []:
+            print(f"          {row}")
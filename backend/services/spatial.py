@@ -0,0 +1,102 @@
+"""
+Nearest-vehicle search over the indexed spatial grid.
+
+A search looks at rings of grid cells around the query point in doubling
+bands, one query per band, with the availability check in the same SQL so
+only free vehicles are ever fetched. A band is the latitude/longitude box of
+its outer ring minus the box of the rings already searched, so it is two
+range conditions on the (latitude, longitude) index however many cells it
+spans. The search stops once the k-th closest match is nearer than anything
+an outer ring could contain, and never looks beyond MAX_SEARCH_KM.
+"""
+
+import math
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import and_, not_
+
+from models import db
+from models.vehicle import Vehicle, GEO_CELL_DEGREES
+from services.gazetteer import gazetteer
+from services.routing import haversine_m
+
+CELL_METRES = GEO_CELL_DEGREES * 111320  # grid cell height; width shrinks with latitude
+MAX_SEARCH_KM = 500
+
+spatial_cli = AppGroup('vehicles', help='Vehicle location commands.')
+
+
+def geocode_vehicle(vehicle, latitude=None, longitude=None):
+    """Set coordinates from explicit values or by geocoding Vehicle.location."""
+    if latitude is None or longitude is None:
+        point = gazetteer.lookup(vehicle.location) if vehicle.location else None
+        latitude, longitude = point if point else (None, None)
+    vehicle.set_coordinates(latitude, longitude)
+    return latitude is not None
+
+
+def ring_box(row, col, ring):
+    """Latitude/longitude box covering every cell at most `ring` steps from (row, col)."""
+    return and_(
+        Vehicle.latitude >= (row - ring) * GEO_CELL_DEGREES,
+        Vehicle.latitude < (row + ring + 1) * GEO_CELL_DEGREES,
+        Vehicle.longitude >= (col - ring) * GEO_CELL_DEGREES,
+        Vehicle.longitude < (col + ring + 1) * GEO_CELL_DEGREES
+    )
+
+
+def band_filter(row, col, first, last):
+    """Vehicles in rings first..last around (row, col)."""
+    if first == 0:
+        return ring_box(row, col, last)
+    return and_(ring_box(row, col, last), not_(ring_box(row, col, first - 1)))
+
+
+def nearest_available(latitude, longitude, k, start_date=None, end_date=None, max_km=50, options=()):
+    """The k nearest vehicles free for the dates, as [(distance_m, vehicle)]; options go to the query."""
+    max_km = min(max_km, MAX_SEARCH_KM)
+    row, col = Vehicle.grid_position(latitude, longitude)
+    # Cells are narrower east-west than north-south away from the equator
+    cell_m = CELL_METRES * max(math.cos(math.radians(latitude)), 0.01)
+    max_rings = int(max_km * 1000 // cell_m) + 1
+    if start_date and end_date:
+        available = Vehicle.available_for_dates_filter(start_date, end_date)
+    else:
+        available = Vehicle.is_available.is_(True)
+
+    found = []
+    first, last = 0, 0
+    while first <= max_rings:
+        vehicles = Vehicle.query.options(*options).filter(band_filter(row, col, first, last), available).all()
+        for vehicle in vehicles:
+            distance = haversine_m(latitude, longitude, vehicle.latitude, vehicle.longitude)
+            if distance <= max_km * 1000:
+                found.append((distance, vehicle))
+        found.sort(key=lambda item: item[0])
+        # Everything beyond the last ring searched is at least `last` cells away
+        if len(found) >= k and found[k - 1][0] <= last * cell_m:
+            break
+        first, last = last + 1, min(last * 2 + 1, max_rings)
+    return found[:k]
+
+
+@spatial_cli.command('geocode')
+@click.option('--all', 'overwrite', is_flag=True, help='Re-geocode vehicles that already have coordinates.')
+def geocode_vehicles(overwrite):
+    """Fill in vehicle coordinates from the gazetteer."""
+    query = Vehicle.query if overwrite else Vehicle.query.filter(Vehicle.latitude.is_(None))
+    updated, missing = 0, []
+    for vehicle in query.all():
+        if geocode_vehicle(vehicle):
+            updated += 1
+        else:
+            missing.append(vehicle.location)
+    db.session.commit()
+    print(f"Geocoded {updated} vehicles")
+    if missing:
+        print(f"Unknown locations: {', '.join(sorted(set(str(m) for m in missing)))}")
+
+
+def init_app(app):
+    app.cli.add_command(spatial_cli)
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """The application on throwaway databases, with background workers off."""
+    db_dir = tmp_path_factory.mktemp('db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_dir / 'ranger_rentals.db'}"
+    os.environ['ARCHIVE_DATABASE_URL'] = f"sqlite:///{db_dir / 'ranger_rentals_archive.db'}"
+    os.environ['SLOW_QUERY_LOG'] = str(db_dir / 'slow_queries.log')
+    os.environ['OUTBOX_DISPATCHER'] = 'off'
+    os.environ['RATELIMIT_ENABLED'] = '0'
+    from app import app
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_headers(app, login):
+    from models import db
+    from models.user import User
+    with app.app_context():
+        # create_app passes an already hashed password, which User hashes again
+        User.query.filter_by(email='admin@ranger.com').first().set_password('admin123')
+        db.session.commit()
+    return login('admin@ranger.com', 'admin123')
+
+
+@pytest.fixture
+def login(client):
+    def login(email, password):
+        response = client.post('/api/auth/login', json={'email': email, 'password': password})
+        return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+    return login
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from models import db
+from models.booking import Booking
+from models.user import User
+from models.vehicle import Vehicle
+from services.analytics import DemandAnalytics
+
+
+def midnight(days):
+    return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=days)
+
+
+def add_vehicle(vehicle_type, location):
+    admin_id = User.query.filter_by(email='admin@ranger.com').first().id
+    vehicle = Vehicle(make='Ford', model='Transit', year=2022, type=vehicle_type, price_per_day=80,
+                      location=location, owner_id=admin_id)
+    db.session.add(vehicle)
+    db.session.flush()
+    vehicle.created_at = midnight(-40)
+    return vehicle, admin_id
+
+
+def book(vehicle, user_id, start, end, status='confirmed'):
+    booking = Booking(vehicle_id=vehicle.id, user_id=user_id, start_date=start, end_date=end,
+                      total_price=80, status=status)
+    db.session.add(booking)
+    return booking
+
+
+def test_utilization_and_forecast_of_known_bookings(app):
+    with app.app_context():
+        vehicle, user_id = add_vehicle('Van', 'Analytics Town')
+        book(vehicle, user_id, midnight(-10), midnight(-7))
+        book(vehicle, user_id, midnight(-5) + timedelta(hours=6), midnight(-5) + timedelta(hours=18))
+        book(vehicle, user_id, midnight(-20), midnight(-15), status='cancelled')
+        book(vehicle, user_id, midnight(2), midnight(4))
+        db.session.commit()
+
+        analytics = DemandAnalytics()
+        report = analytics.report()
+        stats = next(v for v in report['vehicles'] if v['vehicle_id'] == vehicle.id)
+        assert stats['booked_days'] == 3.5
+        assert stats['utilization'] == round(3.5 / 40, 4)
+        assert stats['utilization_30d'] == round(3.5 / 30, 4)
+
+        group = next(g for g in report['forecast'] if g['location'] == 'Analytics Town')
+        assert group['type'] == 'Van' and group['vehicles'] == 1
+        assert [day['on_books'] for day in group['days'][:5]] == [0, 0, 1, 1, 0]
+        assert all(day['on_books'] <= day['forecast'] <= 1 for day in group['days'])
+
+
+def test_incremental_refresh_matches_a_rebuild(app):
+    with app.app_context():
+        vehicle, user_id = add_vehicle('Minibus', 'Refresh City')
+        moved = book(vehicle, user_id, midnight(-12), midnight(-9))
+        cancelled = book(vehicle, user_id, midnight(-6), midnight(-3))
+        deleted = book(vehicle, user_id, midnight(1), midnight(3))
+        db.session.commit()
+
+        analytics = DemandAnalytics()
+        analytics.refresh()
+        state = analytics._state
+
+        moved.start_date, moved.end_date = midnight(-20) + timedelta(hours=12), midnight(-18)
+        cancelled.cancel()
+        db.session.delete(deleted)
+        book(vehicle, user_id, midnight(5), midnight(8))
+        db.session.commit()
+
+        analytics.refresh()
+        assert analytics._state is state
+        rebuilt = DemandAnalytics().report()
+        for report in (analytics._report, rebuilt):
+            report.pop('generated_at')
+        assert analytics._report == rebuilt
+        stats = next(v for v in rebuilt['vehicles'] if v['vehicle_id'] == vehicle.id)
+        assert stats['booked_days'] == 1.5
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from models import db
+from models.archive import BookingArchive, PaymentArchive
+from models.booking import Booking
+from models.payment import Payment
+from models.user import User
+from models.vehicle import Vehicle
+from services.archive import archiver
+
+
+def test_rows_changed_during_archival_stay_hot(app, monkeypatch):
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@ranger.com').first()
+        vehicle = Vehicle(make='Mazda', model='CX-5', year=2019, type='SUV', price_per_day=70, owner_id=admin.id)
+        db.session.add(vehicle)
+        db.session.flush()
+        start = datetime(2019, 1, 1)
+        bookings = [Booking(vehicle_id=vehicle.id, user_id=admin.id, status='completed', total_price=70,
+                            start_date=start + timedelta(days=3 * i), end_date=start + timedelta(days=3 * i + 1))
+                    for i in range(3)]
+        db.session.add_all(bookings)
+        db.session.flush()
+        for booking in bookings:
+            payment = Payment(user_id=admin.id, booking_id=booking.id, amount=70, payment_method='card',
+                              status='completed')
+            payment.transaction_id = f'TXN-ARCHIVE-{booking.id}'
+            db.session.add(payment)
+        db.session.commit()
+        paid_late, reopened, untouched = [b.id for b in bookings]
+
+        # Between the copy and the hot delete: a new payment on one, a status change on another
+        delete_copied = archiver._delete_copied
+        def concurrent_writes(*args):
+            payment = Payment(user_id=admin.id, booking_id=paid_late, amount=5, payment_method='card',
+                              status='completed')
+            payment.transaction_id = 'TXN-ARCHIVE-LATE'
+            db.session.add(payment)
+            db.session.get(Booking, reopened).status = 'confirmed'
+            db.session.commit()
+            return delete_copied(*args)
+        monkeypatch.setattr(archiver, '_delete_copied', concurrent_writes)
+
+        count, _ = archiver.archive_batch(datetime.utcnow(), paid_late - 1)
+        db.session.expire_all()
+
+        assert count == 1
+        assert db.session.get(BookingArchive, untouched) and not db.session.get(Booking, untouched)
+        assert PaymentArchive.query.filter_by(booking_id=untouched).count() == 1
+        for booking_id in (paid_late, reopened):
+            assert db.session.get(Booking, booking_id)
+            assert not db.session.get(BookingArchive, booking_id)
+            assert not PaymentArchive.query.filter_by(booking_id=booking_id).count()
+        assert Payment.query.filter_by(booking_id=paid_late).count() == 2
+
+
+def test_archived_payment_is_still_readable(app, client, admin_headers):
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@ranger.com').first()
+        vehicle = Vehicle(make='Honda', model='Jazz', year=2017, type='Sedan', price_per_day=35, owner_id=admin.id)
+        db.session.add(vehicle)
+        db.session.flush()
+        booking = Booking(vehicle_id=vehicle.id, user_id=admin.id, status='completed', total_price=35,
+                          start_date=datetime(2018, 3, 1), end_date=datetime(2018, 3, 2))
+        db.session.add(booking)
+        db.session.flush()
+        payment = Payment(user_id=admin.id, booking_id=booking.id, amount=35, payment_method='card',
+                          status='completed')
+        payment.transaction_id = 'TXN-ARCHIVE-READ'
+        db.session.add(payment)
+        db.session.commit()
+        payment_id = payment.id
+
+        archiver.archive_batch(datetime.utcnow(), booking.id - 1)
+        db.session.expire_all()
+        assert not db.session.get(Payment, payment_id)
+
+    response = client.get(f'/api/payments/{payment_id}', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.get_json()['transaction_id'] == 'TXN-ARCHIVE-READ'
+    assert client.get('/api/payments/999999', headers=admin_headers).status_code == 404
@@ -0,0 +1,26 @@
+import asyncio
+
+
+def stream_status(token):
+    """Status of GET /api/events on the ASGI app; the client disconnects straight away."""
+    from asgi import application
+    messages = []
+
+    async def receive():
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': '/api/events', 'query_string': b'',
+             'headers': [(b'authorization', f'Bearer {token}'.encode())]}
+    asyncio.run(asyncio.wait_for(application(scope, receive, send), 5))
+    return messages[0]['status']
+
+
+def test_event_stream_rejects_logged_out_token(client, admin_headers):
+    token = admin_headers['Authorization'].split(' ', 1)[1]
+    assert stream_status(token) == 200
+
+    assert client.post('/api/auth/logout', headers=admin_headers).status_code == 200
+    assert stream_status(token) == 401
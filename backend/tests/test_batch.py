@@ -0,0 +1,19 @@
+from services.holds import holds
+
+
+def test_failing_sub_request_returns_500_entry(app, client, admin_headers, monkeypatch):
+    assert app.config['TESTING']  # exceptions propagate, as under debug
+    def fail(user_id):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(holds, 'user_holds', fail)
+
+    response = client.post('/api/batch', json={'requests': [
+        {'id': 'holds', 'path': '/api/holds'},
+        {'id': 'vehicles', 'path': '/api/vehicles'}
+    ]}, headers=admin_headers)
+
+    assert response.status_code == 200
+    failed, ok = response.get_json()['responses']
+    assert failed['id'] == 'holds' and failed['status'] == 500
+    assert failed['body']['success'] is False
+    assert ok['id'] == 'vehicles' and ok['status'] == 200
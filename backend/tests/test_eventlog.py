@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+from models import db
+from models.booking import Booking
+from models.entity_event import EntityEvent
+from models.payment import Payment
+from models.user import User
+from models.vehicle import Vehicle
+from services.eventlog import event_log, encode, replay, TRACKED_FIELDS, BUFFER_KEY
+
+
+def tracked_state(obj, entity_type):
+    return {field: encode(getattr(obj, field)) for field in TRACKED_FIELDS[entity_type]}
+
+
+def test_booking_payment_refund_is_logged_and_replays(app, client, admin_headers):
+    with app.app_context():
+        admin_id = User.query.filter_by(email='admin@ranger.com').first().id
+        vehicle = Vehicle(make='Tesla', model='Model 3', year=2023, type='Sedan', price_per_day=120,
+                          owner_id=admin_id)
+        db.session.add(vehicle)
+        db.session.commit()
+        vehicle_id = vehicle.id
+        # Ids of rows archived by other tests can be reused, so only look at events from here on
+        first_event = db.session.scalar(select(func.max(EntityEvent.id))) or 0
+
+    start = (datetime.utcnow() + timedelta(days=60)).replace(hour=10, minute=0, second=0, microsecond=0)
+    response = client.post('/api/bookings', json={'vehicle_id': vehicle_id, 'start_date': start.isoformat(),
+                                                  'end_date': (start + timedelta(days=2)).isoformat()},
+                           headers=admin_headers)
+    assert response.status_code == 201
+    booking_id = response.get_json()['booking']['id']
+    moved = start + timedelta(days=7)
+    response = client.put(f'/api/bookings/{booking_id}', json={'start_date': moved.isoformat(),
+                                                               'end_date': (moved + timedelta(days=2)).isoformat()},
+                          headers=admin_headers)
+    assert response.status_code == 200
+    response = client.post('/api/payments', json={'booking_id': booking_id, 'amount': 240,
+                                                  'payment_method': 'card'}, headers=admin_headers)
+    assert response.status_code == 201
+    payment_id = response.get_json()['payment_id']
+    assert client.post(f'/api/payments/{payment_id}/refund', headers=admin_headers).status_code == 200
+
+    with app.app_context():
+        booking_events = [e.to_dict() for e in event_log.history('booking', booking_id) if e.id > first_event]
+        assert [e['event'] for e in booking_events] == ['created', 'updated', 'updated']
+        assert booking_events[0]['data']['status'] == 'confirmed'
+        assert booking_events[1]['data'] == {'start_date': moved.isoformat(),
+                                             'end_date': (moved + timedelta(days=2)).isoformat()}
+        assert booking_events[2]['data'] == {'status': 'refunded'}
+        assert {e['actor_id'] for e in booking_events} == {admin_id}
+
+        payment_events = [e.to_dict() for e in event_log.history('payment', payment_id) if e.id > first_event]
+        assert [(e['event'], e['data'].get('status')) for e in payment_events] == [
+            ('created', 'completed'), ('updated', 'refunded')]
+
+        booking = db.session.get(Booking, booking_id)
+        payment = db.session.get(Payment, payment_id)
+        assert replay(booking_events) == tracked_state(booking, 'booking')
+        assert replay(payment_events) == tracked_state(payment, 'payment')
+        # Before the refund: moved, still confirmed
+        state = replay(booking_events[:2])
+        assert (state['status'], state['start_date']) == ('confirmed', moved.isoformat())
+
+
+def test_rollback_discards_buffered_events(app):
+    with app.app_context():
+        admin_id = User.query.filter_by(email='admin@ranger.com').first().id
+        before = db.session.query(EntityEvent).count()
+
+        vehicle = Vehicle(make='Mini', model='Cooper', year=2016, type='Sedan', price_per_day=45, owner_id=admin_id)
+        db.session.add(vehicle)
+        db.session.flush()
+        assert db.session.info[BUFFER_KEY]
+        db.session.rollback()
+        assert BUFFER_KEY not in db.session.info
+
+        # The next transaction writes only its own events
+        other = Vehicle(make='Mini', model='Clubman', year=2018, type='Sedan', price_per_day=50, owner_id=admin_id)
+        db.session.add(other)
+        db.session.commit()
+        last = db.session.scalars(select(EntityEvent).order_by(EntityEvent.id.desc()).limit(1)).first()
+        assert db.session.query(EntityEvent).count() == before + 1
+        assert (last.entity_type, last.entity_id, last.event) == ('vehicle', other.id, 'created')
@@ -0,0 +1,90 @@
+import gzip
+import zlib
+
+import pytest
+from sqlalchemy import event
+
+from models import db
+from models.user import User
+from models.vehicle import Vehicle
+from services.compression import StreamEncoder, choose_encoding, brotli
+
+
+def add_vehicles(app, count):
+    with app.app_context():
+        admin_id = User.query.filter_by(email='admin@ranger.com').first().id
+        for i in range(count):
+            db.session.add(Vehicle(make='Subaru', model=f'Outback {i}', year=2021, type='SUV', price_per_day=95,
+                                   description='All-wheel drive estate with roof rails. ' * 3, owner_id=admin_id))
+        db.session.commit()
+
+
+def test_sparse_fields_select_only_their_columns(app, client):
+    add_vehicles(app, 1)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = client.get('/api/vehicles?fields=make,id')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+    assert response.status_code == 200
+    vehicles = response.get_json()['vehicles']
+    assert vehicles and all(list(v) == ['id', 'make'] for v in vehicles)
+    select = next(s for s in statements if 'FROM vehicles' in s)
+    assert 'vehicles.make' in select
+    assert 'vehicles.description' not in select and 'vehicles.price_per_day' not in select
+
+
+def test_unknown_field_is_rejected(client):
+    response = client.get('/api/vehicles?fields=id,colour')
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Unknown field(s): colour.')
+
+
+def test_large_json_is_compressed(app, client):
+    add_vehicles(app, 10)
+    plain = client.get('/api/vehicles')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    assert len(plain.data) > 1024
+
+    gzipped = client.get('/api/vehicles', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(gzipped.data) == plain.data
+
+    encoded = client.get('/api/vehicles', headers={'Accept-Encoding': 'gzip, br'})
+    if brotli:
+        assert encoded.headers['Content-Encoding'] == 'br'
+        assert brotli.decompress(encoded.data) == plain.data
+    else:
+        assert encoded.headers['Content-Encoding'] == 'gzip'
+
+    vehicle_id = plain.get_json()['vehicles'][0]['id']
+    small = client.get(f'/api/vehicles/{vehicle_id}?fields=id', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+    assert small.get_json()['vehicle'] == {'id': vehicle_id}
+
+
+def test_accept_encoding_weights():
+    assert choose_encoding('gzip;q=1.0, br;q=0.5', ('br', 'gzip')) == 'gzip'
+    assert choose_encoding('*', ('br', 'gzip')) == 'br'
+    assert choose_encoding('br;q=0, identity', ('br', 'gzip')) is None
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'br'])
+def test_stream_chunks_decode_as_they_arrive(encoding):
+    if encoding == 'br':
+        if not brotli:
+            pytest.skip('brotli is not installed')
+        decode = brotli.Decompressor().process
+    else:
+        decode = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+    encoder = StreamEncoder(encoding)
+    for chunk in (b'event: availability\ndata: {}\n\n', b': keepalive\n\n'):
+        assert decode(encoder.encode(chunk)) == chunk
+    decode(encoder.finish())
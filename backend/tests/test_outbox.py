@@ -0,0 +1,107 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from models import db
+from models.outbox import OutboxMessage
+from models.user import User
+from services.outbox import outbox, SMTPTransport, LocalSMTPServer, PermanentDeliveryError
+
+
+class FakeTransport:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def send(self, message):
+        if self.error:
+            raise self.error
+        self.sent.append(message.recipient)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def email(app):
+    """Empty queue; the email transport is restored afterwards."""
+    with app.app_context():
+        db.session.execute(update(OutboxMessage).where(OutboxMessage.status.in_(('pending', 'sending')))
+                           .values(status='sent'))
+        db.session.commit()
+    transport = outbox.transports['email']
+    yield
+    outbox.register_transport('email', transport)
+
+
+def queued(topic):
+    return OutboxMessage.query.filter_by(topic=topic).order_by(OutboxMessage.id).all()
+
+
+def test_notify_is_written_with_the_transaction(app, email):
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@ranger.com').first()
+        outbox.notify('payment.refunded', admin, booking_id=-1, amount=10, transaction_id='TX-ROLLBACK')
+        db.session.rollback()
+        assert not OutboxMessage.query.filter(OutboxMessage.body.contains('TX-ROLLBACK')).count()
+
+        message = outbox.notify('payment.refunded', admin, booking_id=-1, amount=10, transaction_id='TX-COMMIT')
+        db.session.commit()
+        assert message.status == 'pending'
+        assert message.subject == 'Refund for booking #-1'
+        assert message.recipient == 'admin@ranger.com'
+
+
+def test_batch_is_sent_over_one_smtp_connection(app, email):
+    server = LocalSMTPServer()
+    server.start()
+    try:
+        outbox.register_transport('email', SMTPTransport('127.0.0.1', server.port))
+        with app.app_context():
+            outbox.enqueue_many([{'channel': 'email', 'recipient': f'user{i}@example.com', 'topic': 'test.smtp',
+                                  'subject': 'Hello', 'body': f'Message {i}'} for i in range(3)])
+            db.session.commit()
+            assert outbox.dispatch_batch() == 3
+            outbox.close_transports()
+            messages = queued('test.smtp')
+            assert [m.status for m in messages] == ['sent'] * 3
+            assert all(m.attempts == 1 and m.sent_at for m in messages)
+            assert outbox.dispatch_batch() == 0
+    finally:
+        server.stop()
+    assert server.connections == 1
+    assert sorted(m['to'][0] for m in server.messages) == [f'user{i}@example.com' for i in range(3)]
+
+
+def test_failed_send_backs_off_then_goes_dead(app, email):
+    outbox.register_transport('email', FakeTransport(error=ConnectionError('down')))
+    with app.app_context():
+        outbox.enqueue('email', 'retry@example.com', 'test.retry', 'body')
+        db.session.commit()
+        assert outbox.dispatch_batch() == 1
+        message = queued('test.retry')[0]
+        assert message.status == 'pending'
+        assert message.attempts == 1
+        assert message.next_attempt_at > datetime.utcnow()
+        assert message.last_error == 'ConnectionError: down'
+        # Not due yet
+        assert outbox.dispatch_batch() == 0
+
+        message.attempts = outbox.max_attempts - 1
+        message.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        assert outbox.dispatch_batch() == 1
+        assert queued('test.retry')[0].status == 'dead'
+
+
+def test_permanent_failure_is_not_retried(app, email):
+    outbox.register_transport('email', FakeTransport(error=PermanentDeliveryError('no such user')))
+    with app.app_context():
+        outbox.enqueue('email', 'nobody@example.com', 'test.permanent', 'body')
+        outbox.enqueue('pigeon', 'nobody', 'test.permanent', 'body')
+        db.session.commit()
+        assert outbox.dispatch_batch() == 2
+        messages = queued('test.permanent')
+        assert [(m.status, m.attempts) for m in messages] == [('dead', 1), ('dead', 1)]
+        assert messages[1].last_error == 'PermanentDeliveryError: No transport for channel pigeon'
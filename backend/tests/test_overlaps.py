@@ -0,0 +1,63 @@
+import csv
+from datetime import datetime, timedelta
+
+from models import db
+from models.booking import Booking
+from models.user import User
+from models.vehicle import Vehicle
+from services.overlaps import OverlapAudit, sweep
+
+DAY0 = datetime(2030, 1, 1)
+
+
+def booking(id, start, end, status='pending', vehicle_id=1):
+    return {'id': id, 'vehicle_id': vehicle_id, 'status': status, 'created_at': DAY0 + timedelta(minutes=id),
+            'start_date': DAY0 + timedelta(days=start), 'end_date': DAY0 + timedelta(days=end)}
+
+
+def conflicts(*bookings):
+    ordered = sorted(bookings, key=lambda b: (b['vehicle_id'], b['start_date'], b['id']))
+    return [(loser['id'], winner['id']) for loser, winner in sweep(ordered)]
+
+
+def test_booking_losing_only_to_a_cancelled_booking_is_kept():
+    # 1 loses to the confirmed 3; 2 overlapped only 1, so it keeps its slot
+    assert conflicts(booking(1, 0, 10), booking(2, 1, 2), booking(3, 5, 6, 'confirmed')) == [(1, 3)]
+
+
+def test_priority_and_half_open_intervals():
+    assert conflicts(
+        booking(1, 0, 4),
+        booking(2, 4, 8),                  # starts as 1 ends: no conflict
+        booking(3, 3, 5, 'confirmed'),     # beats both
+        booking(4, 0, 2, vehicle_id=2),    # other vehicle
+        booking(5, 1, 3, vehicle_id=2)
+    ) == [(1, 3), (2, 3), (5, 4)]
+
+
+def test_resolve_cancels_only_losers(app, tmp_path):
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@ranger.com').first()
+        vehicle = Vehicle(make='Subaru', model='Outback', year=2020, type='SUV', price_per_day=75,
+                          owner_id=admin.id)
+        db.session.add(vehicle)
+        db.session.flush()
+        rows = [booking(1, 0, 10), booking(2, 1, 2), booking(3, 5, 6, 'confirmed')]
+        ids = []
+        for row in rows:
+            b = Booking(vehicle_id=vehicle.id, user_id=admin.id, status=row['status'], total_price=75,
+                        start_date=row['start_date'], end_date=row['end_date'])
+            b.created_at = row['created_at']
+            db.session.add(b)
+            db.session.flush()
+            ids.append(b.id)
+        db.session.commit()
+
+        report = tmp_path / 'overlaps.csv'
+        stats = OverlapAudit(str(report), resolve=True).run()
+        db.session.expire_all()
+
+        assert stats['cancelled'] == 1
+        assert [db.session.get(Booking, i).status for i in ids] == ['cancelled', 'pending', 'confirmed']
+        with open(report) as f:
+            assert [(int(r['booking_id']), int(r['conflicts_with'])) for r in csv.DictReader(f)] == [(ids[0], ids[2])]
@@ -0,0 +1,63 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db
+from models.user import User
+from models.vehicle import Vehicle
+from services.holds import holds
+
+
+@pytest.fixture
+def customers(app, login):
+    with app.app_context():
+        for name in ('alice', 'bob'):
+            if not User.query.filter_by(username=name).first():
+                db.session.add(User(name, f'{name}@example.com', 'secret'))
+        db.session.commit()
+    return login('alice@example.com', 'secret'), login('bob@example.com', 'secret')
+
+
+@pytest.fixture
+def vehicle_id(app):
+    with app.app_context():
+        vehicle = Vehicle(make='Toyota', model='Corolla', year=2020, type='Sedan',
+                          price_per_day=50, location='Auckland',
+                          owner_id=User.query.filter_by(email='admin@ranger.com').first().id)
+        db.session.add(vehicle)
+        db.session.commit()
+        return vehicle.id
+
+
+def dates(days_ahead=10, days=3):
+    start = (datetime.utcnow() + timedelta(days=days_ahead)).replace(hour=10, minute=0, second=0, microsecond=0)
+    return {'start_date': start.isoformat(), 'end_date': (start + timedelta(days=days)).isoformat()}
+
+
+def test_failed_payment_releases_hold(client, customers, vehicle_id, monkeypatch):
+    alice, bob = customers
+    response = client.post('/api/holds', json={'vehicle_id': vehicle_id, **dates()}, headers=alice)
+    assert response.status_code == 201
+    hold_id = response.get_json()['hold']['id']
+
+    response = client.post('/api/payments', json={'hold_id': hold_id, 'amount': 'abc',
+                                                  'payment_method': 'card'}, headers=alice)
+    assert response.status_code == 400
+    assert not holds.holds[hold_id].claimed
+
+    # A failure after the claim hands the hold back too
+    def fail(*args, **kwargs):
+        raise RuntimeError('database unavailable')
+    with monkeypatch.context() as patch:
+        patch.setattr('models.booking.Booking.is_vehicle_available', fail)
+        response = client.post('/api/payments', json={'hold_id': hold_id, 'amount': 150,
+                                                      'payment_method': 'card'}, headers=alice)
+    assert response.status_code == 500
+    assert not holds.holds[hold_id].claimed
+
+    # Once it expires, the vehicle is free for someone else
+    real_time = time.time
+    monkeypatch.setattr(time, 'time', lambda: real_time() + holds.ttl + 1)
+    response = client.post('/api/holds', json={'vehicle_id': vehicle_id, **dates()}, headers=bob)
+    assert response.status_code == 201
@@ -0,0 +1,16 @@
+import threading
+import time
+
+from services.profiler import Sampler
+
+
+def test_sampled_time_matches_wall_time_on_cpu_bound_code():
+    sampler = Sampler(threading.get_ident(), 0.001)
+    started = time.perf_counter()
+    sampler.start()
+    while time.perf_counter() - started < 0.3:
+        sum(range(1000))
+    stacks = sampler.stop()
+    elapsed_us = (time.perf_counter() - started) * 1e6
+
+    assert 0.8 * elapsed_us <= sum(stacks.values()) <= elapsed_us
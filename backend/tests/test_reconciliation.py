@@ -0,0 +1,52 @@
+import csv
+from datetime import datetime, timedelta
+
+from models import db
+from models.booking import Booking
+from models.user import User
+from models.vehicle import Vehicle
+from services.reconciliation import Reconciler
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_resume_does_not_duplicate_report_rows(app, tmp_path, monkeypatch):
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@ranger.com').first()
+        vehicle = Vehicle(make='Ford', model='Ranger', year=2021, type='Truck', price_per_day=80,
+                          owner_id=admin.id)
+        db.session.add(vehicle)
+        db.session.flush()
+        start = datetime(2020, 1, 1)
+        for i in range(25):
+            db.session.add(Booking(vehicle_id=vehicle.id, user_id=admin.id, status='confirmed', total_price=80,
+                                   start_date=start + timedelta(days=3 * i),
+                                   end_date=start + timedelta(days=3 * i + 1)))
+        db.session.commit()
+
+        report = tmp_path / 'reconciliation.csv'
+        expected = Reconciler(str(report), chunk_size=10).run()
+        with open(report) as f:
+            expected_rows = list(csv.DictReader(f))
+
+        # Die after the first checkpoint, with later rows already flushed to the report
+        reconciler = Reconciler(str(report), chunk_size=10)
+        save_checkpoint = reconciler.save_checkpoint
+        def save_once(file):
+            if reconciler.stats['bookings'] > 10:
+                file.flush()
+                raise Interrupted()
+            save_checkpoint(file)
+        monkeypatch.setattr(reconciler, 'save_checkpoint', save_once)
+        try:
+            reconciler.run()
+        except Interrupted:
+            pass
+
+        stats = Reconciler(str(report), chunk_size=10).run(resume=True)
+        with open(report) as f:
+            rows = list(csv.DictReader(f))
+        assert rows == expected_rows
+        assert stats == expected
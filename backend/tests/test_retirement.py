@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from models import db
+from models.booking import Booking
+from models.retirement import RetirementOutcome
+from models.user import User
+from models.vehicle import Vehicle
+from services.retirement import fleet_retirement
+
+
+def test_every_cancelled_booking_gets_an_outcome(app, monkeypatch):
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@ranger.com').first()
+        vehicle = Vehicle(make='Isuzu', model='D-Max', year=2018, type='Truck', price_per_day=90, owner_id=admin.id)
+        db.session.add(vehicle)
+        db.session.flush()
+        start = datetime.utcnow() + timedelta(days=30)
+        statuses = ['confirmed', 'pending', 'completed', 'confirmed']
+        bookings = [Booking(vehicle_id=vehicle.id, user_id=admin.id, status=status, total_price=90,
+                            start_date=start + timedelta(days=3 * i), end_date=start + timedelta(days=3 * i + 1))
+                    for i, status in enumerate(statuses)]
+        db.session.add_all(bookings)
+        db.session.commit()
+
+        job = fleet_retirement.start([vehicle.id], 'sold', admin.id)
+        # The batch SELECT also sees the completed booking, as if it changed after being read
+        future_bookings = fleet_retirement._future_bookings
+        monkeypatch.setattr(fleet_retirement, '_future_bookings', lambda job, vehicle_ids: or_(
+            future_bookings(job, vehicle_ids), Booking.id == bookings[2].id))
+        job = fleet_retirement.run(job.id)
+        db.session.expire_all()
+
+        cancelled = {b.id for b in bookings if db.session.get(Booking, b.id).status == 'cancelled'}
+        outcomes = {o.booking_id: o.previous_status for o in RetirementOutcome.query.filter_by(job_id=job.id)}
+        assert cancelled == {bookings[i].id for i in (0, 1, 3)}
+        assert outcomes == {bookings[i].id: statuses[i] for i in (0, 1, 3)}
+        assert job.bookings_cancelled == 3
+        assert db.session.get(Booking, bookings[2].id).status == 'completed'
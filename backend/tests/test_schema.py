@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine, inspect, text
+
+from services import schema
+
+
+def test_upgrade_adds_columns_and_indexes_to_an_old_table(app, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        # vehicles as it was before coordinates were added
+        conn.execute(text('CREATE TABLE vehicles (id INTEGER PRIMARY KEY, make VARCHAR(50) NOT NULL, '
+                          'model VARCHAR(50) NOT NULL, year INTEGER NOT NULL, type VARCHAR(50) NOT NULL, '
+                          'price_per_day FLOAT NOT NULL, is_available BOOLEAN NOT NULL, location VARCHAR(100), '
+                          'description TEXT, image_url VARCHAR(255), created_at DATETIME NOT NULL, '
+                          'updated_at DATETIME NOT NULL, owner_id INTEGER NOT NULL)'))
+        conn.execute(text("INSERT INTO vehicles VALUES (1, 'Ford', 'Focus', 2015, 'Sedan', 30, 1, 'Auckland', "
+                          "NULL, NULL, '2020-01-01', '2020-01-01', 1)"))
+
+    with app.app_context():
+        added = schema.upgrade(engine)
+        assert {'vehicles.latitude', 'vehicles.longitude', 'vehicles.geo_cell', 'vehicles.image_hash',
+                'ix_vehicles_lat_lon'} <= set(added)
+        assert schema.upgrade(engine) == []
+
+    inspector = inspect(engine)
+    assert {'latitude', 'longitude', 'geo_cell', 'image_hash'} <= {c['name'] for c in inspector.get_columns('vehicles')}
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT make, latitude FROM vehicles')).all() == [('Ford', None)]
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+from services.slowqueries import SlowQueryLog
+
+
+class Cursor:
+    def __init__(self, executed, fail):
+        self.executed = executed
+        self.fail = fail
+
+    def execute(self, sql, parameters=None):
+        self.executed.append(sql.split(' ')[0] if sql.startswith('EXPLAIN') else sql)
+        if sql.startswith('EXPLAIN') and self.fail:
+            raise RuntimeError('canceling statement due to statement timeout')
+
+    def fetchall(self):
+        return [('Seq Scan on bookings',)]
+
+    def close(self):
+        pass
+
+
+class Connection:
+    """Just enough of a SQLAlchemy Connection on PostgreSQL for explain_plan."""
+
+    def __init__(self, fail):
+        self.executed = []
+        self.dialect = SimpleNamespace(name='postgresql')
+        cursor = Cursor(self.executed, fail)
+        self.connection = SimpleNamespace(dbapi_connection=SimpleNamespace(cursor=lambda: cursor))
+
+
+def test_failed_explain_is_rolled_back_to_a_savepoint():
+    conn = Connection(fail=True)
+    plan = SlowQueryLog.explain_plan(conn, 'SELECT * FROM bookings', ())
+    assert plan[0].startswith('EXPLAIN failed')
+    assert conn.executed == ['SAVEPOINT slow_query_explain', 'EXPLAIN', 'ROLLBACK TO SAVEPOINT slow_query_explain',
+                             'RELEASE SAVEPOINT slow_query_explain']
+
+
+def test_explain_runs_in_a_savepoint():
+    conn = Connection(fail=False)
+    assert SlowQueryLog.explain_plan(conn, 'SELECT * FROM bookings', ()) == ['Seq Scan on bookings']
+    assert conn.executed == ['SAVEPOINT slow_query_explain', 'EXPLAIN', 'RELEASE SAVEPOINT slow_query_explain']
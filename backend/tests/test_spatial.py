@@ -0,0 +1,27 @@
+from models import db
+from models.user import User
+from models.vehicle import Vehicle
+
+
+def test_nearby_returns_closest_first(app, client):
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@ranger.com').first()
+        # 0, ~11km, ~110km and ~330km north of the query point
+        for i, offset in enumerate((0, 0.1, 1.0, 3.0)):
+            vehicle = Vehicle(make='Kia', model=f'Sportage {i}', year=2022, type='SUV', price_per_day=60,
+                              owner_id=admin.id)
+            vehicle.set_coordinates(-40.0 + offset, 175.0)
+            db.session.add(vehicle)
+        db.session.commit()
+
+    response = client.get('/api/vehicles/nearby?lat=-40.0&lon=175.0&k=3&max_km=200&fields=model')
+    assert response.status_code == 200
+    vehicles = response.get_json()['vehicles']
+    assert [v['model'] for v in vehicles] == ['Sportage 0', 'Sportage 1', 'Sportage 2']
+    assert [round(v['distance_km']) for v in vehicles] == [0, 11, 111]
+
+
+def test_nearby_rejects_out_of_range_max_km(client):
+    for max_km in (0, -5, 3000):
+        response = client.get(f'/api/vehicles/nearby?lat=-40.0&lon=175.0&max_km={max_km}')
+        assert response.status_code == 400